@@ -4,10 +4,13 @@ DULAGLUTIDE_PATH = Path(__file__).parent
 
 MODEL_BASE_PATH = DULAGLUTIDE_PATH / "models" / "results" / "models"
 MODEL_PATH = MODEL_BASE_PATH / "dulaglutide_body_flat.xml"
+MODEL_STATE_PATH = MODEL_BASE_PATH.parent / "states"
 
 RESULTS_PATH = DULAGLUTIDE_PATH / "results"
 RESULTS_PATH_SIMULATION = RESULTS_PATH / "simulation"
 RESULTS_PATH_FIT = RESULTS_PATH / "fit"
+RESULTS_PATH_CACHE = RESULTS_PATH / "cache"
+RESULTS_PATH_CHECKPOINT = RESULTS_PATH / "checkpoints"
 
 DATA_PATH_BASE = DULAGLUTIDE_PATH / "data"
 # DATA_PATH_BASE = DULAGLUTIDE_PATH.parents[3] / "pkdb_data" / "studies"
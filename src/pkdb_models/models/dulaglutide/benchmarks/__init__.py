@@ -0,0 +1,8 @@
+"""Benchmarks of the dulaglutide model.
+
+- `startup`: import time of the command line interface
+- `suite`: runtime of model loading, simulations, scans, pharmacokinetics,
+  fitting objective and sensitivity simulation
+- `history`: runtime history of the benchmarks and simulation experiments
+  with comparison of commits and runs
+"""
@@ -0,0 +1,361 @@
+"""Runtime history of the benchmarks and simulation experiments.
+
+Every benchmark run (`suite`) and every run of the simulation experiments
+(telemetry, see `helpers.run_experiments`) appends its timings to a local
+SQLite database ('results/benchmarks/history.sqlite'). A run is keyed by the
+git commit, the package version and the hash of the model, with the machine
+and the versions of sbmlsim and roadrunner:
+
+    python -m pkdb_models.models.dulaglutide.benchmarks.history list
+    python -m pkdb_models.models.dulaglutide.benchmarks.history compare 1b411b8 f08809e
+    python -m pkdb_models.models.dulaglutide.benchmarks.history compare --last 5
+
+`compare` compares the timings of two commits (median of their runs) or the
+latest run with the median of the N runs before it, and flags benchmarks and
+experiments whose wall time or peak memory exceeds the baseline by more than
+the threshold (exit status 1 on regressions).
+
+Benchmarks are stored with their median time. Experiments are stored with
+the wall and CPU time of all their phases and their peak RSS; experiments
+with cached tasks are not compared, their integration was skipped.
+"""
+import datetime
+import json
+import optparse
+import sqlite3
+import statistics
+import sys
+from collections import defaultdict
+from contextlib import closing
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sbmlutils.console import console
+
+from pkdb_models.models.dulaglutide.benchmarks.suite import (
+    REGRESSION_THRESHOLD,
+    machine_metadata,
+)
+from pkdb_models.models.dulaglutide.memory import format_memory
+
+BENCHMARK = "benchmark"
+TELEMETRY = "telemetry"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    source TEXT NOT NULL,
+    git_commit TEXT,
+    version TEXT,
+    model_hash TEXT,
+    machine TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    wall_time REAL NOT NULL,
+    cpu_time REAL,
+    peak_rss INTEGER,
+    tasks INTEGER NOT NULL DEFAULT 0,
+    cached_tasks INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS timings_run ON timings(run_id);
+"""
+
+
+def history_path() -> Path:
+    """Path of the history database in the (current) results directory."""
+    import pkdb_models.models.dulaglutide as dulaglutide
+
+    return dulaglutide.RESULTS_PATH / "benchmarks" / "history.sqlite"
+
+
+def package_version() -> Optional[str]:
+    """Version of the installed package."""
+    try:
+        return metadata.version("dulaglutide-model")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def append_run(
+    source: str,
+    timings: Dict[str, Dict[str, Any]],
+    path: Optional[Path] = None,
+    machine: Optional[Dict] = None,
+) -> int:
+    """Append the timings of a run to the history, returns the id of the run.
+
+    :param source: BENCHMARK or TELEMETRY
+    :param timings: 'wall_time' [s] and optional 'cpu_time' [s], 'peak_rss'
+        [bytes], 'tasks' and 'cached_tasks' per benchmark or experiment
+    :param machine: metadata of the machine, see `suite.machine_metadata`
+    """
+    machine = machine or machine_metadata()
+    with closing(_connect(path or history_path())) as connection, connection:
+        cursor = connection.execute(
+            "INSERT INTO runs (created, source, git_commit, version, model_hash, machine) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                datetime.datetime.now().isoformat(timespec="seconds"),
+                source,
+                machine.get("git_commit"),
+                package_version(),
+                machine.get("model_hash"),
+                json.dumps(machine, sort_keys=True),
+            ),
+        )
+        run_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO timings (run_id, name, wall_time, cpu_time, peak_rss, tasks, "
+            "cached_tasks) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    name,
+                    values["wall_time"],
+                    values.get("cpu_time"),
+                    values.get("peak_rss"),
+                    values.get("tasks", 0),
+                    values.get("cached_tasks", 0),
+                )
+                for name, values in timings.items()
+            ],
+        )
+    return run_id
+
+
+def benchmark_timings(results: Dict) -> Dict[str, Dict[str, Any]]:
+    """Timings of the results of `suite.run_benchmarks` (median times)."""
+    return {
+        name: {"wall_time": result["median"]}
+        for name, result in results["benchmarks"].items()
+    }
+
+
+def telemetry_timings(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Timings of the experiments in the telemetry records.
+
+    The times of the phases of an experiment are summed (the phases are
+    exclusive), the peak RSS is the largest of its phases and tasks.
+    """
+    timings: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        entry = timings.setdefault(
+            record["experiment"],
+            {
+                "wall_time": 0.0,
+                "cpu_time": 0.0,
+                "peak_rss": None,
+                "tasks": 0,
+                "cached_tasks": 0,
+            },
+        )
+        if record["task"] is None:
+            entry["wall_time"] += record["wall_time"]
+            entry["cpu_time"] += record["cpu_time"]
+        else:
+            entry["tasks"] += 1
+            entry["cached_tasks"] += int(record.get("cached", False))
+        if record.get("peak_rss") is not None:
+            entry["peak_rss"] = max(entry["peak_rss"] or 0, record["peak_rss"])
+    return timings
+
+
+def record_benchmarks(results: Dict, path: Optional[Path] = None) -> int:
+    """Append the results of `suite.run_benchmarks` to the history."""
+    return append_run(
+        BENCHMARK, benchmark_timings(results), path=path, machine=results["machine"]
+    )
+
+
+def record_telemetry(
+    records: Iterable[Dict[str, Any]], path: Optional[Path] = None
+) -> int:
+    """Append the experiment timings of the telemetry records to the history."""
+    return append_run(TELEMETRY, telemetry_timings(records), path=path)
+
+
+def read_runs(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Runs of the history with their timings, oldest first."""
+    path = path or history_path()
+    if not path.exists():
+        return []
+    with closing(_connect(path)) as connection:
+        runs = [dict(row) for row in connection.execute("SELECT * FROM runs ORDER BY id")]
+        timings = defaultdict(dict)
+        for row in connection.execute("SELECT * FROM timings"):
+            row = dict(row)
+            timings[row.pop("run_id")][row.pop("name")] = row
+    for run in runs:
+        run["machine"] = json.loads(run["machine"])
+        run["timings"] = timings[run["id"]]
+    return runs
+
+
+def _baseline(runs: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Median wall time and peak RSS per source and name of the runs.
+
+    Timings with cached tasks are skipped.
+    """
+    values = defaultdict(lambda: defaultdict(list))
+    for run in runs:
+        for name, timing in run["timings"].items():
+            if timing["cached_tasks"]:
+                continue
+            key = (run["source"], name)
+            values[key]["wall_time"].append(timing["wall_time"])
+            if timing["peak_rss"] is not None:
+                values[key]["peak_rss"].append(timing["peak_rss"])
+    return {
+        key: {field: statistics.median(v) for field, v in fields.items()}
+        for key, fields in values.items()
+    }
+
+
+def compare_runs(
+    baseline_runs: List[Dict[str, Any]],
+    current_runs: List[Dict[str, Any]],
+    threshold: float = REGRESSION_THRESHOLD,
+) -> List[str]:
+    """Compare the runs with the baseline runs, returns the regressions.
+
+    Wall time and peak RSS are compared per benchmark and experiment
+    (median of the runs).
+    """
+    machines = {
+        json.dumps({k: run["machine"].get(k) for k in ["platform", "processor", "cpu_count"]})
+        for run in baseline_runs + current_runs
+    }
+    if len(machines) > 1:
+        console.print("Runs of different machines are compared", style="warning")
+
+    baseline = _baseline(baseline_runs)
+    regressions = []
+    for key, current in sorted(_baseline(current_runs).items()):
+        source, name = key
+        if key not in baseline:
+            console.print(f"{source:<10} {name:<30} not in baseline")
+            continue
+        base = baseline[key]
+        for field, fmt in [
+            ("wall_time", lambda v: f"{v:10.3f} s"),
+            ("peak_rss", lambda v: f"{format_memory(v):>12}"),
+        ]:
+            if field not in current or field not in base:
+                continue
+            ratio = current[field] / base[field] if base[field] > 0 else float("inf")
+            line = (
+                f"{source:<10} {name:<30} {field:<10} {fmt(base[field])} -> "
+                f"{fmt(current[field])} ({ratio:6.2f}x)"
+            )
+            if ratio > 1 + threshold:
+                regressions.append(f"{name} ({field})")
+                console.print(f"{line} REGRESSION", style="error")
+            elif ratio < 1 - threshold:
+                console.print(f"{line} improved", style="success")
+            else:
+                console.print(line)
+    return regressions
+
+
+def _commit_runs(runs: List[Dict[str, Any]], commit: str) -> List[Dict[str, Any]]:
+    """Runs of the commit (abbreviated hashes are matched as prefix)."""
+    return [run for run in runs if (run["git_commit"] or "").startswith(commit)]
+
+
+def print_runs(runs: List[Dict[str, Any]]) -> None:
+    """Print the runs of the history."""
+    for run in runs:
+        versions = run["machine"].get("versions", {})
+        console.print(
+            f"{run['id']:>5} {run['created']} {run['source']:<10} "
+            f"{(run['git_commit'] or '-')[:10]:<10} {run['version'] or '-':<8} "
+            f"sbmlsim {versions.get('sbmlsim', '-'):<8} "
+            f"roadrunner {versions.get('roadrunner', '-'):<8} "
+            f"{len(run['timings']):>3} timings"
+        )
+
+
+def main() -> None:
+    parser = optparse.OptionParser(
+        usage="%prog list [options] | %prog compare [BASELINE_COMMIT CURRENT_COMMIT] "
+        "[options]"
+    )
+    parser.add_option(
+        "-d", "--database",
+        dest="database",
+        help="Optional: History database (default: results/benchmarks/history.sqlite)",
+    )
+    parser.add_option(
+        "-n", "--last",
+        dest="last",
+        type="int",
+        default=None,
+        help="Optional: Compare the latest run with the median of the N runs before "
+             "(default for 'compare' without commits: 5)",
+    )
+    parser.add_option(
+        "-s", "--source",
+        dest="source",
+        default=None,
+        help=f"Optional: Only runs of the source ('{BENCHMARK}' or '{TELEMETRY}')",
+    )
+    parser.add_option(
+        "-t", "--threshold",
+        dest="threshold",
+        type="float",
+        default=REGRESSION_THRESHOLD,
+        help=f"Optional: Relative increase of wall time or peak memory reported as "
+             f"regression (default: {REGRESSION_THRESHOLD})",
+    )
+    options, args = parser.parse_args()
+
+    if not args or args[0] not in ("list", "compare"):
+        parser.print_help()
+        sys.exit(1)
+
+    runs = read_runs(Path(options.database) if options.database else None)
+    if options.source:
+        runs = [run for run in runs if run["source"] == options.source]
+
+    if args[0] == "list":
+        print_runs(runs)
+        return
+
+    if len(args) == 3:
+        baseline_runs = _commit_runs(runs, args[1])
+        current_runs = _commit_runs(runs, args[2])
+    elif len(args) == 1:
+        last = options.last or 5
+        # latest run and the runs of the same source before
+        current_runs = runs[-1:]
+        source = current_runs[0]["source"] if current_runs else None
+        baseline_runs = [run for run in runs[:-1] if run["source"] == source][-last:]
+    else:
+        parser.error("'compare' requires two commits or none (with --last).")
+
+    if not baseline_runs or not current_runs:
+        parser.error("No runs to compare in the history.")
+    console.print(
+        f"Comparing {len(current_runs)} run(s) with {len(baseline_runs)} baseline run(s)"
+    )
+    regressions = compare_runs(baseline_runs, current_runs, threshold=options.threshold)
+    if regressions:
+        console.print(f"Regressions: {regressions}", style="error")
+        sys.exit(1)
+    console.print("No regressions", style="success")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Startup benchmark of the command line interface.
+
+    python -m pkdb_models.models.dulaglutide.benchmarks.startup
+
+Measures the wall time of 'run_dulaglutide --action list_experiments' in
+fresh interpreters and checks that importing the tool does not import the
+simulation stack. Exits with status 1 if the startup regressed.
+"""
+import optparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+from sbmlutils.console import console
+
+# modules which must not be imported on startup of the tool
+HEAVY_MODULES: List[str] = [
+    "sbmlsim",
+    "roadrunner",
+    "libsbml",
+    "matplotlib",
+    "pandas",
+    "xarray",
+    "scipy",
+]
+# maximal median startup time [s]
+MAX_STARTUP_TIME = 1.0
+
+CLI_MODULE = "pkdb_models.models.dulaglutide.run_dulaglutide"
+
+
+def imported_heavy_modules() -> List[str]:
+    """Heavy modules imported by the tool in a fresh interpreter."""
+    code = (
+        f"import sys; import {CLI_MODULE}; "
+        "print('\\n'.join(sorted({m.split('.')[0] for m in sys.modules})))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    modules = set(output.split())
+    return [module for module in HEAVY_MODULES if module in modules]
+
+
+def startup_times(repeats: int = 5) -> List[float]:
+    """Wall times [s] of listing the experiments in fresh interpreters."""
+    command = [sys.executable, "-m", CLI_MODULE, "--action", "list_experiments"]
+    times = []
+    for _ in range(repeats):
+        t_start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - t_start)
+    return times
+
+
+def main() -> None:
+    parser = optparse.OptionParser()
+    parser.add_option(
+        "-n", "--repeats",
+        dest="repeats",
+        type="int",
+        default=5,
+        help="Optional: Number of measured startups (default: 5)",
+    )
+    parser.add_option(
+        "--max-time",
+        dest="max_time",
+        type="float",
+        default=MAX_STARTUP_TIME,
+        help=f"Optional: Maximal median startup time in seconds (default: {MAX_STARTUP_TIME})",
+    )
+    options, _ = parser.parse_args()
+
+    heavy_modules = imported_heavy_modules()
+    times = startup_times(repeats=options.repeats)
+    median = statistics.median(times)
+    console.print(
+        f"Startup 'list_experiments': median {median:.3f} s, "
+        f"min {min(times):.3f} s, max {max(times):.3f} s (n={len(times)})"
+    )
+
+    failed = False
+    if heavy_modules:
+        console.print(f"Heavy modules imported on startup: {heavy_modules}", style="error")
+        failed = True
+    if median > options.max_time:
+        console.print(
+            f"Startup time {median:.3f} s exceeds {options.max_time:.3f} s", style="error"
+        )
+        failed = True
+    if failed:
+        sys.exit(1)
+    console.print("Startup benchmark passed", style="success")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""Performance benchmark suite of the dulaglutide model.
+
+    python -m pkdb_models.models.dulaglutide.benchmarks.suite run -o benchmark.json
+    python -m pkdb_models.models.dulaglutide.benchmarks.suite compare baseline.json benchmark.json
+
+Every benchmark consists of a setup (not timed) and a timed function which is
+executed `repeats` times after one warmup call. The results are stored as JSON
+with the metadata of the machine (platform, CPU, versions, git commit, model
+hash), so results of different machines are not compared by accident.
+
+`compare` flags benchmarks whose median time exceeds the median of the
+baseline by more than the threshold and exits with status 1 on regressions.
+
+The results of every run are appended to the runtime history, see `history`.
+"""
+import datetime
+import hashlib
+import json
+import optparse
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from copy import deepcopy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sbmlutils.console import console
+
+from pkdb_models.models.dulaglutide import (
+    DATA_PATHS,
+    DULAGLUTIDE_PATH,
+    MODEL_PATH,
+    RESULTS_PATH,
+)
+
+# relative slowdown of the median which is reported as regression
+REGRESSION_THRESHOLD = 0.10
+
+
+@dataclass
+class Benchmark:
+    """Benchmark with setup returning the timed function."""
+
+    setup: Callable[[], Callable[[], object]]
+    repeats: int
+    description: str
+
+
+def _simulator():
+    from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+    return DulaglutideSimulator(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+
+
+def _experiment(experiment_class, simulator=None):
+    """Initialized experiment with the settings of `helpers.run_experiments`."""
+    from pkdb_models.models.dulaglutide.experiments.base_experiment import (
+        DulaglutideExperimentRunner,
+    )
+
+    runner = DulaglutideExperimentRunner(
+        experiment_classes=[experiment_class],
+        data_path=DATA_PATHS,
+        base_path=DULAGLUTIDE_PATH,
+        simulator=simulator,
+        absolute_tolerance=1e-10,
+        relative_tolerance=1e-10,
+    )
+    return runner.experiments[experiment_class.__name__]
+
+
+def setup_model_compile() -> Callable[[], object]:
+    import roadrunner
+
+    return lambda: roadrunner.RoadRunner(str(MODEL_PATH))
+
+
+def setup_model_load() -> Callable[[], object]:
+    from pkdb_models.models.dulaglutide.model_cache import load_model
+
+    load_model(MODEL_PATH)
+    return lambda: load_model(MODEL_PATH)
+
+
+def setup_simulate_week_sc() -> Callable[[], object]:
+    from sbmlsim.simulation import Timecourse, TimecourseSim
+
+    from pkdb_models.models.dulaglutide.experiments.base_experiment import (
+        DulaglutideSimulationExperiment,
+    )
+
+    simulator = _simulator()
+    Q_ = simulator.Q_
+    simulation = TimecourseSim(
+        Timecourse(
+            start=0,
+            end=7 * 24 * 60,  # [min]
+            steps=1000,
+            changes={
+                **DulaglutideSimulationExperiment._default_changes(Q_),
+                "SCDOSE_dul": Q_(1.5, "mg"),
+            },
+        )
+    )
+    return lambda: simulator.run_timecourse(deepcopy(simulation))
+
+
+def setup_gerstein2019() -> Callable[[], object]:
+    from pkdb_models.models.dulaglutide.experiments.studies import Gerstein2019
+
+    simulator = _simulator()
+    experiment = _experiment(Gerstein2019, simulator=simulator)
+    # 261 weekly doses
+    simulation = list(experiment._simulations.values())[0]
+    return lambda: simulator.run_timecourse(deepcopy(simulation))
+
+
+def setup_gerstein2019_chained() -> Callable[[], object]:
+    from sbmlsim.simulator.simulation_serial import SimulatorSerial
+
+    from pkdb_models.models.dulaglutide.experiments.studies import Gerstein2019
+
+    simulator = SimulatorSerial(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+    experiment = _experiment(Gerstein2019, simulator=_simulator())
+    # the same regimen as chained timecourses (generic simulator)
+    simulation = list(experiment._simulations.values())[0]
+    return lambda: simulator.run_timecourse(deepcopy(simulation))
+
+
+def setup_parameter_scan() -> Callable[[], object]:
+    from pkdb_models.models.dulaglutide.experiments.scans import (
+        DulaglutideParameterScan,
+    )
+
+    simulator = _simulator()
+    experiment = _experiment(DulaglutideParameterScan, simulator=simulator)
+    scans = list(experiment._simulations.values())
+
+    def run_scans():
+        for scan in scans:
+            simulator.run_scan(deepcopy(scan))
+
+    return run_scans
+
+
+def setup_pharmacokinetics() -> Callable[[], object]:
+    from pkdb_models.models.dulaglutide.experiments.scans import (
+        DulaglutideParameterScan,
+    )
+
+    simulator = _simulator()
+    experiment = _experiment(DulaglutideParameterScan, simulator=simulator)
+    experiment._run_tasks(simulator)
+    return experiment.calculate_dulaglutide_pk
+
+
+def setup_fit_objective() -> Callable[[], object]:
+    import numpy as np
+
+    from pkdb_models.models.dulaglutide.fitting.fitting import (
+        FitExperimentSubset,
+        create_optimization_problem,
+        fit_kwargs,
+        get_fit_experiments,
+        get_fit_parameters,
+    )
+
+    subset = FitExperimentSubset.PHARMACOKINETICS
+    op = create_optimization_problem(
+        fit_experiments=get_fit_experiments(subset),
+        opid="benchmark",
+        parameters=get_fit_parameters(subset),
+    )
+    op.initialize(**fit_kwargs)
+    xlog = np.log10(op.x0)
+    return lambda: op.cost_least_square(xlog)
+
+
+def setup_sensitivity() -> Callable[[], object]:
+    from pkdb_models.models.dulaglutide.sensitivity.sensitivity_analysis import (
+        sensitivity_simulation,
+    )
+
+    r = sensitivity_simulation.load_model(
+        MODEL_PATH, selections=sensitivity_simulation.selections
+    )
+    return lambda: sensitivity_simulation.simulate(r, changes={})
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "model_compile": Benchmark(
+        setup_model_compile, repeats=5, description="Load and JIT-compile the SBML model"
+    ),
+    "model_load": Benchmark(
+        setup_model_load, repeats=10, description="Load the model from the compiled state"
+    ),
+    "simulate_week_sc": Benchmark(
+        setup_simulate_week_sc, repeats=10, description="Single week after a SC dose"
+    ),
+    "gerstein2019": Benchmark(
+        setup_gerstein2019, repeats=3, description="Gerstein2019 regimen (261 segments)"
+    ),
+    "gerstein2019_chained": Benchmark(
+        setup_gerstein2019_chained,
+        repeats=3,
+        description="Gerstein2019 regimen as chained timecourses",
+    ),
+    "parameter_scan": Benchmark(
+        setup_parameter_scan, repeats=3, description="Scans of DulaglutideParameterScan"
+    ),
+    "pharmacokinetics": Benchmark(
+        setup_pharmacokinetics, repeats=5, description="calculate_dulaglutide_pk of the scans"
+    ),
+    "fit_objective": Benchmark(
+        setup_fit_objective, repeats=3, description="Fitting objective (pharmacokinetics)"
+    ),
+    "sensitivity": Benchmark(
+        setup_sensitivity, repeats=5, description="DulaglutideSensitivitySimulation.simulate"
+    ),
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=DULAGLUTIDE_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_metadata() -> Dict:
+    """Metadata of the machine and software versions."""
+    import numpy
+    import roadrunner
+    import sbmlsim
+
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "versions": {
+            "numpy": numpy.__version__,
+            "roadrunner": roadrunner.__version__,
+            "sbmlsim": sbmlsim.__version__,
+        },
+        "git_commit": _git_commit(),
+        "model_hash": hashlib.sha256(MODEL_PATH.read_bytes()).hexdigest(),
+    }
+
+
+def run_benchmark(benchmark: Benchmark, repeats: Optional[int] = None) -> Dict:
+    """Run the benchmark, returns the timings [s]."""
+    t_start = time.perf_counter()
+    f = benchmark.setup()
+    setup_time = time.perf_counter() - t_start
+    # warmup
+    f()
+    times = []
+    for _ in range(repeats or benchmark.repeats):
+        t_start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t_start)
+    return {
+        "description": benchmark.description,
+        "setup": setup_time,
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None, repeats: Optional[int] = None
+) -> Dict:
+    """Run the benchmarks (all if None)."""
+    names = names or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        console.print(f"{name}: {BENCHMARKS[name].description}")
+        results[name] = run_benchmark(BENCHMARKS[name], repeats=repeats)
+        console.print(
+            f"  median {results[name]['median']:.4f} s, "
+            f"min {results[name]['min']:.4f} s (n={len(results[name]['times'])})"
+        )
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_metadata(),
+        "benchmarks": results,
+    }
+
+
+def compare(
+    baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD
+) -> List[str]:
+    """Compare benchmark results, returns the regressed benchmarks."""
+    for key in ["platform", "processor", "cpu_count"]:
+        if baseline["machine"].get(key) != current["machine"].get(key):
+            console.print(
+                f"Machine differs from baseline ({key}: "
+                f"'{baseline['machine'].get(key)}' != '{current['machine'].get(key)}')",
+                style="warning",
+            )
+
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            console.print(f"{name:<20} not in baseline")
+            continue
+        base = baseline["benchmarks"][name]["median"]
+        ratio = result["median"] / base if base > 0 else float("inf")
+        line = f"{name:<20} {base:10.4f} s -> {result['median']:10.4f} s ({ratio:6.2f}x)"
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            console.print(f"{line} REGRESSION", style="error")
+        elif ratio < 1 - threshold:
+            console.print(f"{line} faster", style="success")
+        else:
+            console.print(line)
+    return regressions
+
+
+def _read(path: Path) -> Dict:
+    with open(path, "r") as f_json:
+        return json.load(f_json)
+
+
+def main() -> None:
+    parser = optparse.OptionParser(
+        usage="%prog run [options] | %prog compare BASELINE CURRENT [options]"
+    )
+    parser.add_option(
+        "-o", "--output",
+        dest="output",
+        help="Optional: JSON file for the results of 'run' "
+             "(default: results/benchmarks/benchmark_<timestamp>.json)",
+    )
+    parser.add_option(
+        "-b", "--benchmarks",
+        dest="benchmarks",
+        help=f"Optional: Comma-separated benchmarks of 'run' (default: all). "
+             f"Choices: {list(BENCHMARKS)}",
+    )
+    parser.add_option(
+        "-n", "--repeats",
+        dest="repeats",
+        type="int",
+        default=None,
+        help="Optional: Number of timed repeats per benchmark (default: per benchmark)",
+    )
+    parser.add_option(
+        "-t", "--threshold",
+        dest="threshold",
+        type="float",
+        default=REGRESSION_THRESHOLD,
+        help=f"Optional: Relative slowdown of 'compare' reported as regression "
+             f"(default: {REGRESSION_THRESHOLD})",
+    )
+    options, args = parser.parse_args()
+
+    if not args or args[0] not in ("run", "compare"):
+        parser.print_help()
+        sys.exit(1)
+
+    if args[0] == "run":
+        names = None
+        if options.benchmarks:
+            names = [name.strip() for name in options.benchmarks.split(",")]
+            unknown = [name for name in names if name not in BENCHMARKS]
+            if unknown:
+                parser.error(f"Unknown benchmarks: {unknown}")
+        results = run_benchmarks(names=names, repeats=options.repeats)
+        if options.output:
+            output = Path(options.output)
+        else:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            output = RESULTS_PATH / "benchmarks" / f"benchmark_{timestamp}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w") as f_json:
+            json.dump(results, f_json, indent=2)
+        console.print(f"Benchmark results: file://{output}", style="success")
+
+        from pkdb_models.models.dulaglutide.benchmarks.history import (
+            history_path,
+            record_benchmarks,
+        )
+
+        record_benchmarks(results)
+        console.print(f"Runtime history: file://{history_path()}")
+
+    else:
+        if len(args) != 3:
+            parser.error("'compare' requires the BASELINE and CURRENT results.")
+        regressions = compare(
+            _read(Path(args[1])), _read(Path(args[2])), threshold=options.threshold
+        )
+        if regressions:
+            console.print(f"Regressions: {regressions}", style="error")
+            sys.exit(1)
+        console.print("No regressions", style="success")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Content-addressed on-disk cache for simulation results.
+
+Results of simulation tasks are stored as compressed numpy archives. The file
+name is the hash of all information which determines the result of the task,
+i.e., the SBML model, the simulation definition (changes, segments, scan
+dimensions), the integrator tolerances and the selections. The versions of
+the package and sbmlsim and the sources of the simulator modules are part of
+the key, so results of changed simulation code are never reused.
+"""
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import xarray as xr
+from sbmlutils import log
+
+logger = log.get_logger(__name__)
+
+# modules which determine the results of the simulation tasks
+SIMULATOR_MODULES: List[str] = [
+    "cache.py",
+    "checkpoint.py",
+    "dosing.py",
+    "result_store.py",
+    "sampling.py",
+    "simulator.py",
+    "steady_state.py",
+]
+
+
+def _json_default(obj: Any) -> Any:
+    """Canonical JSON representation of simulation objects."""
+    if hasattr(obj, "magnitude") and hasattr(obj, "units"):
+        # pint Quantity
+        return {"magnitude": obj.magnitude, "units": str(obj.units)}
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    if hasattr(obj, "__dict__"):
+        # simulation definitions (TimecourseSim, Timecourse, ScanSim, Dimension)
+        d = {k: v for k, v in vars(obj).items() if k != "time"}
+        d["__class__"] = obj.__class__.__name__
+        return d
+    return str(obj)
+
+
+def hash_content(*items: Any) -> str:
+    """Calculate a stable sha256 hash for the given items."""
+    content = json.dumps(items, default=_json_default, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def simulator_hash() -> str:
+    """Hash of the package and sbmlsim versions and the simulator modules."""
+    import sbmlsim
+
+    try:
+        version = metadata.version("dulaglutide-model")
+    except metadata.PackageNotFoundError:
+        version = None
+    sha = hashlib.sha256()
+    for module in SIMULATOR_MODULES:
+        sha.update((Path(__file__).parent / module).read_bytes())
+    return hash_content(version, sbmlsim.__version__, sha.hexdigest())
+
+
+def write_dataset(path: Path, xds: xr.Dataset) -> None:
+    """Write dataset as compressed numpy archive.
+
+    The variable names of the results (e.g. '[Cve_dul]') are not valid netCDF
+    names, therefore the arrays are stored with generic keys and the names,
+    dimensions and attributes are stored as JSON metadata. The attributes of
+    the dataset (e.g. the integrator statistics) are stored as well.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    meta: Dict[str, Dict] = {"coords": {}, "data_vars": {}, "attrs": dict(xds.attrs)}
+    for prefix, field, variables in [
+        ("c", "coords", xds.coords),
+        ("v", "data_vars", xds.data_vars),
+    ]:
+        for k, (name, xda) in enumerate(variables.items()):
+            key = f"{prefix}{k}"
+            arrays[key] = xda.values
+            meta[field][name] = {
+                "key": key,
+                "dims": list(xda.dims),
+                "attrs": dict(xda.attrs),
+            }
+    arrays["__meta__"] = np.frombuffer(
+        json.dumps(meta, default=str).encode("utf-8"), dtype=np.uint8
+    )
+    with open(path, "wb") as f_npz:
+        np.savez_compressed(f_npz, **arrays)
+
+
+def read_dataset(path: Path) -> xr.Dataset:
+    """Read dataset written with `write_dataset`."""
+    with np.load(path, allow_pickle=False) as npz:
+        meta = json.loads(npz["__meta__"].tobytes().decode("utf-8"))
+        coords = {
+            name: (info["dims"], npz[info["key"]], info["attrs"])
+            for name, info in meta["coords"].items()
+        }
+        data_vars = {
+            name: (info["dims"], npz[info["key"]], info["attrs"])
+            for name, info in meta["data_vars"].items()
+        }
+    # entries of previous versions have no dataset attributes
+    attrs = meta.get("attrs", {})
+    return xr.Dataset(data_vars=data_vars, coords=coords, attrs=attrs)
+
+
+class ResultCache:
+    """Cache of simulation results keyed by content hash."""
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self,
+        model_hash: str,
+        simulation: Any,
+        tolerances: Dict[str, float],
+        selections: Optional[List[str]],
+        sampling: Optional[Dict[str, Any]] = None,
+        step_statistics: bool = False,
+    ) -> str:
+        """Key for a simulation task.
+
+        :param sampling: settings of the output sampling, None for the dense
+            output of the integrator
+        :param step_statistics: results with integrator statistics
+        """
+        items = [
+            simulator_hash(),
+            model_hash,
+            simulation,
+            tolerances,
+            sorted(selections) if selections else None,
+        ]
+        if sampling is not None:
+            items.append(sampling)
+        if step_statistics:
+            items.append("step_statistics")
+        return hash_content(*items)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_path / key[:2] / f"{key}.npz"
+
+    def __contains__(self, key: str) -> bool:
+        """Result for key is cached (not counted as hit or miss)."""
+        return self._path(key).exists()
+
+    def load(self, key: str) -> Optional[xr.Dataset]:
+        """Load the cached dataset for key; None if not cached."""
+        path = self._path(key)
+        if not path.exists():
+            self.misses += 1
+            return None
+        try:
+            xds = read_dataset(path)
+        except Exception as err:
+            logger.warning(f"Corrupt cache entry '{path}' is ignored: {err}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return xds
+
+    def store(self, key: str, xds: xr.Dataset) -> None:
+        """Store dataset for key.
+
+        The dataset is written to a temporary file which is moved in place,
+        so parallel workers never read partially written entries.
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        write_dataset(tmp_path, xds)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        if self.cache_path.exists():
+            shutil.rmtree(self.cache_path)
+            logger.info(f"Cache cleared: '{self.cache_path}'")
@@ -0,0 +1,144 @@
+"""Checkpoints of the model state at segment boundaries of timecourse simulations.
+
+Long multi-segment simulations (e.g. years of weekly dosing) store the model
+state at configurable segment boundaries. A checkpoint contains the values of
+all species, compartments and parameters which are not determined by
+assignment rules (including the rate rule parameters 'SCDOSE_dul',
+'IVDOSE_dul' and 'DFAT') and the results since the previous checkpoint of
+the simulation, so the stored results grow linearly with the segments. The
+results up to a checkpoint are read from the chain of previous checkpoints
+(`CheckpointStore.load_results`).
+
+Checkpoints are keyed by the model, tolerances, selections and the segments
+up to the boundary. A failed or interrupted simulation resumes from its last
+checkpoint; simulations which share the segments up to a checkpoint (what-if
+scenarios) fork from it.
+"""
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from sbmlutils import log
+
+logger = log.get_logger(__name__)
+
+
+@dataclass
+class Checkpoint:
+    """Model state after a number of segments and the results since `previous`.
+
+    `previous` is the key of the previous checkpoint of the simulation, None
+    for the first checkpoint.
+    """
+
+    segment: int
+    t_offset: float
+    values: Dict[str, float]
+    columns: List[str]
+    data: np.ndarray
+    previous: Optional[str] = None
+
+    def write(self, path: Path) -> None:
+        """Write checkpoint as compressed numpy archive."""
+        meta = {
+            "segment": self.segment,
+            "t_offset": self.t_offset,
+            "ids": list(self.values.keys()),
+            "columns": self.columns,
+            "previous": self.previous,
+        }
+        with open(path, "wb") as f_npz:
+            np.savez_compressed(
+                f_npz,
+                values=np.array(list(self.values.values()), dtype=float),
+                data=self.data,
+                __meta__=np.frombuffer(
+                    json.dumps(meta).encode("utf-8"), dtype=np.uint8
+                ),
+            )
+
+    @staticmethod
+    def read(path: Path) -> "Checkpoint":
+        """Read checkpoint written with `write`."""
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(npz["__meta__"].tobytes().decode("utf-8"))
+            return Checkpoint(
+                segment=meta["segment"],
+                t_offset=meta["t_offset"],
+                values=dict(zip(meta["ids"], npz["values"].tolist())),
+                columns=meta["columns"],
+                data=npz["data"],
+                # checkpoints of previous versions contain all results
+                previous=meta.get("previous"),
+            )
+
+
+class CheckpointStore:
+    """Directory of checkpoints keyed by content hash."""
+
+    def __init__(self, checkpoint_path: Path, every: int = 10):
+        """Create checkpoint store.
+
+        :param checkpoint_path: directory of the checkpoints
+        :param every: number of segments between checkpoints, the state after
+            the last segment is always stored
+        """
+        if every < 1:
+            raise ValueError(f"'every' must be >= 1, but '{every}'.")
+        self.checkpoint_path = Path(checkpoint_path)
+        self.every = every
+
+    def _path(self, key: str) -> Path:
+        return self.checkpoint_path / key[:2] / f"{key}.npz"
+
+    def load(self, key: str) -> Optional[Checkpoint]:
+        """Load the checkpoint for key; None if not stored."""
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            return Checkpoint.read(path)
+        except Exception as err:
+            logger.warning(f"Corrupt checkpoint '{path}' is ignored: {err}")
+            return None
+
+    def load_results(self, checkpoint: Checkpoint) -> Optional[np.ndarray]:
+        """Results up to the checkpoint from the chain of previous checkpoints.
+
+        None if a previous checkpoint is missing or corrupt.
+        """
+        blocks: List[np.ndarray] = [checkpoint.data]
+        previous = checkpoint.previous
+        while previous is not None:
+            previous_checkpoint = self.load(previous)
+            if previous_checkpoint is None:
+                logger.warning(f"Previous checkpoint '{previous}' is missing")
+                return None
+            blocks.append(previous_checkpoint.data)
+            previous = previous_checkpoint.previous
+        blocks = [block for block in reversed(blocks) if block.size]
+        if not blocks:
+            return np.empty((0, len(checkpoint.columns)))
+        return np.vstack(blocks)
+
+    def store(self, key: str, checkpoint: Checkpoint) -> None:
+        """Store checkpoint for key.
+
+        The checkpoint is written to a temporary file which is moved in place,
+        so an interrupted simulation never leaves a partially written checkpoint.
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        checkpoint.write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        """Remove all checkpoints."""
+        if self.checkpoint_path.exists():
+            shutil.rmtree(self.checkpoint_path)
+            logger.info(f"Checkpoints cleared: '{self.checkpoint_path}'")
@@ -3,13 +3,26 @@ Reusable functionality for multiple simulation experiments.
 """
 
 from collections import namedtuple
-from typing import Dict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
 import pandas as pd
 
 from pkdb_models.models.dulaglutide.dulaglutide_pk import calculate_dulaglutide_pk
 from pkdb_models.models.dulaglutide import MODEL_PATH
-from sbmlsim.experiment import SimulationExperiment
+from pkdb_models.models.dulaglutide.model_cache import CachedRoadrunnerSBMLModel
+from pkdb_models.models.dulaglutide.profiling import is_profiling, profile_phase
+from pkdb_models.models.dulaglutide.rendering import FigureRenderer
+from pkdb_models.models.dulaglutide.selections import (
+    figure_selections,
+    fit_mapping_selections,
+    selection_data,
+)
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+from pkdb_models.models.dulaglutide.telemetry import record_task, telemetry_phase
+from sbmlsim.experiment import ExperimentRunner, SimulationExperiment
 from sbmlsim.model import AbstractModel
+from sbmlsim.plot.serialization_matplotlib import FigureMPL
 from sbmlsim.task import Task
 
 
@@ -24,6 +37,32 @@ def convert_fpg(value: float, unit: str = "mg/dl"):
     elif unit == "mM":
         return value
 
+
+# model of all experiments, shared to be resolved once per experiment runner
+MODEL = AbstractModel(
+    source=MODEL_PATH,
+    language_type=AbstractModel.LanguageType.SBML,
+    changes={},
+)
+
+
+class DulaglutideExperimentRunner(ExperimentRunner):
+    """ExperimentRunner which loads the model via the model cache.
+
+    sbmlsim compiles the models of the experiments from the SBML. The shared
+    `MODEL` is resolved to a `CachedRoadrunnerSBMLModel` before the
+    experiments are initialized, so sbmlsim finds it in the runner models.
+    """
+
+    def initialize(self, experiment_classes, **kwargs):
+        """Initialize the experiments with the cached model."""
+        if MODEL not in self.models:
+            self.models[MODEL] = CachedRoadrunnerSBMLModel.from_abstract_model(
+                abstract_model=MODEL, ureg=self.ureg
+            )
+        super().initialize(experiment_classes, **kwargs)
+
+
 class DulaglutideSimulationExperiment(SimulationExperiment):
     """Base class for all SimulationExperiments."""
 
@@ -33,6 +72,9 @@ class DulaglutideSimulationExperiment(SimulationExperiment):
     legend_font_size = 9
     suptitle_font_size = 25
 
+    # figures are rendered by the renderer if set (see `rendering`)
+    renderer: Optional[FigureRenderer] = None
+
     # labels
     label_time = "time"
     label_dul = "dulaglutide plasma"
@@ -147,14 +189,7 @@ class DulaglutideSimulationExperiment(SimulationExperiment):
     }
 
     def models(self) -> Dict[str, AbstractModel]:
-        Q_ = self.Q_
-        return {
-            "model": AbstractModel(
-                source=MODEL_PATH,
-                language_type=AbstractModel.LanguageType.SBML,
-                changes={},
-            )
-        }
+        return {"model": MODEL}
 
     @staticmethod
     def _default_changes(Q_):
@@ -190,49 +225,134 @@ class DulaglutideSimulationExperiment(SimulationExperiment):
         return {}
 
     def data(self) -> Dict:
-        self.add_selections_data(
-            selections=[
-                "time",
-
-                # dosing
-                "IVDOSE_dul",
-                "SCDOSE_dul",
-
-                # venous plasma
-                "[Cve_dul]",
-                "[Cve_dm]",
-                "[Cve_dmtot]",
-
-                # urine
-                "Aurine_dm",
-
-                # feces
-                "Afeces_dm",
-
-                # cases
-                'KI__f_renal_function',
-                'f_cirrhosis',
-                'BW',
-
-                # pharmacodynamics
-                "BW0",
-                "BW",
-                "BW_change",
-                "BW_ratio",
-
-                "hba1c0",
-                "hba1c",
-                "hba1c_change",
-                "hba1c_ratio",
-
-                "fpg0",
-                "[fpg]",
-                "fpg_change",
-                "fpg_ratio",
-            ]
-        )
+        """Register the selections of the tasks.
+
+        Only the selections read by the figures, the fit mappings and
+        `selections_mpl` are requested from the integrator. Use
+        `reduced_selections=False` in the runner for all selections.
+        """
+        for task_id, selections in self.task_selections().items():
+            for selection in sorted(selections):
+                self.add_data(selection_data(selection, task_id=task_id))
         return {}
 
+    def selections_mpl(self) -> List[str]:
+        """Selections read from the results of all tasks in `figures_mpl`."""
+        return []
+
+    def task_selections(self) -> Dict[str, Set[str]]:
+        """Selections of the tasks inferred from the figures and fit mappings."""
+        selections = {
+            task_id: {"time", *self.selections_mpl()} for task_id in self._tasks
+        }
+        figure_selections(self.figures().values(), selections)
+        fit_mapping_selections(self.fit_mappings().values(), selections)
+        return selections
+
+    @contextmanager
+    def _phase(self, phase: str) -> Iterator[None]:
+        """Profile the phase and record its telemetry."""
+        name = self.__class__.__name__
+        with profile_phase(name, phase), telemetry_phase(name, phase):
+            yield
+
+    def initialize(self) -> None:
+        """Initialize experiment (definitions and datasets)."""
+        with self._phase("initialize"):
+            super().initialize()
+
+    def run(self, simulator, output_path: Path = None, **kwargs):
+        """Execute experiment.
+
+        The results of a `DulaglutideSimulator` with `stream_results` are
+        streamed to 'results' in the output path.
+        """
+        with self._phase("other"):
+            if not isinstance(simulator, DulaglutideSimulator) or output_path is None:
+                return super().run(simulator, output_path=output_path, **kwargs)
+
+            with simulator.streaming(output_path / "results"):
+                return super().run(simulator, output_path=output_path, **kwargs)
+
+    def evaluate_fit_mappings(self):
+        """Evaluate fit mappings."""
+        with self._phase("fit_mappings"):
+            return super().evaluate_fit_mappings()
+
+    def save_results(self, results_path: Path) -> None:
+        """Save results, streamed results are already stored in 'results'."""
+        for rkey, xres in self.results.items():
+            if "result_store" in xres.xds.attrs:
+                continue
+            xres.to_netcdf(results_path / f"{self.sid}_{rkey}.nc")
+            xres.to_tsv(results_path / f"{self.sid}_{rkey}.tsv")
+
+    def create_mpl_figures(self) -> Dict[str, FigureMPL]:
+        """Create matplotlib figures, none if the renderer has no formats."""
+        if self.renderer is not None and not self.renderer.formats:
+            return {}
+        with self._phase("figures"):
+            return super().create_mpl_figures()
+
+    def save_mpl_figures(
+        self,
+        results_path: Path,
+        mpl_figures: Dict[str, FigureMPL],
+        figure_formats: List[str] = None,
+    ) -> Dict[str, List[Path]]:
+        """Save matplotlib figures.
+
+        With a renderer the figures are handed to the renderer in its formats
+        and saved in the background. The figures are rendered immediately when
+        profiling, so the rendering is attributed to the experiment.
+        """
+        with self._phase("render"):
+            if self.renderer is None:
+                return super().save_mpl_figures(
+                    results_path, mpl_figures=mpl_figures, figure_formats=figure_formats
+                )
+            paths = self.renderer.submit_figures(
+                self.sid, results_path=results_path, mpl_figures=mpl_figures
+            )
+            if is_profiling():
+                self.renderer.wait()
+            return paths
+
+    def _run_tasks(self, simulator, reduced_selections: bool = True):
+        """Run simulations and scans.
+
+        The independent tasks are executed in parallel by the task workers of
+        a `DulaglutideSimulator` with `task_jobs` > 1. Otherwise the tasks are
+        planned first, so the timecourses of all tasks share the integration
+        of their common prefixes (see `DulaglutideSimulator.planning`).
+        """
+        with self._phase("simulate"):
+            if not isinstance(simulator, DulaglutideSimulator):
+                return super()._run_tasks(
+                    simulator, reduced_selections=reduced_selections
+                )
+
+            if simulator.task_jobs == 1:
+                with simulator.planning():
+                    super()._run_tasks(
+                        simulator, reduced_selections=reduced_selections
+                    )
+
+            if len(self._tasks) < 2:
+                super()._run_tasks(simulator, reduced_selections=reduced_selections)
+            else:
+                with simulator.parallel_tasks():
+                    super()._run_tasks(
+                        simulator, reduced_selections=reduced_selections
+                    )
+                for task_key, result in self._results.items():
+                    self._results[task_key] = simulator.collect(result)
+
+            for task_key, result in self._results.items():
+                record_task(
+                    self.__class__.__name__, task_key, simulator.task_telemetry(result)
+                )
+
     @property
     def Mr(self):
         return MolecularWeights(
@@ -271,16 +391,17 @@ class DulaglutideSimulationExperiment(SimulationExperiment):
     def calculate_dulaglutide_pk(self, scans: list = []) -> Dict[str, pd.DataFrame]:
        """Calculate pk parameters for simulations (scans)"""
        pk_dfs = {}
-       if scans:
-           for sim_key in scans:
-               xres = self.results[f"task_{sim_key}"]
-               df = calculate_dulaglutide_pk(experiment=self, xres=xres)
-               pk_dfs[sim_key] = df
-       else:
-           for sim_key in self._simulations.keys():
-               xres = self.results[f"task_{sim_key}"]
-               df = calculate_dulaglutide_pk(experiment=self, xres=xres)
-               pk_dfs[sim_key] = df
+       with self._phase("pharmacokinetics"):
+           if scans:
+               for sim_key in scans:
+                   xres = self.results[f"task_{sim_key}"]
+                   df = calculate_dulaglutide_pk(experiment=self, xres=xres)
+                   pk_dfs[sim_key] = df
+           else:
+               for sim_key in self._simulations.keys():
+                   xres = self.results[f"task_{sim_key}"]
+                   df = calculate_dulaglutide_pk(experiment=self, xres=xres)
+                   pk_dfs[sim_key] = df
        return pk_dfs
 
     # def calculate_rivaroxaban_pd(self, scans: list = []) -> Dict[str, pd.DataFrame]:
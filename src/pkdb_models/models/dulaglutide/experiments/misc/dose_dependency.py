@@ -2,11 +2,12 @@
 from typing import Dict
 
 from sbmlsim.plot import Axis, Figure, Plot
-from sbmlsim.simulation import Timecourse, TimecourseSim
+from sbmlsim.simulation import TimecourseSim
 
 from pkdb_models.models.dulaglutide.experiments.base_experiment import (
     DulaglutideSimulationExperiment,
 )
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
 from pkdb_models.models.dulaglutide.helpers import run_experiments
 
 
@@ -27,35 +28,17 @@ class DoseDependencyExperiment(DulaglutideSimulationExperiment):
             for route in routes:
                 for dose in self.doses:
 
-                    tc0 = Timecourse(
-                        start=0,
-                        end=7 * 24 * 60,  # [min]  every week
-                        steps=1000,
+                    tcsims[f"dul_{substance}_{route}_{dose}"] = RepeatedDosingSim(
                         changes={
                             **self.default_changes(),
-                            f"{route}DOSE_{substance}": Q_(dose, "mg"),
                         },
-                    )
-                    tc1 = Timecourse(
-                        start=0,
-                        end=7 * 24 * 60,  # [min]  every week
-                        steps=1000,
-                        changes={
+                        dose_changes={
                             f"{route}DOSE_{substance}": Q_(dose, "mg"),
                         },
-                    )
-                    tc2 = Timecourse(
-                        start=0,
-                        end=8 * 7 * 24 * 60,  # [min]  8 weeks
+                        interval=7 * 24 * 60,  # [min]  every week
+                        n_doses=5,
                         steps=1000,
-                        changes={
-                            f"{route}DOSE_{substance}": Q_(dose, "mg"),
-                        },
-                    )
-
-                    tcsims[f"dul_{substance}_{route}_{dose}"] = TimecourseSim(
-                        [tc0] + [tc1 for _ in range(3)] + [tc2],
-                        time_offset=0
+                        last_interval=8 * 7 * 24 * 60,  # [min]  8 weeks
                     )
 
 
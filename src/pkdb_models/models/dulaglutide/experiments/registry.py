@@ -0,0 +1,352 @@
+"""Lightweight registry of the simulation experiments.
+
+Experiment names and groups are resolved without importing the experiment
+modules (and with them sbmlsim, matplotlib and pandas), e.g., for the command
+line interface. The modules of the experiment classes are read from the
+imports of the experiment packages; the classes are only imported on demand
+with `experiment_class`.
+
+Metadata of the experiments (groups, dataset ids, number of tasks, the
+simulated horizon in [min], the segments and output points of all tasks and
+the number of selections) is stored in the generated manifest
+'registry.json' in the results directory. Entries are keyed by the hash of
+the sources the metadata depends on (experiment module, shared modules and
+model) and rebuilt if one of them changed, i.e., the metadata can be queried
+without importing the experiments. The manifest is updated by every run of
+the experiments and can be rebuilt with
+
+    python -m pkdb_models.models.dulaglutide.experiments.registry
+"""
+import ast
+import hashlib
+import importlib
+import json
+import optparse
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from sbmlutils import log
+from sbmlutils.console import console
+
+logger = log.get_logger(__name__)
+
+EXPERIMENTS_PATH = Path(__file__).parent
+PACKAGE_PATH = EXPERIMENTS_PATH.parent
+
+# modules shared by the experiments, the entries of all experiments are
+# rebuilt if they changed
+SHARED_MODULES: List[str] = [
+    "experiments/base_experiment.py",
+    "experiments/metadata.py",
+    "dosing.py",
+    "selections.py",
+    "simulator.py",
+]
+
+# packages with the experiment classes
+EXPERIMENT_PACKAGES: List[str] = ["studies", "misc", "scans"]
+
+EXPERIMENT_GROUPS: Dict[str, List[str]] = {
+    "studies": [
+        "Barrington2011",
+        "Barrington2011a",
+        "Blonde2015",
+        "Chen2018",
+        "Dungan2014",
+        "Dungan2016",
+        "FDAGBCM",
+        "FDAGBCN",
+        "FDAGBDO",
+        "FDAGBDR",
+        "Gao2024",
+        "Gerstein2019",
+        "Giorgino2015",
+        "Liu2025",
+        "Nauck2014",
+        "Pratley2018",
+        "Xu2022",
+        "Zhang2023",
+    ],
+    "hepatic_impairment": [
+    ],
+    "renal_impairment": [
+    ],
+    "misc": [
+        "DoseDependencyExperiment",
+    ],
+    "scan": [
+        "DulaglutideParameterScan",
+    ],
+}
+EXPERIMENT_GROUPS["all"] = (
+    EXPERIMENT_GROUPS["studies"] + EXPERIMENT_GROUPS["misc"] + EXPERIMENT_GROUPS["scan"]
+)
+
+# fields of the manifest entries, entries without them are rebuilt
+MANIFEST_FIELDS: List[str] = [
+    "module",
+    "source_hash",
+    "groups",
+    "datasets",
+    "tasks",
+    "horizon",
+    "segments",
+    "points",
+    "selections",
+]
+
+
+@lru_cache(maxsize=None)
+def experiment_modules() -> Dict[str, str]:
+    """Modules of the experiment classes by class name.
+
+    Parsed from the relative imports in the '__init__.py' of the experiment
+    packages, e.g. 'from .xu2022 import Xu2022'.
+    """
+    modules: Dict[str, str] = {}
+    for package in EXPERIMENT_PACKAGES:
+        init_path = EXPERIMENTS_PATH / package / "__init__.py"
+        tree = ast.parse(init_path.read_text(), filename=str(init_path))
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom) and node.level == 1 and node.module:
+                for alias in node.names:
+                    modules[alias.asname or alias.name] = (
+                        f"{__package__}.{package}.{node.module}"
+                    )
+    return modules
+
+
+def experiment_class(name: str) -> Type:
+    """Import the experiment class with the given name."""
+    modules = experiment_modules()
+    if name not in modules:
+        raise KeyError(f"Unknown experiment '{name}'.")
+    module = importlib.import_module(modules[name])
+    return getattr(module, name)
+
+
+def experiment_classes(names: Iterable[str]) -> List[Type]:
+    """Import the experiment classes with the given names."""
+    return [experiment_class(name) for name in names]
+
+
+def resolve_experiment_names(names: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """Resolve experiment and group names to experiment names.
+
+    Returns the experiment names and the names which were not found.
+    """
+    modules = experiment_modules()
+    experiment_names: List[str] = []
+    not_found: List[str] = []
+    for name in names:
+        if name in EXPERIMENT_GROUPS:
+            experiment_names.extend(EXPERIMENT_GROUPS[name])
+        elif name in modules:
+            experiment_names.append(name)
+        else:
+            not_found.append(name)
+    return experiment_names, not_found
+
+
+def experiment_groups(name: str) -> List[str]:
+    """Groups of the experiment."""
+    return [group for group, names in EXPERIMENT_GROUPS.items() if name in names]
+
+
+def manifest_path() -> Path:
+    """Path of the manifest in the (current) results directory."""
+    import pkdb_models.models.dulaglutide as dulaglutide
+
+    return dulaglutide.RESULTS_PATH / "registry.json"
+
+
+@lru_cache(maxsize=None)
+def shared_hash() -> str:
+    """Hash of the shared modules and the model of the experiments."""
+    from pkdb_models.models.dulaglutide import MODEL_PATH
+
+    sha = hashlib.sha256()
+    for path in [PACKAGE_PATH / module for module in SHARED_MODULES] + [MODEL_PATH]:
+        sha.update(path.read_bytes() if path.exists() else b"")
+    return sha.hexdigest()
+
+
+def source_hash(name: str) -> str:
+    """Hash of the sources of the experiment class.
+
+    Module of the experiment class, shared modules and model.
+    """
+    package, module = experiment_modules()[name].split(".")[-2:]
+    source = (EXPERIMENTS_PATH / package / f"{module}.py").read_bytes()
+    return hashlib.sha256(source + shared_hash().encode("utf-8")).hexdigest()
+
+
+def experiment_info(experiment) -> Dict[str, Any]:
+    """Manifest entry of an initialized simulation experiment."""
+    name = experiment.__class__.__name__
+    horizon = 0.0
+    segments, points = 0, 0
+    for simulation in experiment._simulations.values():
+        # scans are described by the simulation of a single point
+        tcsim = getattr(simulation, "simulation", simulation)
+        duration = sum(tc.end - tc.start for tc in tcsim.timecourses)
+        horizon = max(horizon, float(duration))
+        n_simulations = len(simulation.indices()) if tcsim is not simulation else 1
+        segments += n_simulations * len(tcsim.timecourses)
+        points += n_simulations * sum(tc.steps + 1 for tc in tcsim.timecourses)
+    # reduced selections of the tasks (see `SimulationExperiment._run_tasks`)
+    selections = {"time"} | {
+        data.selection for data in experiment._data.values() if data.is_task()
+    }
+    return {
+        "module": experiment_modules()[name],
+        "source_hash": source_hash(name),
+        "groups": experiment_groups(name),
+        "datasets": sorted(experiment._datasets.keys()),
+        "tasks": len(experiment._tasks),
+        "horizon": horizon,
+        "segments": segments,
+        "points": points,
+        "selections": len(selections),
+    }
+
+
+def read_manifest(path: Optional[Path] = None) -> Dict[str, Dict[str, Any]]:
+    """Read the manifest, empty if not available."""
+    if path is None:
+        path = manifest_path()
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r") as f_json:
+            return json.load(f_json)
+    except (OSError, ValueError) as err:
+        logger.warning(f"Experiment manifest '{path}' is ignored: {err}")
+        return {}
+
+
+def stale_experiments(
+    manifest: Dict[str, Dict[str, Any]], names: Optional[Iterable[str]] = None
+) -> List[str]:
+    """Experiments without entry or with changed sources in the manifest."""
+    if names is None:
+        names = experiment_modules().keys()
+    return [
+        name
+        for name in names
+        if name not in manifest
+        or any(field not in manifest[name] for field in MANIFEST_FIELDS)
+        or manifest[name]["source_hash"] != source_hash(name)
+    ]
+
+
+def update_manifest(
+    infos: Dict[str, Dict[str, Any]], path: Optional[Path] = None
+) -> None:
+    """Update the entries of the manifest.
+
+    Entries of experiments which are no longer registered are removed.
+    """
+    if path is None:
+        path = manifest_path()
+    modules = experiment_modules()
+    manifest = {
+        name: info
+        for name, info in {**read_manifest(path), **infos}.items()
+        if name in modules
+    }
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as f_json:
+            json.dump(manifest, f_json, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as err:
+        # e.g. read-only results directory
+        logger.warning(f"Experiment manifest '{path}' not updated: {err}")
+
+
+def build_manifest(
+    names: Optional[Iterable[str]] = None, path: Optional[Path] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Build the manifest entries of the experiments (stale ones if None).
+
+    Imports and initializes the experiments.
+    """
+    from pkdb_models.models.dulaglutide import DATA_PATHS, DULAGLUTIDE_PATH
+    from pkdb_models.models.dulaglutide.experiments.base_experiment import (
+        DulaglutideExperimentRunner,
+    )
+
+    if names is None:
+        names = stale_experiments(read_manifest(path))
+    names = list(names)
+    if names:
+        runner = DulaglutideExperimentRunner(
+            experiment_classes(names),
+            base_path=DULAGLUTIDE_PATH,
+            data_path=DATA_PATHS,
+        )
+        update_manifest(
+            {
+                experiment.__class__.__name__: experiment_info(experiment)
+                for experiment in runner.experiments.values()
+            },
+            path=path,
+        )
+    return read_manifest(path)
+
+
+def experiment_manifest(rebuild: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Up-to-date entries of the manifest.
+
+    Stale entries are rebuilt (imports the stale experiments) or omitted.
+    """
+    manifest = read_manifest()
+    stale = stale_experiments(manifest)
+    if stale and rebuild:
+        manifest = build_manifest(stale)
+        stale = []
+    return {name: info for name, info in manifest.items() if name not in stale}
+
+
+def select_experiments(
+    group: str = "all",
+    predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    rebuild: bool = False,
+) -> List[str]:
+    """Names of the experiments of the group matching the predicate.
+
+    E.g., experiments with data:
+        select_experiments("studies", lambda info: len(info["datasets"]) > 0)
+    """
+    manifest = experiment_manifest(rebuild=rebuild)
+    return [
+        name
+        for name in EXPERIMENT_GROUPS[group]
+        if name in manifest and (predicate is None or predicate(manifest[name]))
+    ]
+
+
+def main() -> None:
+    parser = optparse.OptionParser()
+    parser.add_option(
+        "--all",
+        dest="all",
+        action="store_true",
+        default=False,
+        help="Optional: Rebuild the entries of all experiments, not only the stale ones",
+    )
+    options, _ = parser.parse_args()
+    names = list(experiment_modules()) if options.all else None
+    manifest = build_manifest(names)
+    console.print(
+        f"Experiment manifest with {len(manifest)} experiments: file://{manifest_path()}",
+        style="success",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 """Parameter scans dulglutide."""
-from typing import Dict
+from typing import Dict, List
 
 import matplotlib.axes
 import matplotlib.cm as cm
@@ -82,6 +82,22 @@ class DulaglutideParameterScan(DulaglutideSimulationExperiment):
         },
     }
 
+    def selections_mpl(self) -> List[str]:
+        return [
+            # timecourses
+            "[Cve_dul]",
+            "[Cve_dm]",
+            "Aurine_dm",
+            "Afeces_dm",
+            "BW_change",
+            "hba1c_change",
+            "fpg_change",
+            # pharmacokinetics
+            "SCDOSE_dul",
+            # scanned parameters
+            *[scan_data["parameter"] for scan_data in self.scan_map.values()],
+        ]
+
     def simulations(self) -> Dict[str, ScanSim]:
         Q_ = self.Q_
         tcscans = {}
@@ -13,8 +13,9 @@ from pkdb_models.models.dulaglutide.experiments.metadata import (
 )
 
 from sbmlsim.plot import Axis, Figure
-from sbmlsim.simulation import Timecourse, TimecourseSim
+from sbmlsim.simulation import TimecourseSim
 
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
 from pkdb_models.models.dulaglutide.helpers import run_experiments
 
 from sbmlsim.plot import Figure
@@ -99,11 +100,8 @@ class Barrington2011a(DulaglutideSimulationExperiment):
         Q_ = self.Q_
         tcsims = {}
         for intervention in self.interventions:
-            tc0 = Timecourse(
-                start=0,
-                end=168*60,  # [min]
-                steps = 1000,
-                changes = {
+            tcsims[f"dul_{intervention}"] = RepeatedDosingSim(
+                changes={
                     **self.default_changes(),
                     # physiological changes
                     "BW0": Q_(self.bodyweights[intervention], "kg"),
@@ -111,29 +109,14 @@ class Barrington2011a(DulaglutideSimulationExperiment):
                     "hba1c": Q_(self.hba1cs[intervention], "percent"),
                     "fpg0": Q_(self.fpgs[intervention], "mg/dl")/self.Mr.glc,
                     "[fpg]": Q_(self.fpgs[intervention], "mg/dl")/self.Mr.glc,
-
-                    # dose
-                    "SCDOSE_dul": Q_(self.doses[intervention], "mg")
                 },
-            )
-            tc1 = Timecourse(
-                start = 0,
-                end = 168*60, #[min]
-                steps = 1000,
-                changes = {
-                    "SCDOSE_dul": Q_(self.doses[intervention], "mg")
+                dose_changes={
+                    "SCDOSE_dul": Q_(self.doses[intervention], "mg"),
                 },
-            )
-            tc2 = Timecourse(
-                start = 0,
-                end = 400*60, #[min]
-                steps = 1000,
-                changes = {
-                    "SCDOSE_dul": Q_(self.doses[intervention], "mg")
-                },
-            )
-            tcsims[f"dul_{intervention}"] = TimecourseSim(
-                [tc0] + [tc1 for _ in range(3)] + [tc2]
+                interval=168 * 60,  # [min]
+                n_doses=5,
+                steps=1000,
+                last_interval=400*60,  # [min]
             )
 
         # console.print(tcsims.keys())
@@ -13,8 +13,9 @@ from pkdb_models.models.dulaglutide.experiments.metadata import (
 )
 
 from sbmlsim.plot import Axis, Figure
-from sbmlsim.simulation import Timecourse, TimecourseSim
+from sbmlsim.simulation import TimecourseSim
 
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
 from pkdb_models.models.dulaglutide.helpers import run_experiments
 
 
@@ -58,11 +59,8 @@ class Dungan2014(DulaglutideSimulationExperiment):
         Q_ = self.Q_
         tcsims = {}
         for intervention in self.interventions:
-            tc0 = Timecourse(
-                start = 0,
-                end = 168*60,
-                steps = 1000,
-                changes = {
+            tcsims[f"dul_{intervention}"] = RepeatedDosingSim(
+                changes={
                     **self.default_changes(),
                     #physiological changes
                     "BW0": Q_(self.bodyweights[intervention], "kg"),
@@ -70,21 +68,13 @@ class Dungan2014(DulaglutideSimulationExperiment):
                     "hba1c": Q_(self.hba1cs[intervention], "percent"),
                     "fpg0": Q_(self.fpgs[intervention], "mM"),
                     "[fpg]": Q_(self.fpgs[intervention], "mM"),
-
-                    #dose (SCDOSE)
-                    "SCDOSE_dul": Q_(self.doses[intervention], "mg")
                 },
-            )
-            tc1 = Timecourse(
-                start = 0,
-                end = 168*60, #[min]
-                steps = 1000,
-                changes = {
-                    "SCDOSE_dul": Q_(self.doses[intervention], "mg")
+                dose_changes={
+                    "SCDOSE_dul": Q_(self.doses[intervention], "mg"),
                 },
-            )
-            tcsims[f"dul_{intervention}"] = TimecourseSim(
-                [tc0] + [tc1 for _ in range(26)]
+                interval=168 * 60,  # [min]
+                n_doses=27,
+                steps=1000,
             )
 
         # console.print(tcsims.keys())
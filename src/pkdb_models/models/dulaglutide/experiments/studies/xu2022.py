@@ -14,6 +14,7 @@ from pkdb_models.models.dulaglutide.experiments.metadata import (
 from sbmlsim.plot import Axis, Figure
 from sbmlsim.simulation import Timecourse, TimecourseSim
 
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
 from pkdb_models.models.dulaglutide.helpers import run_experiments
 
 
@@ -89,11 +90,8 @@ class Xu2022(DulaglutideSimulationExperiment):
         tcsims = {}
         for intervention in self.interventions:
             if intervention.endswith("M"):
-                tc0 = Timecourse(
-                    start = 0,
-                    end = 168*60,
-                    steps = 1000,
-                    changes = {
+                tcsims[f"dul_{intervention}"] = RepeatedDosingSim(
+                    changes={
                         **self.default_changes(),
                         #physiological changes
                         "BW0": Q_(self.bodyweights[intervention], "kg"),
@@ -101,21 +99,13 @@ class Xu2022(DulaglutideSimulationExperiment):
                         "hba1c": Q_(self.hba1cs[intervention], "percent"),
                         "fpg0": Q_(self.fpgs[intervention], "mM"),
                         "[fpg]": Q_(self.fpgs[intervention], "mM"),
-
-                        #dose (SCDOSE)
-                        "SCDOSE_dul": Q_(self.doses[intervention], "mg")
                     },
-                )
-                tc1 = Timecourse(
-                    start = 0,
-                    end = 168*60, #[min]
-                    steps = 1000,
-                    changes = {
-                        "SCDOSE_dul": Q_(self.doses[intervention], "mg")
+                    dose_changes={
+                        "SCDOSE_dul": Q_(self.doses[intervention], "mg"),
                     },
-                )
-                tcsims[f"dul_{intervention}"] = TimecourseSim(
-                    [tc0] + [tc1 for _ in range(6)]
+                    interval=168 * 60,  # [min]
+                    n_doses=7,
+                    steps=1000,
                 )
             else:
                 # healthy subjects
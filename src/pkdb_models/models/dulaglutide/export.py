@@ -0,0 +1,183 @@
+"""Columnar export of the simulation results.
+
+The results of all tasks are written into a single partitioned Parquet
+dataset in long format, one partition per study (hive partitioning
+'study=<sid>'):
+
+    task | selection | unit | index | time | value | <mapping metadata>
+
+'index' is the flattened index of the scan dimensions (0 for timecourses),
+'time' is in model time units. The fields of `DulaglutideMappingMetaData`
+(tissue, route, dosing, ...) are added to the selections of the tasks which
+are observables of fit mappings.
+
+The rows are sorted by task, selection, index and time, so filters on these
+columns are pushed down to the row groups. Requires the optional dependency
+`pyarrow`.
+"""
+import dataclasses
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sbmlsim.experiment import SimulationExperiment
+from sbmlutils import log
+
+from pkdb_models.models.dulaglutide.experiments.metadata import (
+    DulaglutideMappingMetaData,
+)
+
+logger = log.get_logger(__name__)
+
+METADATA_FIELDS: List[str] = [
+    f.name for f in dataclasses.fields(DulaglutideMappingMetaData)
+]
+ROW_GROUP_SIZE = 65536
+
+
+def _pyarrow():
+    """Import pyarrow (optional dependency of the export)."""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as err:
+        raise ImportError(
+            "The columnar export requires 'pyarrow', install with "
+            "'pip install dulaglutide-model[parquet]'."
+        ) from err
+    return pyarrow
+
+
+def schema():
+    """Schema of the exported dataset (without the partition column)."""
+    pa = _pyarrow()
+    category = pa.dictionary(pa.int32(), pa.string())
+    fields = [
+        ("task", category),
+        ("selection", category),
+        ("unit", category),
+        ("index", pa.int32()),
+        ("time", pa.float64()),
+        ("value", pa.float64()),
+    ]
+    for name in METADATA_FIELDS:
+        fields.append((name, pa.bool_() if name == "outlier" else category))
+    return pa.schema(fields)
+
+
+def mapping_metadata(
+    experiment: SimulationExperiment,
+) -> Dict[Tuple[str, str], Dict]:
+    """Metadata of the fit mappings per (task, selection) of the observables."""
+    metadata = {}
+    for mapping in experiment._fit_mappings.values():
+        observable = mapping.observable
+        if observable.task_id is None or mapping.metadata is None:
+            continue
+        # selection with brackets, e.g. '[Cve_dul]', as in the results
+        key = (observable.task_id, observable.y.selection)
+        metadata.setdefault(key, mapping.metadata.to_dict())
+    return metadata
+
+
+def _constant(value, n: int, data_type):
+    """Array of length n with a single value (null if None)."""
+    pa = _pyarrow()
+    if value is None:
+        return pa.nulls(n, type=data_type)
+    if pa.types.is_dictionary(data_type):
+        return pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(n, dtype=np.int32)),
+            pa.array([value], type=data_type.value_type),
+        )
+    return pa.array(np.full(n, value), type=data_type)
+
+
+def experiment_table(experiment: SimulationExperiment):
+    """Results of all tasks of the experiment as arrow table."""
+    pa = _pyarrow()
+    target = schema()
+    metadata = mapping_metadata(experiment)
+
+    blocks = []
+    for task_key in sorted(experiment._results):
+        xds = experiment._results[task_key].xds
+        time = np.asarray(xds["_time"].values)
+        for selection in sorted(xds.data_vars):
+            if selection == "time":
+                continue
+            xda = xds[selection]
+            # (time, *scan dimensions) -> (time, index)
+            values = np.asarray(xda.values).reshape(len(time), -1)
+            n_index = values.shape[1]
+            n = values.size
+
+            units = xda.attrs.get("units")
+            meta = metadata.get((task_key, selection), {})
+            arrays = [
+                _constant(task_key, n, target.field("task").type),
+                _constant(selection, n, target.field("selection").type),
+                _constant(
+                    str(units) if units is not None else None,
+                    n,
+                    target.field("unit").type,
+                ),
+                pa.array(np.repeat(np.arange(n_index, dtype=np.int32), len(time))),
+                pa.array(np.tile(time, n_index)),
+                pa.array(values.T.ravel()),
+            ] + [
+                _constant(meta.get(name), n, target.field(name).type)
+                for name in METADATA_FIELDS
+            ]
+            blocks.append(pa.Table.from_arrays(arrays, schema=target))
+
+    if not blocks:
+        return target.empty_table()
+    return pa.concat_tables(blocks).unify_dictionaries()
+
+
+def write_experiment(experiment: SimulationExperiment, export_path: Path) -> Path:
+    """Write the results of the experiment as partition of the dataset.
+
+    The partition is written to a temporary file which is moved in place, so
+    experiments can be exported in parallel.
+    """
+    pa = _pyarrow()
+    path = Path(export_path) / f"study={experiment.sid}" / "part-0.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    pa.parquet.write_table(
+        experiment_table(experiment),
+        tmp_path,
+        row_group_size=ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+    os.replace(tmp_path, path)
+    logger.info(f"Results exported: '{path}'")
+    return path
+
+
+def read_export(
+    export_path: Path,
+    filters=None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Read the exported dataset.
+
+    :param export_path: directory of the dataset
+    :param filters: pyarrow filter expression or DNF filters, e.g.
+        [("study", "=", "Xu2022"), ("selection", "=", "[Cve_dul]")]; filters
+        are pushed down to the partitions and row groups
+    :param columns: columns to read, all columns if None
+    """
+    pa = _pyarrow()
+    table = pa.parquet.read_table(
+        export_path,
+        columns=columns,
+        filters=filters,
+        partitioning="hive",
+        memory_map=True,
+    )
+    return table.to_pandas()
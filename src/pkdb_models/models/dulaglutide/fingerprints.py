@@ -0,0 +1,123 @@
+"""Fingerprints of the artifacts (figures, report pages) of a run.
+
+The fingerprint of an artifact is a hash of all inputs which determine its
+content. Artifacts of the previous run in the same output directory are
+reused if their fingerprint did not change and the file still exists, e.g.,
+changing a label in one figure only renders this figure again.
+
+The fingerprints are stored in 'fingerprints.json' of the output directory,
+keyed by the artifact path relative to the output directory.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable
+
+import matplotlib
+import numpy as np
+from matplotlib.figure import Figure as FigureMPL
+from matplotlib.path import Path as PathMPL
+from sbmlutils import log
+
+logger = log.get_logger(__name__)
+
+# artist properties which determine the rendered figure
+ARTIST_PROPERTIES = [
+    "xydata", "offsets", "paths", "array", "clim", "text", "position", "xy",
+    "width", "height", "color", "facecolor", "edgecolor", "linestyle",
+    "linewidth", "marker", "markersize", "markerfacecolor", "markeredgecolor",
+    "fillstyle", "drawstyle", "hatch", "alpha", "label", "visible", "zorder",
+    "fontsize", "fontweight", "fontstyle", "fontfamily", "rotation",
+    "horizontalalignment", "verticalalignment", "xlim", "ylim", "xscale",
+    "yscale", "xticks", "yticks", "size_inches", "dpi",
+]
+
+
+def _canonical(value):
+    """Canonical representation of an artist property."""
+    if isinstance(value, (str, bool, int, float, type(None))):
+        return value
+    if isinstance(value, PathMPL):
+        value = value.vertices
+    if isinstance(value, np.ma.MaskedArray):
+        value = np.ma.filled(value.astype(float), np.nan)
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value, dtype=float).tobytes()
+        return f"{hashlib.sha256(data).hexdigest()}{value.shape}"
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return type(value).__name__
+
+
+def figure_fingerprint(fig_mpl: FigureMPL) -> str:
+    """Fingerprint of the content of a matplotlib figure.
+
+    Pickled figures are not reproducible (object ids), therefore the drawn
+    properties of all artists (data, labels, styles, limits) are hashed.
+    """
+    h = hashlib.sha256(matplotlib.__version__.encode("utf-8"))
+    for artist in fig_mpl.findobj():
+        properties = [type(artist).__name__]
+        for key in ARTIST_PROPERTIES:
+            getter = getattr(artist, f"get_{key}", None)
+            if getter is None:
+                continue
+            try:
+                properties.append((key, _canonical(getter())))
+            except Exception:
+                # getter requires arguments or a renderer
+                continue
+        h.update(repr(properties).encode("utf-8"))
+    return h.hexdigest()
+
+
+class FingerprintStore:
+    """Fingerprints of the artifacts of the previous and the current run."""
+
+    def __init__(self, output_path: Path):
+        self.output_path = Path(output_path)
+        self.path = self.output_path / "fingerprints.json"
+        self.previous: Dict[str, str] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f_json:
+                    self.previous = json.load(f_json)
+            except (OSError, ValueError) as err:
+                logger.warning(f"Fingerprints '{self.path}' are ignored: {err}")
+        self.current: Dict[str, str] = {}
+        self.reused: int = 0
+        self.created: int = 0
+
+    def _key(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.output_path)).as_posix()
+
+    def unchanged(self, paths: Iterable[Path], fingerprint: str) -> bool:
+        """Check if the artifacts of the previous run can be reused."""
+        paths = list(paths)
+        if not all(
+            self.previous.get(self._key(path)) == fingerprint and Path(path).exists()
+            for path in paths
+        ):
+            return False
+        self.reused += 1
+        for path in paths:
+            self.current[self._key(path)] = fingerprint
+        return True
+
+    def update(self, paths: Iterable[Path], fingerprint: str) -> None:
+        """Register the fingerprint of created artifacts."""
+        self.created += 1
+        for path in paths:
+            self.current[self._key(path)] = fingerprint
+
+    def save(self) -> None:
+        """Store the fingerprints, artifacts not created in this run are kept."""
+        fingerprints = {**self.previous, **self.current}
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f_json:
+            json.dump(fingerprints, f_json, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -28,6 +28,11 @@ from pkdb_models.models.dulaglutide import (
     DULAGLUTIDE_PATH,
     DATA_PATHS,
 )
+from pkdb_models.models.dulaglutide.profiling import (
+    profile_phase,
+    start_profiling,
+    stop_profiling,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -138,10 +143,11 @@ def fit_dulaglutide(
         # run optimization
         opt_result: OptimizationResult
         op: OptimizationProblem
-        if fit_method == FitMethod.LSQ:
-            opt_result, op = fitlsq(op, seed=seed, size=n_optimizations, n_cores=n_cores, **fit_kwargs)
-        elif fit_method == FitMethod.DE:
-            opt_result, op = fitde(op, seed=seed, size=n_optimizations, n_cores=n_cores, **fit_kwargs)
+        with profile_phase(op.opid, "optimize"):
+            if fit_method == FitMethod.LSQ:
+                opt_result, op = fitlsq(op, seed=seed, size=n_optimizations, n_cores=n_cores, **fit_kwargs)
+            elif fit_method == FitMethod.DE:
+                opt_result, op = fitde(op, seed=seed, size=n_optimizations, n_cores=n_cores, **fit_kwargs)
 
         return opt_result, op
 
@@ -268,6 +274,14 @@ def main() -> None:
         dest="output_dir",
         help="Path to output folder with optimization results (optional)",
     )
+    parser.add_option(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        default=False,
+        help="Profile the phases (data loading, optimization, analysis); profiles are "
+             "written to 'profile' in the output folder (optional)",
+    )
 
     console.rule(style="white")
     console.print(":wrench: FIT DULAGLUTIDE :wrench:")
@@ -325,6 +339,16 @@ def main() -> None:
     console.print(f"{'subset':<20}: {fit_subset}")
     console.print(f"{'strategy':<20}: {optimization_strategy}")
 
+    profiler = None
+    if options.profile:
+        if n_cores > 1:
+            console.print(
+                "Only the main process is profiled, use '--cores=1' to profile the "
+                "optimization.",
+                style="warning",
+            )
+        profiler = start_profiling(output_dir / "profile" / name)
+
     console.rule("Parameters", align="left", style="white")
 
     # Run optimization
@@ -367,16 +391,22 @@ def main() -> None:
     }
     for key, (opt_result, op) in results.items():
         # create figures and outputs
-        opt_analysis = OptimizationAnalysis(
-            opt_result=opt_result,
-            op=op,
-            output_name=name,
-            output_dir=output_dir,
-            show_plots=False,
-            show_titles=False,
-            **fit_kwargs
-        )
-        opt_analysis.run(mpl_parameters=mpl_parameters)
+        with profile_phase(key, "analysis"):
+            opt_analysis = OptimizationAnalysis(
+                opt_result=opt_result,
+                op=op,
+                output_name=name,
+                output_dir=output_dir,
+                show_plots=False,
+                show_titles=False,
+                **fit_kwargs
+            )
+            opt_analysis.run(mpl_parameters=mpl_parameters)
+
+    if profiler:
+        stop_profiling()
+        profiler.save()
+        profiler.print_summary()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,9 @@
-from typing import List, Type, Union
+import json
+import sqlite3
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Type, Union
 
 from pkdb_models.models.dulaglutide import (
     DATA_PATHS,
@@ -6,29 +11,118 @@ from pkdb_models.models.dulaglutide import (
     DULAGLUTIDE_PATH,
     RESULTS_PATH,
 )
-from sbmlsim.experiment import ExperimentRunner, SimulationExperiment
+from pkdb_models.models.dulaglutide.benchmarks.history import (
+    TELEMETRY,
+    read_runs,
+    record_telemetry,
+)
+from pkdb_models.models.dulaglutide.cache import ResultCache
+from pkdb_models.models.dulaglutide.checkpoint import CheckpointStore
+from pkdb_models.models.dulaglutide.experiments import registry
+from pkdb_models.models.dulaglutide.experiments.base_experiment import (
+    DulaglutideExperimentRunner,
+)
+from pkdb_models.models.dulaglutide.export import write_experiment
+from pkdb_models.models.dulaglutide.fingerprints import FingerprintStore
+from pkdb_models.models.dulaglutide.memory import (
+    MemoryBudget,
+    estimate_memory,
+    experiment_peaks,
+    format_memory,
+    measured_peaks,
+)
+from pkdb_models.models.dulaglutide.model_cache import load_model
+from pkdb_models.models.dulaglutide.profiling import RUN, is_profiling, profile_phase
+from pkdb_models.models.dulaglutide.rendering import (
+    FIGURE_FORMATS,
+    FigureRenderer,
+    RenderJob,
+)
+from pkdb_models.models.dulaglutide.report import IncrementalReport
+from pkdb_models.models.dulaglutide.sampling import OutputSampling, observation_times
+from pkdb_models.models.dulaglutide.simulator import (
+    DulaglutideSimulator,
+    integrator_statistics,
+)
+from pkdb_models.models.dulaglutide.telemetry import (
+    collect_telemetry,
+    stop_telemetry,
+    telemetry_phase,
+    write_telemetry,
+)
+from sbmlsim.experiment import SimulationExperiment
+from sbmlsim.model import RoadrunnerSBMLModel
+from sbmlsim.plot import Figure
 from sbmlsim.report.experiment_report import ExperimentReport, ReportResults
-from sbmlsim.simulator.simulation_serial import SimulatorSerial
 from sbmlutils import log
 from sbmlutils.console import console
 
 logger = log.get_logger(__name__)
 
 
-def run_experiments(
-    experiment_classes: Union[
-        Type[SimulationExperiment], List[Type[SimulationExperiment]]
-    ],
-    output_dir: str,
-):
-    """Execute given simulation experiment(s)."""
-    output_path = RESULTS_PATH / output_dir
-    simulator = SimulatorSerial(model=MODEL_PATH)
+def _figure_settings() -> Dict:
+    """Figure class settings which have to be transferred to worker processes."""
+    return {
+        "legend_fontsize": Figure.legend_fontsize,
+        "legend_position": Figure.legend_position,
+        "fig_dpi": Figure.fig_dpi,
+    }
 
-    if isinstance(experiment_classes, SimulationExperiment):
-        experiment_classes = [experiment_classes]
 
-    runner = ExperimentRunner(
+def _init_worker(figure_settings: Dict) -> None:
+    """Initialize worker process with the figure settings of the main process."""
+    for key, value in figure_settings.items():
+        setattr(Figure, key, value)
+
+
+def _run_experiments_serial(
+    experiment_classes: List[Type[SimulationExperiment]],
+    output_path: Path,
+    cache_path: Optional[Path] = None,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint_every: int = 10,
+    sampling: Optional[OutputSampling] = None,
+    reduced_selections: bool = True,
+    task_jobs: int = 1,
+    stream_results: bool = False,
+    export_path: Optional[Path] = None,
+    figure_formats: Sequence[str] = FIGURE_FORMATS,
+    renderer: Optional[FigureRenderer] = None,
+    step_statistics: bool = False,
+) -> Tuple[Dict, Dict, List[RenderJob], Dict, List[Dict]]:
+    """Execute simulation experiments with a single simulator.
+
+    Returns the report data, the simulator statistics, the render jobs of the
+    figures, the experiment manifest entries and the telemetry records of the
+    executed experiments. The report data only contains paths, strings and
+    the integrator statistics of the tasks so it can be transferred between
+    processes.
+
+    The figures are handed to the renderer. Without renderer the render jobs
+    are returned and rendered by the renderer of the main process.
+    """
+    telemetry = collect_telemetry()
+    # render jobs are only returned from the renderer of this process
+    hand_off = renderer is None
+    if hand_off:
+        renderer = FigureRenderer(formats=figure_formats)
+    cache = ResultCache(cache_path) if cache_path else None
+    checkpoints = (
+        CheckpointStore(checkpoint_path, every=checkpoint_every)
+        if checkpoint_path
+        else None
+    )
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH,
+        cache=cache,
+        checkpoints=checkpoints,
+        sampling=sampling,
+        task_jobs=task_jobs,
+        stream_results=stream_results,
+        step_statistics=step_statistics,
+    )
+
+    runner = DulaglutideExperimentRunner(
         experiment_classes=experiment_classes,
         data_path=DATA_PATHS,
         base_path=DULAGLUTIDE_PATH,
@@ -36,20 +130,445 @@ def run_experiments(
         absolute_tolerance=1e-10,
         relative_tolerance=1e-10,
     )
-    results = runner.run_experiments(
-        output_path=output_path,
-        show_figures=True,
-        save_results=False,
-        figure_formats=["svg", "png"],
-        reduced_selections=True,
-    )
+    manifest_infos = {}
+    for experiment in runner.experiments.values():
+        experiment.renderer = renderer
+        manifest_infos[experiment.__class__.__name__] = registry.experiment_info(
+            experiment
+        )
+    if sampling:
+        for experiment in runner.experiments.values():
+            for sim_key, times in observation_times(experiment).items():
+                simulator.add_observation_times(experiment._simulations[sim_key], times)
+    try:
+        results = runner.run_experiments(
+            output_path=output_path,
+            show_figures=False,
+            save_results=False,
+            figure_formats=renderer.formats,
+            reduced_selections=reduced_selections,
+        )
+        if export_path:
+            for experiment in runner.experiments.values():
+                write_experiment(experiment, export_path=export_path)
+    finally:
+        simulator.close()
 
     report_results = ReportResults()
     for exp_result in results:
         report_results.add_experiment_result(exp_result=exp_result)
+        if step_statistics:
+            experiment = exp_result.experiment
+            report_results.data[experiment.sid]["integrator_statistics"] = {
+                task_key: integrator_statistics(xres)
+                for task_key, xres in experiment._results.items()
+            }
+
+    jobs: List[RenderJob] = []
+    if hand_off:
+        jobs, renderer.jobs = renderer.jobs, []
+    return (
+        report_results.data,
+        simulator.statistics(),
+        jobs,
+        manifest_infos,
+        telemetry.pop_records(),
+    )
+
+
+def _report_statistics(statistics: Dict, output_path: Path) -> None:
+    """Print the simulator statistics and store them with the report."""
+    if statistics["cache_hits"] or statistics["cache_misses"]:
+        console.print(
+            f"Result cache: {statistics['cache_hits']} hits, "
+            f"{statistics['cache_misses']} misses"
+        )
+    console.print(
+        f"Shared prefixes: {statistics['prefix_hits']} hits, "
+        f"{statistics['prefix_segments']} segments reused, "
+        f"{statistics['prefix_time_saved']:.2f} s integration saved"
+    )
+    with open(output_path / "simulator_statistics.json", "w") as f_json:
+        json.dump(statistics, f_json, indent=2)
+
+
+def _report_memory(
+    peaks: Dict[str, int], estimates: Dict[str, Optional[int]], output_path: Path
+) -> None:
+    """Print the largest peak memory of the experiments and store all of them."""
+    largest = sorted(peaks, key=peaks.get, reverse=True)[:5]
+    if largest:
+        console.print("Peak memory (estimate):")
+    for name in largest:
+        console.print(
+            f"  {name:<30} {format_memory(peaks[name]):>10} "
+            f"({format_memory(estimates.get(name))})"
+        )
+    with open(output_path / "memory.json", "w") as f_json:
+        json.dump(
+            {
+                name: {"peak_rss": peaks.get(name), "estimate": estimates.get(name)}
+                for name in estimates
+            },
+            f_json,
+            indent=2,
+        )
+
+
+def _measured_peaks(output_path: Path) -> Dict[str, int]:
+    """Measured peak memory of the experiments in previous runs."""
+    memory = None
+    memory_path = output_path / "memory.json"
+    if memory_path.exists():
+        with open(memory_path, "r") as f_json:
+            memory = json.load(f_json)
+    try:
+        runs = [run for run in read_runs() if run["source"] == TELEMETRY]
+    except (OSError, sqlite3.Error) as err:
+        logger.warning(f"Runtime history not read: {err}")
+        runs = []
+    return measured_peaks(runs, memory)
+
+
+def _memory_estimates(
+    experiment_classes: List[Type[SimulationExperiment]],
+    reduced_selections: bool,
+    output_path: Path,
+) -> Dict[str, Optional[int]]:
+    """Estimated peak memory of the experiments.
+
+    The stale manifest entries of the experiments are rebuilt, measured peaks
+    of previous runs are used if larger than the estimate (see `memory`).
+    """
+    names = [exp_class.__name__ for exp_class in experiment_classes]
+    stale = registry.stale_experiments(registry.read_manifest(), names)
+    if stale:
+        registry.build_manifest(stale)
+    manifest = registry.experiment_manifest()
+    peaks = _measured_peaks(output_path)
+    selections = None
+    if not reduced_selections:
+        r = load_model(MODEL_PATH)
+        RoadrunnerSBMLModel.set_timecourse_selections(r, selections=None)
+        selections = len(r.timeCourseSelections)
+    return {
+        exp_class.__name__: estimate_memory(
+            manifest.get(exp_class.__name__),
+            selections=selections,
+            peak=peaks.get(exp_class.__name__),
+        )
+        for exp_class in experiment_classes
+    }
 
-    # create HTML report
-    report = ExperimentReport(report_results, metadata=None)
-    report.create_report(output_path, report_type=ExperimentReport.ReportType.HTML)
+
+def run_experiments(
+    experiment_classes: Union[
+        Type[SimulationExperiment], List[Type[SimulationExperiment]]
+    ],
+    output_dir: str,
+    jobs: int = 1,
+    cache_path: Optional[Path] = None,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint_every: int = 10,
+    sampling: Optional[OutputSampling] = None,
+    reduced_selections: bool = True,
+    task_jobs: int = 1,
+    stream_results: bool = False,
+    export: bool = False,
+    figure_formats: Sequence[str] = FIGURE_FORMATS,
+    render_jobs: int = 0,
+    memory_budget: Optional[int] = None,
+    step_statistics: bool = False,
+):
+    """Execute given simulation experiment(s).
+
+    :param jobs: number of worker processes. With jobs > 1 the experiment classes
+        are distributed over a process pool, every worker uses its own simulator.
+        The most expensive experiments (tasks and simulated horizon in the
+        experiment manifest) are submitted first. The report data is merged in
+        the order of the experiment classes, so the outputs are identical to a
+        serial run.
+    :param cache_path: directory of the result cache. Task results are reused
+        if model, simulation, tolerances, selections and the versions of the
+        simulation code did not change (see `cache`).
+        No caching if None.
+    :param checkpoint_path: directory of the checkpoints. The model state is
+        stored every `checkpoint_every` segments of the timecourse simulations
+        and interrupted simulations resume from the last checkpoint.
+        No checkpoints if None.
+    :param sampling: adaptive output sampling of the results, the observation
+        times of the fit mappings are always included. Dense integrator output
+        if None.
+    :param reduced_selections: only request the selections read by the figures
+        and fit mappings of the experiments. All selections of the model if
+        False, e.g. for ad-hoc analysis of the results.
+    :param task_jobs: number of task worker processes per experiment. The
+        independent tasks of an experiment are executed in parallel if > 1.
+        Every experiment worker starts its own task workers, i.e., up to
+        jobs * task_jobs processes. Serial tasks by default.
+    :param stream_results: write every finished segment to the result store in
+        the output directory of the experiment; figures and fit mappings read
+        the results lazily from disk, so memory does not grow with the
+        simulated horizon.
+    :param export: export the results of all tasks to a partitioned Parquet
+        dataset (one partition per study) in 'export' of the output directory,
+        see `export.read_export`. Requires 'pyarrow'.
+    :param figure_formats: formats of the figures, e.g. ["png"]; no figures
+        are created if empty.
+    :param render_jobs: number of headless renderer processes. The figures are
+        rendered in the background while the simulations continue if > 0.
+        By default the figures are rendered after the simulations in the
+        main process.
+    :param memory_budget: memory budget of the experiment workers [bytes].
+        Experiments are only started if the estimated peak memory of the
+        running experiments fits into the budget, see `memory`. No budget
+        if None.
+    :param step_statistics: integrate the tasks a second time with variable
+        step size and report the CVODE steps per task (integrator statistics
+        in the report).
+
+    Figures and report pages are fingerprinted by their content; artifacts of a
+    previous run in the output directory are reused if unchanged
+    ('fingerprints.json'). The PNG figures of all experiments are linked into
+    '_figures' of the output directory as they are rendered.
+
+    Timecourses starting with the same segments share the integration of the
+    common prefix. The statistics of the simulator (result cache, shared
+    prefixes, saved integration time and integration counters) are written to
+    'simulator_statistics.json' in the output directory.
+
+    The wall time, CPU time, peak memory and integration counters of every
+    experiment phase and task are written to 'telemetry.jsonl' in the output
+    directory, see `telemetry`. The peak memory of the experiments is
+    estimated before running (stale entries of the experiment manifest are
+    rebuilt) and written with the measured peak memory to 'memory.json'. The
+    timings of the experiments are appended to the runtime history (not for
+    profiled runs), see `benchmarks.history`.
+    """
+    output_path = RESULTS_PATH / output_dir
+
+    if not isinstance(experiment_classes, (list, tuple)):
+        experiment_classes = [experiment_classes]
+    experiment_classes = list(experiment_classes)
+
+    jobs = max(1, min(jobs, len(experiment_classes)))
+    export_path = output_path / "export" if export else None
+    # compile the model once, the task workers load the stored state
+    load_model(MODEL_PATH)
+    estimates = _memory_estimates(
+        experiment_classes,
+        reduced_selections=reduced_selections,
+        output_path=output_path,
+    )
+    known = {name: e for name, e in estimates.items() if e is not None}
+    if known:
+        name = max(known, key=known.get)
+        console.print(
+            f"Estimated peak memory: up to {format_memory(known[name])} ({name})"
+        )
+    if memory_budget is not None:
+        console.print(f"Memory budget: {format_memory(memory_budget)}")
+    telemetry = collect_telemetry()
+    fingerprints = FingerprintStore(output_path)
+    figures_path = output_path / "_figures"
+    if figure_formats and render_jobs > 0:
+        renderer = FigureRenderer.pool(
+            formats=figure_formats,
+            jobs=render_jobs,
+            fingerprints=fingerprints,
+            figures_path=figures_path,
+        )
+    else:
+        renderer = FigureRenderer(
+            formats=figure_formats,
+            fingerprints=fingerprints,
+            figures_path=figures_path,
+        )
+    try:
+        report_results, statistics, manifest_infos, records = _run_experiments(
+            experiment_classes,
+            output_path=output_path,
+            jobs=jobs,
+            renderer=renderer,
+            cache_path=cache_path,
+            checkpoint_path=checkpoint_path,
+            checkpoint_every=checkpoint_every,
+            sampling=sampling,
+            reduced_selections=reduced_selections,
+            task_jobs=task_jobs,
+            stream_results=stream_results,
+            export_path=export_path,
+            estimates=estimates,
+            memory_budget=memory_budget,
+            step_statistics=step_statistics,
+        )
+        # figures which are still rendered in the background
+        with telemetry_phase(RUN, "render"):
+            renderer.wait()
+
+        # create HTML report
+        with profile_phase(RUN, "report"), telemetry_phase(RUN, "report"):
+            report = IncrementalReport(report_results, fingerprints=fingerprints)
+            report.create_report(
+                output_path, report_type=ExperimentReport.ReportType.HTML
+            )
+        records.extend(telemetry.pop_records())
+    finally:
+        renderer.close()
+        stop_telemetry()
+    registry.update_manifest(manifest_infos)
+    fingerprints.save()
+    console.print(
+        f"Figures and report pages: {fingerprints.created} created, "
+        f"{fingerprints.reused} reused"
+    )
+    _report_statistics(dict(statistics), output_path=output_path)
+    _report_memory(experiment_peaks(records), estimates, output_path=output_path)
+    telemetry_path = write_telemetry(records, output_path / "telemetry.jsonl")
+    console.print(f"Telemetry: file://{telemetry_path}")
+    if not is_profiling():
+        try:
+            record_telemetry(records)
+        except (OSError, sqlite3.Error) as err:
+            logger.warning(f"Runtime history not updated: {err}")
 
     console.print("Successfully executed simulation experiments", style="success")
+
+
+def _run_experiments(
+    experiment_classes: List[Type[SimulationExperiment]],
+    output_path: Path,
+    jobs: int,
+    renderer: FigureRenderer,
+    cache_path: Optional[Path],
+    checkpoint_path: Optional[Path],
+    checkpoint_every: int,
+    sampling: Optional[OutputSampling],
+    reduced_selections: bool,
+    task_jobs: int,
+    stream_results: bool,
+    export_path: Optional[Path],
+    estimates: Optional[Dict[str, Optional[int]]] = None,
+    memory_budget: Optional[int] = None,
+    step_statistics: bool = False,
+) -> Tuple[ReportResults, Counter, Dict, List[Dict]]:
+    """Execute the experiments serially or by a pool of experiment workers.
+
+    The figures are handed to the renderer. With a memory budget the
+    experiment workers only start experiments whose estimated peak memory fits
+    into the remaining budget (largest first); experiments without estimate
+    are executed alone.
+    """
+    report_results = ReportResults()
+    statistics: Counter = Counter()
+    manifest_infos: Dict = {}
+    records: List[Dict] = []
+    if jobs == 1:
+        data, exp_statistics, _, manifest_infos, records = _run_experiments_serial(
+            experiment_classes,
+            output_path=output_path,
+            cache_path=cache_path,
+            checkpoint_path=checkpoint_path,
+            checkpoint_every=checkpoint_every,
+            sampling=sampling,
+            reduced_selections=reduced_selections,
+            task_jobs=task_jobs,
+            stream_results=stream_results,
+            export_path=export_path,
+            renderer=renderer,
+            step_statistics=step_statistics,
+        )
+        report_results.data.update(data)
+        statistics.update(exp_statistics)
+    else:
+        console.print(f"Running {len(experiment_classes)} experiments with {jobs} jobs")
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(_figure_settings(),),
+        ) as executor:
+            budget = MemoryBudget(memory_budget) if memory_budget else None
+            estimates = estimates or {}
+
+            def estimate(exp_class: Type[SimulationExperiment]) -> int:
+                value = estimates.get(exp_class.__name__)
+                return value if value is not None else budget.budget
+
+            if budget is not None:
+                for exp_class in experiment_classes:
+                    value = estimates.get(exp_class.__name__)
+                    if value is None or value > budget.budget:
+                        console.print(
+                            f"{exp_class.__name__} is executed alone "
+                            f"(estimate {format_memory(value)})",
+                            style="warning",
+                        )
+
+            pending = _schedule(experiment_classes)
+            running: Dict[Future, Type[SimulationExperiment]] = {}
+            outputs: Dict[Type[SimulationExperiment], Tuple] = {}
+            while pending or running:
+                # start the experiments which fit into the budget
+                for exp_class in list(pending):
+                    if len(running) >= jobs:
+                        break
+                    if budget is not None:
+                        if not budget.fits(estimate(exp_class)):
+                            continue
+                        budget.acquire(estimate(exp_class))
+                    pending.remove(exp_class)
+                    future = executor.submit(
+                        _run_experiments_serial,
+                        [exp_class],
+                        output_path,
+                        cache_path,
+                        checkpoint_path,
+                        checkpoint_every,
+                        sampling,
+                        reduced_selections,
+                        task_jobs,
+                        stream_results,
+                        export_path,
+                        renderer.formats,
+                        None,
+                        step_statistics,
+                    )
+                    running[future] = exp_class
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    exp_class = running.pop(future)
+                    if budget is not None:
+                        budget.release(estimate(exp_class))
+                    outputs[exp_class] = future.result()
+                    # figures are rendered while the other experiments run
+                    for job in outputs[exp_class][2]:
+                        renderer.submit(job)
+
+            for exp_class in experiment_classes:
+                data, exp_statistics, _, exp_infos, exp_records = outputs[exp_class]
+                report_results.data.update(data)
+                statistics.update(exp_statistics)
+                manifest_infos.update(exp_infos)
+                records.extend(exp_records)
+
+    return report_results, statistics, manifest_infos, records
+
+
+def _schedule(
+    experiment_classes: List[Type[SimulationExperiment]],
+) -> List[Type[SimulationExperiment]]:
+    """Order the experiments by decreasing cost for the experiment workers.
+
+    The cost is estimated from the tasks and the simulated horizon in the
+    experiment manifest; experiments without entry are submitted first.
+    """
+    manifest = registry.experiment_manifest()
+
+    def cost(exp_class: Type[SimulationExperiment]) -> float:
+        info = manifest.get(exp_class.__name__)
+        if info is None:
+            return float("inf")
+        return info["tasks"] * info["horizon"]
+
+    return sorted(experiment_classes, key=cost, reverse=True)
@@ -0,0 +1,139 @@
+"""Memory estimates and memory budget of the simulation experiments.
+
+The memory of an experiment is dominated by the results of its tasks, which
+are kept until the experiment is finished. Before running, the peak memory
+of an experiment is estimated from its entry in the experiment manifest
+(see `registry`):
+
+    WORKER_MEMORY + RESULT_COPIES * output points * selections * 8 bytes
+
+The output points are the points of all segments of all tasks (steps + 1
+per segment, times the simulations of scans). The copies account for the
+frames of the segments, their concatenation and the dataset of the results
+(peak RSS 176 MB for 43 MB of results of a regimen with 200 segments).
+Results streamed to the result store are memory-mapped, the estimate is an
+upper bound for them.
+
+The worker memory is calibrated with the measured peak RSS of experiments with
+small results (463 MB for DoseDependencyExperiment, 483 MB for Gerstein2019).
+Measured peaks of previous runs ('memory.json' of the output directory and the
+runtime history, see `benchmarks.history`) take precedence if they are larger
+than the estimate.
+
+With a `MemoryBudget` the experiment workers only start an experiment if the
+estimates of the running experiments and the experiment fit into the budget.
+The measured peak memory of the experiments is taken from the telemetry.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from pkdb_models.models.dulaglutide.profiling import RUN
+
+# memory of a worker process with the loaded model and experiment [bytes]
+WORKER_MEMORY = 500 * 2**20
+# peak memory of the results relative to their size
+RESULT_COPIES = 4
+
+_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+def parse_memory(value: str) -> int:
+    """Parse a memory size [bytes], e.g. '8G', '512MB' or '1073741824'."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", value, re.I)
+    if not match:
+        raise ValueError(f"Invalid memory size: '{value}'")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def format_memory(size: Optional[float]) -> str:
+    """Format a memory size [bytes] for the console."""
+    if size is None:
+        return "-"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def estimate_memory(
+    info: Optional[Dict[str, Any]],
+    selections: Optional[int] = None,
+    peak: Optional[int] = None,
+) -> Optional[int]:
+    """Estimate the peak memory of an experiment [bytes].
+
+    :param info: manifest entry of the experiment
+    :param selections: number of selections of the tasks, defaults to the
+        reduced selections of the experiment
+    :param peak: measured peak memory of a previous run
+    :return: estimate, None without manifest entry and measured peak
+    """
+    estimate = None
+    if info is not None and "points" in info:
+        if selections is None:
+            selections = info["selections"]
+        estimate = WORKER_MEMORY + RESULT_COPIES * info["points"] * selections * 8
+    if peak is not None:
+        estimate = max(estimate or 0, peak)
+    return estimate
+
+
+def measured_peaks(
+    runs: List[Dict[str, Any]], memory: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, int]:
+    """Measured peak RSS of the experiments in previous runs [bytes].
+
+    The peak of the latest run of an experiment in the history is used, the
+    larger one if the experiment is also in 'memory.json'.
+
+    :param runs: telemetry runs of the runtime history, oldest first
+    :param memory: content of 'memory.json' of a previous run
+    """
+    peaks: Dict[str, int] = {}
+    for run in runs:
+        for name, timing in run["timings"].items():
+            if name != RUN and timing.get("peak_rss") is not None:
+                peaks[name] = timing["peak_rss"]
+    for name, entry in (memory or {}).items():
+        if entry.get("peak_rss") is not None:
+            peaks[name] = max(peaks.get(name, 0), entry["peak_rss"])
+    return peaks
+
+
+def experiment_peaks(records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Peak RSS of the experiments in the telemetry records [bytes]."""
+    peaks: Dict[str, int] = {}
+    for record in records:
+        if record["experiment"] == RUN or record.get("peak_rss") is None:
+            continue
+        peaks[record["experiment"]] = max(
+            peaks.get(record["experiment"], 0), record["peak_rss"]
+        )
+    return peaks
+
+
+class MemoryBudget:
+    """Memory budget of the experiments running at the same time."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.used: int = 0
+        self.running: int = 0
+
+    def fits(self, estimate: int) -> bool:
+        """Check if an experiment with the estimate can be started.
+
+        A single experiment is always started, even if it exceeds the budget.
+        """
+        return self.running == 0 or self.used + estimate <= self.budget
+
+    def acquire(self, estimate: int) -> None:
+        """Start an experiment with the estimate."""
+        self.used += estimate
+        self.running += 1
+
+    def release(self, estimate: int) -> None:
+        """Finish an experiment with the estimate."""
+        self.used -= estimate
+        self.running -= 1
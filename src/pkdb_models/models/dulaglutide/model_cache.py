@@ -0,0 +1,123 @@
+"""Cache of the compiled RoadRunner models.
+
+Loading an SBML model JIT-compiles it with RoadRunner, which takes about one
+second for the whole-body model. RoadRunner reuses compiled models within a
+process, but every new process compiles again (task workers, sensitivity
+analysis). The compiled model is stored with `saveState` and restored with
+`loadState` instead.
+
+The state files are stored in `MODEL_STATE_PATH` and keyed by the SBML
+content hash and the RoadRunner version, so changed models or a RoadRunner
+update never load a stale state. The states are created by the model factory
+and on demand by the first process loading a model.
+
+The models loaded by this package use the cache: `load_model` (task workers,
+sensitivity analysis, benchmarks), `CachedRoadrunnerSBMLModel` (models of the
+`DulaglutideSimulator`) and the `DulaglutideExperimentRunner`, which resolves
+the model of the experiments before sbmlsim does. sbmlsim itself disabled
+restoring states (roadrunner issue 963). Here a state is only restored by the
+RoadRunner version which saved it, and `test_model_cache` checks that the
+restored model simulates as the compiled one.
+
+The experiment runner of the parameter fitting is created by sbmlsim
+(`OptimizationProblem.initialize`) and has no hook for the model class, so
+every fitting core compiles the model once.
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Union
+
+import roadrunner
+from pint import UnitRegistry
+from sbmlsim.model import AbstractModel, RoadrunnerSBMLModel
+from sbmlsim.model.model_resources import Source
+from sbmlutils import log
+
+from pkdb_models.models.dulaglutide import MODEL_STATE_PATH
+
+logger = log.get_logger(__name__)
+
+
+def state_path(sbml_path: Path, state_dir: Path = MODEL_STATE_PATH) -> Path:
+    """Path of the state file for the SBML content and RoadRunner version."""
+    sbml_path = Path(sbml_path)
+    sbml_hash = hashlib.sha256(sbml_path.read_bytes()).hexdigest()[:16]
+    rr_version = roadrunner.__version__
+    return state_dir / f"{sbml_path.stem}_{sbml_hash}_rr{rr_version}.state"
+
+
+def compile_model(
+    sbml_path: Path, state_dir: Path = MODEL_STATE_PATH
+) -> roadrunner.RoadRunner:
+    """Compile the SBML model and store its state.
+
+    States of previous versions of the model with the same RoadRunner
+    version are removed, states of other RoadRunner versions may still be
+    used by other environments.
+    """
+    sbml_path = Path(sbml_path)
+    path = state_path(sbml_path, state_dir=state_dir)
+    r = roadrunner.RoadRunner(str(sbml_path))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    r.saveState(str(tmp_path))
+    os.replace(tmp_path, path)
+    logger.info(f"Model state saved: '{path}'")
+
+    rr_version = roadrunner.__version__
+    for stale_path in path.parent.glob(f"{sbml_path.stem}_*_rr{rr_version}.state"):
+        if stale_path != path:
+            stale_path.unlink(missing_ok=True)
+    return r
+
+
+def load_model(
+    sbml_path: Path, state_dir: Path = MODEL_STATE_PATH
+) -> roadrunner.RoadRunner:
+    """Load the SBML model from its state, compile the model if not cached."""
+    path = state_path(sbml_path, state_dir=state_dir)
+    if path.exists():
+        try:
+            r = roadrunner.RoadRunner()
+            r.loadState(str(path))
+            return r
+        except Exception as err:
+            logger.warning(f"Corrupt model state '{path}' is recompiled: {err}")
+    return compile_model(sbml_path, state_dir=state_dir)
+
+
+class CachedRoadrunnerSBMLModel(RoadrunnerSBMLModel):
+    """RoadrunnerSBMLModel which loads SBML files via the model cache."""
+
+    @classmethod
+    def from_abstract_model(
+        cls,
+        abstract_model: AbstractModel,
+        selections: list = None,
+        ureg: UnitRegistry = None,
+        settings: Dict = None,
+    ) -> "CachedRoadrunnerSBMLModel":
+        """Create from AbstractModel."""
+        return cls(
+            source=abstract_model.source.source,
+            changes=abstract_model.changes,
+            sid=abstract_model.sid,
+            name=abstract_model.name,
+            base_path=abstract_model.base_path,
+            selections=selections,
+            ureg=ureg,
+            settings=settings,
+        )
+
+    @classmethod
+    def load_roadrunner_model(
+        cls, source: Union[Source, str, Path]
+    ) -> roadrunner.RoadRunner:
+        """Load model from the state of the SBML file or the SBML content."""
+        if isinstance(source, (str, Path)):
+            source = Source.from_source(source=source)
+        if source.is_path():
+            return load_model(source.path)
+        return roadrunner.RoadRunner(str(source.content))
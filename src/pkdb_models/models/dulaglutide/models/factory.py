@@ -20,6 +20,8 @@ from sbmlutils.cytoscape import visualize_sbml
 from sbmlutils.factory import create_model
 from pymetadata.omex import *
 
+from pkdb_models.models.dulaglutide.model_cache import compile_model
+
 
 def create_models(
     model_output_dir: Path, create_tissues: bool = True
@@ -100,6 +102,8 @@ def create_models(
     sbml_path = results["dulaglutide_body"]["path"]
     sbml_path_flat = model_output_dir / f"{model_body.sid}_flat.xml"
     flatten_sbml(sbml_path, sbml_flat_path=sbml_path_flat)
+    # compiled model state for fast loading
+    compile_model(sbml_path_flat)
 
     results["dulaglutide_body_flat"] = {
         "path": sbml_path_flat,
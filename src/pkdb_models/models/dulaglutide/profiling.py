@@ -0,0 +1,173 @@
+"""Per-phase profiling of the simulation experiments and the parameter fitting.
+
+With an active `PhaseProfiler` every phase of an experiment runs under its
+own profiler:
+
+    initialize        definitions and datasets (`load_pkdb_dataframe`)
+    simulate          integration of the tasks
+    fit_mappings      evaluation of the fit mappings
+    pharmacokinetics  `calculate_dulaglutide_pk`
+    figures           creation of the matplotlib figures
+    render            rendering of the figures (SVG, PNG)
+    report            HTML report
+    optimize          optimization of the fitting problems
+    analysis          analysis of the fitting results
+    other             remaining time of the experiment run (e.g. serialization)
+
+Phases are exclusive: entering a nested phase (e.g. the pharmacokinetics in
+the figures) pauses the profiler of the enclosing phase, so the times of all
+phases add up to the profiled time.
+
+The profiles are written per experiment and phase ('<experiment>__<phase>.prof',
+see `pstats` or `snakeviz`), with the phase times ('phases.tsv') and a table
+of the hot functions aggregated over all profiles ('hot_functions.tsv').
+Only the calling process is profiled.
+"""
+import cProfile
+import csv
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from sbmlutils import log
+from sbmlutils.console import console
+
+logger = log.get_logger(__name__)
+
+# name of the phases which do not belong to an experiment
+RUN = "run"
+
+_profiler: Optional["PhaseProfiler"] = None
+
+
+class PhaseProfiler:
+    """Profiles of the phases of the experiments."""
+
+    def __init__(self, output_path: Path):
+        self.output_path = Path(output_path)
+        self.profiles: Dict[Tuple[str, str], cProfile.Profile] = {}
+        self.times: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.calls: Dict[Tuple[str, str], int] = defaultdict(int)
+        # [key, profile, start time] of the entered phases
+        self._stack: List[list] = []
+
+    def _pause(self) -> None:
+        key, profile, t_start = self._stack[-1]
+        profile.disable()
+        self.times[key] += time.perf_counter() - t_start
+
+    def _resume(self) -> None:
+        self._stack[-1][2] = time.perf_counter()
+        self._stack[-1][1].enable()
+
+    @contextmanager
+    def phase(self, name: str, phase: str) -> Iterator[None]:
+        """Profile the phase of the experiment (or `RUN`)."""
+        key = (name, phase)
+        if self._stack and self._stack[-1][0] == key:
+            # re-entered phase, e.g. by super() calls
+            yield
+            return
+
+        if self._stack:
+            self._pause()
+        profile = self.profiles.setdefault(key, cProfile.Profile())
+        self.calls[key] += 1
+        self._stack.append([key, profile, None])
+        self._resume()
+        try:
+            yield
+        finally:
+            self._pause()
+            self._stack.pop()
+            if self._stack:
+                self._resume()
+
+    def phase_times(self) -> Dict[str, float]:
+        """Total time per phase [s]."""
+        times: Dict[str, float] = defaultdict(float)
+        for (_, phase), t in self.times.items():
+            times[phase] += t
+        return dict(sorted(times.items(), key=lambda item: item[1], reverse=True))
+
+    def hot_functions(self) -> List[Tuple[str, int, float, float]]:
+        """Functions aggregated over all profiles, sorted by internal time.
+
+        Returns (function, calls, internal time [s], cumulative time [s]).
+        """
+        profiles = [p for p in self.profiles.values() if p.getstats()]
+        if not profiles:
+            return []
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        rows = [
+            (pstats.func_std_string(func), nc, tt, ct)
+            for func, (_, nc, tt, ct, _) in stats.stats.items()
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def save(self, n_functions: int = 200) -> Path:
+        """Write the profiles, phase times and hot functions."""
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        for (name, phase), profile in self.profiles.items():
+            if profile.getstats():
+                profile.dump_stats(self.output_path / f"{name}__{phase}.prof")
+
+        with open(self.output_path / "phases.tsv", "w", newline="") as f_tsv:
+            writer = csv.writer(f_tsv, delimiter="\t")
+            writer.writerow(["experiment", "phase", "calls", "time"])
+            for (name, phase), t in sorted(self.times.items()):
+                writer.writerow([name, phase, self.calls[(name, phase)], f"{t:.6f}"])
+
+        with open(self.output_path / "hot_functions.tsv", "w", newline="") as f_tsv:
+            writer = csv.writer(f_tsv, delimiter="\t")
+            writer.writerow(["function", "calls", "tottime", "cumtime"])
+            for func, nc, tt, ct in self.hot_functions()[:n_functions]:
+                writer.writerow([func, nc, f"{tt:.6f}", f"{ct:.6f}"])
+
+        return self.output_path
+
+    def print_summary(self, n_functions: int = 10) -> None:
+        """Print the time per phase and the hottest functions."""
+        phase_times = self.phase_times()
+        total = sum(phase_times.values())
+        console.rule("Profile", align="left", style="white")
+        for phase, t in phase_times.items():
+            fraction = t / total if total > 0 else 0.0
+            console.print(f"{phase:<20} {t:10.2f} s {fraction:7.1%}")
+        console.print(f"{'total':<20} {total:10.2f} s")
+        console.print()
+        console.print(f"{'tottime':>10} {'calls':>10}  function")
+        for func, nc, tt, _ in self.hot_functions()[:n_functions]:
+            console.print(f"{tt:10.2f} {nc:10d}  {func}")
+        console.print(f"Profiles: file://{self.output_path}", style="info")
+
+
+def start_profiling(output_path: Path) -> PhaseProfiler:
+    """Activate the phase profiling in this process."""
+    global _profiler
+    _profiler = PhaseProfiler(output_path)
+    return _profiler
+
+
+def stop_profiling() -> Optional[PhaseProfiler]:
+    """Deactivate the phase profiling, returns the profiler."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def is_profiling() -> bool:
+    """Check if the phase profiling is active."""
+    return _profiler is not None
+
+
+def profile_phase(name: str, phase: str) -> ContextManager:
+    """Profile the phase if the profiling is active."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.phase(name, phase)
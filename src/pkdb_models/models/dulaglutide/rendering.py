@@ -0,0 +1,234 @@
+"""Headless rendering of the figures of the simulation experiments.
+
+Saving the matplotlib figures (SVG and PNG at 300 dpi) takes often longer
+than the simulations of an experiment. The figures are therefore only
+created by the experiments and handed to a pool of headless renderer
+processes (Agg backend) as pickled matplotlib figures, so the simulations of
+the next experiments continue while the figures are rendered.
+
+The figure formats are a policy of the run, e.g. ["svg", "png"], ["png"]
+or [] (no figures, the matplotlib figures are not even created).
+
+With a `FingerprintStore` only figures with changed content are rendered,
+the figures of the previous run are reused otherwise.
+
+The PNG figures of all experiments are collected in a single directory as
+hardlinks as soon as they are rendered (or reused).
+"""
+import os
+import pickle
+import shutil
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from sbmlsim.plot.serialization_matplotlib import FigureMPL
+from sbmlutils import log
+
+from pkdb_models.models.dulaglutide.fingerprints import (
+    FingerprintStore,
+    figure_fingerprint,
+)
+
+logger = log.get_logger(__name__)
+
+FIGURE_FORMATS: List[str] = ["svg", "png"]
+# formats collected in the figures directory
+COLLECTED_FORMATS: List[str] = ["png"]
+
+
+def parse_figure_formats(value: str) -> List[str]:
+    """Parse comma-separated figure formats, 'none' for no figures."""
+    formats = [f.strip().lower().lstrip(".") for f in value.split(",") if f.strip()]
+    if formats == ["none"]:
+        return []
+    if "none" in formats:
+        raise ValueError(f"'none' cannot be combined with figure formats: '{value}'")
+    return formats
+
+
+@dataclass
+class RenderJob:
+    """Pickled matplotlib figure and the paths of its formats."""
+
+    figure: bytes
+    paths: List[Path]
+    fingerprint: str
+
+
+def render_figure(job: RenderJob) -> List[Path]:
+    """Render the figure of the job in all formats."""
+    from matplotlib import pyplot as plt
+
+    fig_mpl = pickle.loads(job.figure)
+    try:
+        for path in job.paths:
+            fig_mpl.savefig(path, bbox_inches="tight")
+    finally:
+        plt.close(fig_mpl)
+    return job.paths
+
+
+def collect_figure(path: Path, figures_path: Path) -> Path:
+    """Collect the figure as hardlink in the figures directory.
+
+    Figures are copied if hardlinks are not supported (e.g. other device).
+    Rendering a figure again overwrites the linked file in place, i.e., the
+    collected figure is updated.
+    """
+    target = figures_path / path.name
+    if target.exists():
+        if os.path.samefile(path, target):
+            return target
+        target.unlink()
+    figures_path.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copy2(path, target)
+    return target
+
+
+def _init_render_worker() -> None:
+    """Initialize renderer process with the headless backend."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+class FigureRenderer:
+    """Renders the figures of the experiments in the given formats.
+
+    With an executor the figures are rendered by the renderer processes as
+    soon as they are submitted and collected as soon as they are rendered
+    (callbacks of the futures). Without executor the render jobs are queued
+    in `jobs`, e.g. to be transferred from experiment workers to the renderer
+    of the main process, and rendered in the calling process by `wait`.
+
+    Jobs with unchanged fingerprints in `fingerprints` are skipped. The
+    rendered and reused figures are collected in `figures_path`.
+    """
+
+    def __init__(
+        self,
+        formats: Sequence[str] = FIGURE_FORMATS,
+        executor: Optional[ProcessPoolExecutor] = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        figures_path: Optional[Path] = None,
+    ):
+        self.formats: List[str] = list(formats)
+        self.executor = executor
+        self.fingerprints = fingerprints
+        self.figures_path = figures_path
+        self.jobs: List[RenderJob] = []
+        # the callbacks of the futures run in a thread of the executor
+        self._condition = threading.Condition(threading.RLock())
+        self._pending: int = 0
+        self._errors: int = 0
+
+    @classmethod
+    def pool(
+        cls,
+        formats: Sequence[str],
+        jobs: int,
+        fingerprints: Optional[FingerprintStore] = None,
+        figures_path: Optional[Path] = None,
+    ) -> "FigureRenderer":
+        """Renderer with a pool of `jobs` renderer processes."""
+        executor = ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_render_worker
+        )
+        return cls(
+            formats=formats,
+            executor=executor,
+            fingerprints=fingerprints,
+            figures_path=figures_path,
+        )
+
+    def submit_figures(
+        self, sid: str, results_path: Path, mpl_figures: Dict[str, FigureMPL]
+    ) -> Dict[str, List[Path]]:
+        """Submit the figures of an experiment, returns the paths per format.
+
+        Same paths as `SimulationExperiment.save_mpl_figures`.
+        """
+        paths = defaultdict(list)
+        for fkey, fig_mpl in mpl_figures.items():
+            fig_paths = [
+                results_path / f"{sid}_{fkey}.{fig_format}"
+                for fig_format in self.formats
+            ]
+            for fig_format, fig_path in zip(self.formats, fig_paths):
+                paths[fig_format].append(fig_path)
+            if fig_paths:
+                job = RenderJob(
+                    figure=pickle.dumps(fig_mpl),
+                    paths=fig_paths,
+                    fingerprint=figure_fingerprint(fig_mpl),
+                )
+                self.submit(job)
+        return paths
+
+    def submit(self, job: RenderJob) -> None:
+        """Render the job in the renderer processes or queue it."""
+        with self._condition:
+            if self.fingerprints is not None and self.fingerprints.unchanged(
+                job.paths, job.fingerprint
+            ):
+                self._collect(job)
+                return
+        if self.executor is None:
+            self.jobs.append(job)
+        else:
+            with self._condition:
+                self._pending += 1
+            future = self.executor.submit(render_figure, job)
+            future.add_done_callback(lambda f: self._done(job, f))
+
+    def _done(self, job: RenderJob, future: Future) -> None:
+        """Collect the figure of a finished render job."""
+        with self._condition:
+            try:
+                future.result()
+                self._rendered(job)
+            except Exception as err:
+                self._errors += 1
+                logger.error(f"Figure could not be rendered: {err}")
+            finally:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def _rendered(self, job: RenderJob) -> None:
+        with self._condition:
+            if self.fingerprints is not None:
+                self.fingerprints.update(job.paths, job.fingerprint)
+            self._collect(job)
+
+    def _collect(self, job: RenderJob) -> None:
+        if self.figures_path is None:
+            return
+        for path in job.paths:
+            if path.suffix[1:] in COLLECTED_FORMATS:
+                collect_figure(path, figures_path=self.figures_path)
+
+    def wait(self) -> None:
+        """Wait until all submitted figures are rendered."""
+        for job in self.jobs:
+            render_figure(job)
+            self._rendered(job)
+        self.jobs = []
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+            errors, self._errors = self._errors, 0
+        if errors:
+            raise RuntimeError(f"{errors} figures could not be rendered.")
+
+    def close(self) -> None:
+        """Shut down the renderer processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,90 @@
+"""Incremental HTML report of the simulation experiments."""
+from pathlib import Path
+from typing import Optional
+
+import jinja2
+from sbmlsim import __version__ as sbmlsim_version
+from sbmlsim.experiment import ExperimentReport
+from sbmlsim.report.experiment_report import ReportResults
+from sbmlutils import log
+
+from pkdb_models.models.dulaglutide.cache import hash_content
+from pkdb_models.models.dulaglutide.fingerprints import FingerprintStore
+
+logger = log.get_logger(__name__)
+
+# templates overriding the templates of sbmlsim
+TEMPLATE_PATH = Path(__file__).parent / "templates"
+
+
+class IncrementalReport(ExperimentReport):
+    """ExperimentReport which only writes pages with changed fingerprints.
+
+    The fingerprint of a page is the hash of its template and context (models,
+    datasets, figures and code of the experiment), pages of the previous run
+    are reused if unchanged.
+
+    The experiment pages include the integrator statistics of the tasks
+    ('integrator_statistics' of the experiment data).
+    """
+
+    def __init__(
+        self,
+        results: ReportResults,
+        fingerprints: FingerprintStore,
+        metadata: dict = None,
+        **kwargs,
+    ):
+        super().__init__(results, metadata=metadata, **kwargs)
+        self.fingerprints = fingerprints
+
+    def create_report(
+        self,
+        output_path: Path,
+        filename: Optional[str] = None,
+        report_type: ExperimentReport.ReportType = ExperimentReport.ReportType.HTML,
+        **kwargs,
+    ) -> Path:
+        """Create HTML or markdown report, see `ExperimentReport.create_report`."""
+        if report_type == self.ReportType.HTML:
+            suffix = "html"
+        elif report_type == self.ReportType.MARKDOWN:
+            suffix = "md"
+        else:
+            return super().create_report(
+                output_path, filename=filename, report_type=report_type, **kwargs
+            )
+
+        env = jinja2.Environment(
+            loader=jinja2.ChoiceLoader(
+                [
+                    jinja2.FileSystemLoader(str(TEMPLATE_PATH)),
+                    jinja2.FileSystemLoader(str(self.template_path)),
+                ]
+            ),
+            extensions=[],
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        pages = [
+            (f"{exp_id}/{exp_id}.{suffix}", f"experiment.{suffix}", context)
+            for exp_id, context in self.data_dict.items()
+        ]
+        filename = filename if filename is not None else "index"
+        index_context = {"version": sbmlsim_version, "data": self.data_dict}
+        pages.append((f"{filename}.{suffix}", f"index.{suffix}", index_context))
+
+        for page, template_str, context in pages:
+            out_file = Path(output_path) / page
+            template_source, _, _ = env.loader.get_source(env, template_str)
+            fingerprint = hash_content(sbmlsim_version, template_source, context)
+            if self.fingerprints.unchanged([out_file], fingerprint):
+                continue
+            text = env.get_template(template_str).render(context)
+            out_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(out_file, "w") as f_out:
+                f_out.write(text)
+            self.fingerprints.update([out_file], fingerprint)
+
+        logger.info(f"report created: file://{out_file.as_posix()}")
+        return out_file
@@ -0,0 +1,151 @@
+"""Streaming on-disk store of simulation results.
+
+Long-horizon simulations (e.g. years of weekly dosing) produce results which
+are kept in memory as a whole before an xarray dataset is created. In
+streaming mode every finished segment is appended to an on-disk store
+instead, so the memory of the simulation does not grow with the horizon.
+
+A store is a directory with
+
+- 'data.f64': raw float64 rows of all segments of all timecourses, the
+  timecourses of a scan are written one after the other (chunks),
+- 'time.f64': time points of the timecourses (coordinates),
+- 'meta.json': columns, rows per timecourse and the scan dimensions.
+
+The results are opened as memory-mapped xarray datasets (copy-on-write),
+i.e., figures, pharmacokinetics and fit mappings read the data lazily from
+disk.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from sbmlsim.result import XResult
+from sbmlsim.units import UnitsInformation
+
+# scan dimensions as (dimension id, index)
+Dimensions = List[Tuple[str, List]]
+
+
+class ResultWriter:
+    """Appends the segments of the timecourses of a scan to a store.
+
+    The store is written to a temporary directory which is moved in place on
+    `close`, so stores are never partially written.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        if self._tmp_path.exists():
+            shutil.rmtree(self._tmp_path)
+        self._tmp_path.mkdir(parents=True)
+        self._file = open(self._tmp_path / "data.f64", "wb")
+        self._time_file = open(self._tmp_path / "time.f64", "wb")
+        self.columns: Optional[List[str]] = None
+        self.rows: List[int] = []
+
+    def start_timecourse(self) -> None:
+        """Start the next timecourse of the scan."""
+        self.rows.append(0)
+
+    def append(self, values: np.ndarray, columns: Sequence[str]) -> None:
+        """Append the rows of a finished segment."""
+        if self.columns is None:
+            self.columns = list(columns)
+        elif list(columns) != self.columns:
+            raise ValueError(
+                f"Columns of segment '{list(columns)}' do not match the "
+                f"columns of the store '{self.columns}'."
+            )
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        values.tofile(self._file)
+        if len(self.rows) == 1:
+            values[:, self.columns.index("time")].tofile(self._time_file)
+        self.rows[-1] += len(values)
+
+    def append_frame(self, df: pd.DataFrame) -> None:
+        """Append the results of a finished segment."""
+        self.append(df.values, columns=df.columns)
+
+    def close(self, dimensions: Dimensions) -> None:
+        """Write the metadata and move the store in place."""
+        self._file.close()
+        self._time_file.close()
+        if len(set(self.rows)) > 1:
+            shutil.rmtree(self._tmp_path)
+            raise ValueError(
+                f"Timecourses of a scan require identical time points, but "
+                f"rows: '{self.rows}'."
+            )
+        meta = {
+            "columns": self.columns,
+            "rows": self.rows[0] if self.rows else 0,
+            "timecourses": len(self.rows),
+            "dimensions": dimensions,
+        }
+        with open(self._tmp_path / "meta.json", "w") as f_json:
+            json.dump(meta, f_json, default=_json_index)
+
+        if self.path.exists():
+            # opened memory maps of a previous store stay valid
+            shutil.rmtree(self.path)
+        os.replace(self._tmp_path, self.path)
+
+
+def _json_index(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def scan_dimensions(scan) -> Dimensions:
+    """Dimensions of a scan for the metadata of the store."""
+    return [(dim.dimension, list(dim.index)) for dim in scan.dimensions]
+
+
+def open_result(path: Path, uinfo: Optional[UnitsInformation] = None) -> XResult:
+    """Open the results of a store as memory-mapped XResult.
+
+    The structure is identical to `XResult.from_dfs`, i.e., every column is
+    a variable with the dimensions '_time' and the scan dimensions.
+    """
+    path = Path(path)
+    with open(path / "meta.json", "r") as f_json:
+        meta = json.load(f_json)
+    if uinfo is None:
+        uinfo = UnitsInformation(udict={}, ureg=None)
+
+    columns: List[str] = meta["columns"]
+    dimensions: Dimensions = meta["dimensions"]
+    shape = [len(index) for _, index in dimensions]
+    data = np.memmap(
+        path / "data.f64",
+        dtype=np.float64,
+        mode="c",
+        shape=(meta["timecourses"], meta["rows"], len(columns)),
+    )
+
+    dims = ["_time"] + [dim_id for dim_id, _ in dimensions]
+    coords = {"_time": np.fromfile(path / "time.f64", dtype=np.float64)}
+    for dim_id, index in dimensions:
+        coords[dim_id] = index
+
+    data_vars = {}
+    for k, column in enumerate(columns):
+        # (timecourses, rows) -> (rows, *shape) without copying the data
+        values = data[:, :, k].T.reshape([meta["rows"]] + shape)
+        attrs = {"units": uinfo[column]} if column in uinfo else {}
+        data_vars[column] = (dims, values, attrs)
+
+    # coordinates are shared by all variables
+    xds = xr.Dataset(data_vars=data_vars, coords=coords)
+    xds.attrs["result_store"] = str(path)
+    return XResult(xdataset=xds, uinfo=uinfo)
@@ -1,4 +1,10 @@
-"""Tool to run the dulaglutide model factory and simulation experiments."""
+"""Tool to run the dulaglutide model factory and simulation experiments.
+
+The tool starts fast: experiment names are resolved with the lightweight
+experiment registry and the simulation stack (sbmlsim, matplotlib, pandas and
+the experiment modules) is only imported by the actions running simulations.
+See `benchmarks.startup` for the startup benchmark.
+"""
 
 import sys
 import subprocess
@@ -6,7 +12,12 @@ from enum import Enum
 import optparse
 from pathlib import Path
 from pkdb_models.models.dulaglutide import DULAGLUTIDE_PATH
-from pkdb_models.models.dulaglutide.simulations import run_simulation_experiments, EXPERIMENTS
+from pkdb_models.models.dulaglutide.experiments.registry import (
+    EXPERIMENT_GROUPS,
+    experiment_classes,
+    experiment_manifest,
+    resolve_experiment_names,
+)
 from sbmlutils.console import console
 
 FACTORY_SCRIPT_PATH = DULAGLUTIDE_PATH / "models" / "factory.py"
@@ -29,6 +40,8 @@ def _setup_custom_results_paths(results_dir: str):
     # Override the module paths
     dulaglutide.RESULTS_PATH = custom_path
     dulaglutide.RESULTS_PATH_SIMULATION = custom_path / "simulation"
+    dulaglutide.RESULTS_PATH_CACHE = custom_path / "cache"
+    dulaglutide.RESULTS_PATH_CHECKPOINT = custom_path / "checkpoints"
     console.print(f"Figure output directory set to: [cyan]{custom_path}[/cyan]")
     return custom_path
 
@@ -55,44 +68,64 @@ def _list_available_experiments():
     """Display all available experiment groups and individual experiments."""
     console.rule("[bold cyan]Available Simulation Experiments[/bold cyan]", style="cyan")
     console.print("\n[bold]You can use these group names:[/bold]")
-    console.print(f"  {', '.join([g for g in EXPERIMENTS.keys()])}")
+    console.print(f"  {', '.join([g for g in EXPERIMENT_GROUPS.keys()])}")
     console.print("\n[bold]Or these individual experiment names:[/bold]")
 
+    # metadata from the experiment manifest (without importing the experiments)
+    manifest = experiment_manifest()
     for group_name in ["studies", "misc", "scan"]:
-        if group_name in EXPERIMENTS and EXPERIMENTS[group_name]:
+        if group_name in EXPERIMENT_GROUPS and EXPERIMENT_GROUPS[group_name]:
             console.print(f"\n[yellow]{group_name}:[/yellow]")
-            for exp in EXPERIMENTS[group_name]:
-                console.print(f"  {exp.__name__}")
+            for exp_name in EXPERIMENT_GROUPS[group_name]:
+                info = manifest.get(exp_name)
+                if info is None:
+                    console.print(f"  {exp_name}")
+                    continue
+                weeks = info["horizon"] / (7 * 24 * 60)
+                console.print(
+                    f"  {exp_name:<28} {info['tasks']:>3} tasks, {weeks:6.1f} weeks, "
+                    f"{len(info['datasets']):>3} datasets"
+                )
+
+    if len(manifest) < len(EXPERIMENT_GROUPS["all"]):
+        console.print(
+            "\n[dim]Metadata of experiments is missing or outdated, rebuild the manifest with: "
+            "python -m pkdb_models.models.dulaglutide.experiments.registry[/dim]"
+        )
 
     console.print("\n[dim]Use '--experiments' with comma-separated names to run specific experiments.[/dim]")
-    console.print('[dim]Example: run_dulaglutide --action simulate --experiments "misc,LaCreta2016"[/dim]')
+    console.print('[dim]Example: run_dulaglutide --action simulate --experiments "misc,Xu2022"[/dim]')
     console.print('[dim]Or use "all" to run all experiments: run_dulaglutide --action simulate --experiments all[/dim]\n')
 
 
 def _resolve_experiment_names(experiment_names: list) -> tuple:
-    """Resolve experiment names to experiment classes."""
-    # Build dictionary of all available experiments by name
-    all_available_exp = {}
-    for category, exp_list in EXPERIMENTS.items():
-        if category != "all":
-            for exp in exp_list:
-                all_available_exp[exp.__name__] = exp
-
-    # Validate and collect requested experiments
-    experiment_classes = []
-    not_found = []
-
-    for exp_name in experiment_names:
-        # Check if it's a group name
-        if exp_name in EXPERIMENTS:
-            experiment_classes.extend(EXPERIMENTS[exp_name])
-        # Check if it's an individual experiment
-        elif exp_name in all_available_exp:
-            experiment_classes.append(all_available_exp[exp_name])
-        else:
-            not_found.append(exp_name)
+    """Resolve experiment names to experiment classes.
+
+    Only the modules of the resolved experiments are imported.
+    """
+    names, not_found = resolve_experiment_names(experiment_names)
+    return experiment_classes(names), not_found
+
+
+def _run_simulations(**kwargs) -> None:
+    """Run the simulation experiments (imports the simulation stack)."""
+    from pkdb_models.models.dulaglutide.simulations import run_simulation_experiments
+
+    run_simulation_experiments(**kwargs)
 
-    return experiment_classes, not_found
+
+def _figure_formats(value: str) -> list:
+    """Parse the figure formats option."""
+    from pkdb_models.models.dulaglutide.rendering import parse_figure_formats
+
+    return parse_figure_formats(value)
+
+
+def _memory_budget(value: str) -> int:
+    """Parse the memory budget option."""
+    from pkdb_models.models.dulaglutide.memory import parse_memory
+
+    return parse_memory(value)
 
 
 def main() -> None:
@@ -113,6 +146,115 @@ def main() -> None:
         help="Comma-separated list of simulation experiments and/or groups (for '--action simulate'). "
              "Use '--action list_experiments' to see all available options.",
     )
+    parser.add_option(
+        "-j", "--jobs",
+        dest="jobs",
+        type="int",
+        default=1,
+        help="Optional: Number of parallel processes for running the simulation experiments (default: 1)",
+    )
+    parser.add_option(
+        "--task-jobs",
+        dest="task_jobs",
+        type="int",
+        default=1,
+        help="Optional: Number of parallel processes for the tasks of an experiment, "
+             "per experiment process (default: 1)",
+    )
+    parser.add_option(
+        "--stream-results",
+        dest="stream_results",
+        action="store_true",
+        default=False,
+        help="Optional: Write the results segment by segment to disk and read them lazily "
+             "(flat memory for long-horizon simulations)",
+    )
+    parser.add_option(
+        "--export",
+        dest="export",
+        action="store_true",
+        default=False,
+        help="Optional: Export the results of all tasks to a partitioned Parquet dataset "
+             "'export' in the results directory (requires pyarrow)",
+    )
+    parser.add_option(
+        "--figure-formats",
+        dest="figure_formats",
+        default="svg,png",
+        help="Optional: Comma-separated formats of the figures, e.g. 'png'; 'none' to skip "
+             "the figures (default: svg,png)",
+    )
+    parser.add_option(
+        "--render-jobs",
+        dest="render_jobs",
+        type="int",
+        default=0,
+        help="Optional: Number of parallel processes rendering the figures in the background "
+             "(default: 0, renders after the simulations)",
+    )
+    parser.add_option(
+        "--integrator-statistics",
+        dest="step_statistics",
+        action="store_true",
+        default=False,
+        help="Optional: Integrate the tasks a second time with variable step size and "
+             "report the integrator steps per task",
+    )
+    parser.add_option(
+        "--memory-budget",
+        dest="memory_budget",
+        default=None,
+        help="Optional: Memory budget of the parallel experiment workers, e.g. '16G'; "
+             "experiments are only started if their estimated peak memory fits into "
+             "the budget (default: no budget)",
+    )
+    parser.add_option(
+        "--profile",
+        dest="profile",
+        action="store_true",
+        default=False,
+        help="Optional: Profile the phases of every experiment (datasets, integration, PK, "
+             "figures, report) in a single process; profiles are written to 'profile' in "
+             "the results directory",
+    )
+    parser.add_option(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        default=False,
+        help="Optional: Do not reuse cached simulation results, all simulations are integrated",
+    )
+    parser.add_option(
+        "--clear-cache",
+        dest="clear_cache",
+        action="store_true",
+        default=False,
+        help="Optional: Remove all cached simulation results and checkpoints before running",
+    )
+    parser.add_option(
+        "--checkpoint-every",
+        dest="checkpoint_every",
+        type="int",
+        default=0,
+        help="Optional: Store the model state every N segments of the timecourse simulations; "
+             "interrupted simulations resume from the last checkpoint (default: 0, no checkpoints)",
+    )
+    parser.add_option(
+        "--output-tolerance",
+        dest="output_tolerance",
+        type="float",
+        default=0.0,
+        help="Optional: Thin the simulation output to this relative tolerance, fit mapping "
+             "time points are always kept (default: 0, dense output)",
+    )
+    parser.add_option(
+        "--all-selections",
+        dest="all_selections",
+        action="store_true",
+        default=False,
+        help="Optional: Store all model variables in the results instead of the ones used in "
+             "figures and fit mappings (ad-hoc analysis)",
+    )
 
     console.rule("[bold cyan]DULAGLUTIDE PBPK/PD MODEL[/bold cyan]", style="cyan")
 
@@ -132,6 +274,20 @@ def main() -> None:
     except ValueError:
         _parser_message(f"Invalid action '{options.action}'. Please choose from {[a.value for a in Action]}.")
 
+    figure_formats = None
+    if action in (Action.SIMULATE, Action.ALL):
+        try:
+            figure_formats = _figure_formats(options.figure_formats)
+        except ValueError as err:
+            _parser_message(str(err))
+
+    memory_budget = None
+    if options.memory_budget and action in (Action.SIMULATE, Action.ALL):
+        try:
+            memory_budget = _memory_budget(options.memory_budget)
+        except ValueError as err:
+            _parser_message(str(err))
+
     # Setup custom results directory if provided
     if options.results_dir:
         _setup_custom_results_paths(options.results_dir)
@@ -151,11 +307,11 @@ def main() -> None:
         _list_available_experiments()
 
     elif action == Action.SIMULATE:
-        if not options.EXPERIMENTS:
+        if not options.experiments:
             _parser_message("For '--action simulate', the '--experiments' argument is required.")
 
         # Parse experiment names
-        exp_list = [e.strip() for e in options.EXPERIMENTS.split(",")]
+        exp_list = [e.strip() for e in options.experiments.split(",")]
 
         # Resolve names to experiment classes
         experiment_classes, not_found = _resolve_experiment_names(exp_list)
@@ -175,14 +331,46 @@ def main() -> None:
         # Run the experiments
         results_path = _get_current_results_path()
         console.rule("[bold cyan]Running Simulations[/bold cyan]", style="cyan")
-        run_simulation_experiments(experiment_classes=experiment_classes)
+        _run_simulations(
+            experiment_classes=experiment_classes,
+            jobs=options.jobs,
+            use_cache=not options.no_cache,
+            clear_cache=options.clear_cache,
+            checkpoint_every=options.checkpoint_every,
+            output_tolerance=options.output_tolerance,
+            all_selections=options.all_selections,
+            task_jobs=options.task_jobs,
+            stream_results=options.stream_results,
+            export=options.export,
+            figure_formats=figure_formats,
+            render_jobs=options.render_jobs,
+            memory_budget=memory_budget,
+            profile=options.profile,
+            step_statistics=options.step_statistics,
+        )
         console.print("[bold green]Simulations finished.[/bold green]")
         console.print(f"[bold green]Results saved to: {results_path / 'simulation'}[/bold green]")
 
     elif action == Action.ALL:
         console.rule("[bold cyan]Running: Factory and all simulations.[/bold cyan]", style="cyan")
         _run_factory()
-        run_simulation_experiments(selected="all")
+        _run_simulations(
+            selected="all",
+            jobs=options.jobs,
+            use_cache=not options.no_cache,
+            clear_cache=options.clear_cache,
+            checkpoint_every=options.checkpoint_every,
+            output_tolerance=options.output_tolerance,
+            all_selections=options.all_selections,
+            task_jobs=options.task_jobs,
+            stream_results=options.stream_results,
+            export=options.export,
+            figure_formats=figure_formats,
+            render_jobs=options.render_jobs,
+            memory_budget=memory_budget,
+            profile=options.profile,
+            step_statistics=options.step_statistics,
+        )
         console.print("\n[bold green]All scripts completed successfully![/bold green]")
 
     console.rule(style="white")
@@ -217,5 +405,42 @@ if __name__ == "__main__":
        
        With custom results directory for figures:
        $ run_dulaglutide --action all --results-dir '/path/to/my/results'
+
+       Run simulation experiments in parallel on 8 cores:
+       $ run_dulaglutide --action all --jobs 8
+
+       Run the tasks of a single study on 4 cores:
+       $ run_dulaglutide --action simulate --experiments Xu2022 --task-jobs 4
+
+       Render the figures on 2 cores while the simulations continue:
+       $ run_dulaglutide --action all --jobs 6 --render-jobs 2
+
+       Stream long-horizon results to disk instead of keeping them in memory:
+       $ run_dulaglutide --action all --stream-results
+
+       Export all results to a single Parquet dataset (study/task/selection/time):
+       $ run_dulaglutide --action all --export
+
+       Only render PNG figures (or no figures with 'none'):
+       $ run_dulaglutide --action all --figure-formats png
+
+       Simulation results are cached; bypass or clear the cache with:
+       $ run_dulaglutide --action all --no-cache
+       $ run_dulaglutide --action all --clear-cache
+
+       Store checkpoints every 10 segments to resume interrupted simulations:
+       $ run_dulaglutide --action all --checkpoint-every 10
+
+       Thin the simulation output to a relative tolerance of 1e-3:
+       $ run_dulaglutide --action all --output-tolerance 1e-3
+
+       Run on 8 cores within a memory budget of 16 GB:
+       $ run_dulaglutide --action all --jobs 8 --memory-budget 16G
+
+       Report the integrator steps of the tasks (stiff scenarios):
+       $ run_dulaglutide --action simulate --experiments Xu2022 --integrator-statistics
+
+       Profile the phases of the experiments (profile files and hot functions):
+       $ run_dulaglutide --action simulate --experiments Xu2022 --profile
     """
     main()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Observation-aware adaptive output sampling of timecourse results.
+
+The timecourse segments request a dense uniform output grid (e.g. 1000 steps
+per segment), but figures and fit mappings only use a few data time points
+and the smooth parts of the curves. `OutputSampling` thins the integrator
+output after the simulation:
+
+- all points within `dense_window` after the start of a segment (dosing
+  events) and the segment boundaries are kept,
+- the remaining points are thinned with a Douglas-Peucker line
+  simplification, i.e., linear interpolation between the kept points
+  deviates at most `tolerance` (relative to the range of each selection)
+  from the dense output,
+- rows at the exact observation times of the fit mappings are inserted by
+  linear interpolation of the dense output (identical to the interpolation
+  of the dense results in the fitting).
+
+For scans the union of the kept points of all timecourses is used, so all
+results of a scan share the time grid.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sbmlsim.experiment import SimulationExperiment
+
+
+@dataclass
+class OutputSampling:
+    """Settings of the adaptive output sampling."""
+
+    tolerance: float = 1e-3
+    dense_window: float = 60.0  # [min]
+
+    def settings(self) -> Dict[str, float]:
+        """Settings which determine the sampled results."""
+        return {"tolerance": self.tolerance, "dense_window": self.dense_window}
+
+    def _keep(self, time: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Mask of the rows to keep.
+
+        :param time: time points (segment boundaries are duplicated time points)
+        :param values: values with shape (n_time, n_values)
+        """
+        n = len(time)
+        keep = np.zeros(n, dtype=bool)
+        if n == 0:
+            return keep
+
+        # segments
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(time) <= 0) + 1])
+        ends = np.concatenate([starts[1:] - 1, [n - 1]])
+        keep[starts] = True
+        keep[ends] = True
+        segment_start = np.repeat(time[starts], ends - starts + 1)
+        keep |= time - segment_start <= self.dense_window
+
+        # scaling by tolerance and range of the values
+        values = np.nan_to_num(values)
+        scale = np.ptp(values, axis=0) * self.tolerance
+        mask = scale > 0
+        values = values[:, mask] / scale[mask]
+        if values.shape[1] == 0:
+            return keep
+
+        # Douglas-Peucker simplification between kept points of the segments
+        anchors = np.flatnonzero(keep)
+        stack = [(a, b) for a, b in zip(anchors[:-1], anchors[1:]) if b - a > 1]
+        while stack:
+            a, b = stack.pop()
+            if time[b] <= time[a]:
+                continue
+            w = (time[a + 1 : b] - time[a]) / (time[b] - time[a])
+            interp = values[a] + w[:, np.newaxis] * (values[b] - values[a])
+            errors = np.max(np.abs(values[a + 1 : b] - interp), axis=1)
+            k = int(np.argmax(errors))
+            if errors[k] > 1.0:
+                k += a + 1
+                keep[k] = True
+                if k - a > 1:
+                    stack.append((a, k))
+                if b - k > 1:
+                    stack.append((k, b))
+
+        return keep
+
+    def sample(
+        self, dfs: List[pd.DataFrame], times: Optional[np.ndarray] = None
+    ) -> List[pd.DataFrame]:
+        """Sample the results of the timecourses of a simulation.
+
+        :param dfs: results of the timecourses (identical time grid)
+        :param times: observation times which are included in the results
+        :return: sampled results
+        """
+        if not dfs:
+            return dfs
+        time = dfs[0]["time"].values
+        if any(len(df) != len(time) for df in dfs):
+            # no common time grid, sample timecourses individually
+            return [self.sample([df], times=times)[0] for df in dfs]
+
+        columns = [c for c in dfs[0].columns if c != "time"]
+        values = np.hstack([df[columns].values for df in dfs])
+        keep = self._keep(time, values)
+
+        if times is not None and len(times):
+            times = np.unique(times)
+            times = times[(times >= time[0]) & (times <= time[-1])]
+            times = times[~np.isin(times, time[keep])]
+
+        sampled = []
+        for df in dfs:
+            df_keep = df[keep]
+            if times is not None and len(times):
+                df_times = pd.DataFrame(
+                    {c: np.interp(times, time, df[c].values) for c in df.columns}
+                )
+                df_keep = pd.concat([df_keep, df_times], ignore_index=True)
+                df_keep = df_keep.iloc[
+                    np.argsort(df_keep["time"].values, kind="stable")
+                ]
+            sampled.append(df_keep.reset_index(drop=True))
+        return sampled
+
+
+def observation_times(
+    experiment: SimulationExperiment, time_unit: str = "min"
+) -> Dict[str, np.ndarray]:
+    """Time points of the fit mapping references per simulation.
+
+    :param experiment: initialized simulation experiment
+    :param time_unit: time unit of the model
+    :return: observation times in model time units per simulation key
+    """
+    times: Dict[str, List[np.ndarray]] = {}
+    for mapping in experiment._fit_mappings.values():
+        reference, observable = mapping.reference, mapping.observable
+        if reference.dset_id is None or observable.task_id is None:
+            continue
+        dset = experiment._datasets[reference.dset_id]
+        q_time = dset.get_quantity(reference.x.index)
+        sim_key = experiment._tasks[observable.task_id].simulation
+        times.setdefault(sim_key, []).append(
+            np.atleast_1d(q_time.to(time_unit).magnitude)
+        )
+    return {key: np.unique(np.concatenate(arrays)) for key, arrays in times.items()}
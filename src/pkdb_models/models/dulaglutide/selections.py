@@ -0,0 +1,64 @@
+"""Inference of the selections of the tasks of simulation experiments.
+
+The selections of a task are the selections which are read from its results,
+e.g. '[Cve_dul]' for concentrations and 'Aurine_dm' for amounts (see
+`Data.selection`; the index of the data has no brackets). These are collected from the data of the figures (curves) and of the fit
+mappings (observables). Results accessed directly, e.g. in matplotlib figures
+or pharmacokinetic calculations, cannot be inferred and must be declared by
+the experiment.
+"""
+from typing import Dict, Iterable, Set
+
+from sbmlsim.data import Data
+from sbmlsim.fit import FitMapping
+from sbmlsim.plot import Figure
+
+
+def _add_data(data: Data, selections: Dict[str, Set[str]]) -> None:
+    """Add the selections read by the data (including function variables)."""
+    if data is None:
+        return
+    if data.is_task():
+        selections.setdefault(data.task_id, set()).add(data.selection)
+    for variable in (getattr(data, "variables", None) or {}).values():
+        _add_data(variable, selections)
+
+
+def selection_data(selection: str, task_id: str) -> Data:
+    """Data of the task reading the selection, e.g. '[Cve_dul]' or 'Aurine_dm'.
+
+    The id includes the brackets, so amount and concentration of a species
+    are different data.
+    """
+    sid = f"{task_id}__{selection}"
+    if selection.startswith("[") and selection.endswith("]"):
+        return Data(
+            index=selection[1:-1],
+            symbol=Data.Symbols.CONCENTRATION,
+            task=task_id,
+            sid=sid,
+        )
+    return Data(index=selection, symbol=Data.Symbols.AMOUNT, task=task_id, sid=sid)
+
+
+def figure_selections(
+    figures: Iterable[Figure], selections: Dict[str, Set[str]]
+) -> Dict[str, Set[str]]:
+    """Add the selections read by the curves of the figures per task."""
+    for figure in figures:
+        for subplot in figure.subplots:
+            for curve in subplot.plot.curves:
+                for data in [curve.x, curve.y, curve.xerr, curve.yerr]:
+                    _add_data(data, selections)
+    return selections
+
+
+def fit_mapping_selections(
+    mappings: Iterable[FitMapping], selections: Dict[str, Set[str]]
+) -> Dict[str, Set[str]]:
+    """Add the selections read by the observables of the fit mappings per task."""
+    for mapping in mappings:
+        observable = mapping.observable
+        for data in [observable.x, observable.y]:
+            _add_data(data, selections)
+    return selections
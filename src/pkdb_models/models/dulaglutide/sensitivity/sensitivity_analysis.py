@@ -11,6 +11,8 @@ git checkout sbmlsim2
 """
 from __future__ import annotations
 
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 import roadrunner
@@ -30,6 +32,7 @@ from sbmlsim.sensitivity.parameters import (
 )
 
 from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.model_cache import load_model
 from pkdb_models.models.dulaglutide.fitting.parameters import parameters_all as fit_parameters
 
 dose_dulaglutide = 1.5  # [mg]
@@ -86,6 +89,13 @@ class DulaglutideSensitivitySimulation(SensitivitySimulation):
     tend = 4 * 7 * 24 * 60  # [min] (slow half-life)
     steps = 3000
 
+    @staticmethod
+    def load_model(model_path: Path, selections: list[str]) -> roadrunner.RoadRunner:
+        """Load roadrunner model from the compiled model state."""
+        rr: roadrunner.RoadRunner = load_model(model_path)
+        rr.selections = selections
+        return rr
+
     def simulate(self, r: roadrunner.RoadRunner, changes: dict[str, float]) -> dict[str, float]:
 
         # apply changes and simulate
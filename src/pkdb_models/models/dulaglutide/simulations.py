@@ -1,13 +1,16 @@
 """Run all simulation experiments."""
-import shutil
 from pathlib import Path
+from typing import Optional, Sequence
 
 from sbmlutils.console import console
 
+from pkdb_models.models.dulaglutide.cache import ResultCache
+from pkdb_models.models.dulaglutide.checkpoint import CheckpointStore
 from pkdb_models.models.dulaglutide.helpers import run_experiments
-from pkdb_models.models.dulaglutide.experiments.studies import *
-from pkdb_models.models.dulaglutide.experiments.misc import *
-from pkdb_models.models.dulaglutide.experiments.scans import *
+from pkdb_models.models.dulaglutide.profiling import start_profiling, stop_profiling
+from pkdb_models.models.dulaglutide.rendering import FIGURE_FORMATS
+from pkdb_models.models.dulaglutide.sampling import OutputSampling
+from pkdb_models.models.dulaglutide.experiments import registry
 import pkdb_models.models.dulaglutide as dulaglutide
 
 from sbmlutils import log
@@ -20,47 +23,61 @@ Figure.fig_dpi = 300
 
 logger = log.get_logger(__name__)
 
+# experiment groups, see `experiments.registry`
 EXPERIMENTS = {
-    "studies": [
-        Barrington2011,
-        Barrington2011a,
-        Blonde2015,
-        Chen2018,
-        Dungan2014,
-        Dungan2016,
-        FDAGBCM,
-        FDAGBCN,
-        FDAGBDO,
-        FDAGBDR,
-        Gao2024,
-        Gerstein2019,
-        Giorgino2015,
-        Liu2025,
-        Nauck2014,
-        Pratley2018,
-        Xu2022,
-        Zhang2023
-    ],
-    "hepatic_impairment": [
-    ],
-    "renal_impairment": [
-    ],
-    "misc": [
-        DoseDependencyExperiment,
-    ],
-    "scan": [
-        DulaglutideParameterScan
-    ]
+    group: registry.experiment_classes(names)
+    for group, names in registry.EXPERIMENT_GROUPS.items()
 }
-EXPERIMENTS["all"] = EXPERIMENTS["studies"] + EXPERIMENTS["misc"] + EXPERIMENTS["scan"]
 
 
 def run_simulation_experiments(
         selected: str = None,
         experiment_classes: list = None,
-        output_dir: Path = None
+        output_dir: Path = None,
+        jobs: int = 1,
+        use_cache: bool = True,
+        clear_cache: bool = False,
+        checkpoint_every: int = 0,
+        output_tolerance: float = 0.0,
+        all_selections: bool = False,
+        task_jobs: int = 1,
+        stream_results: bool = False,
+        export: bool = False,
+        figure_formats: Sequence[str] = FIGURE_FORMATS,
+        render_jobs: int = 0,
+        memory_budget: Optional[int] = None,
+        profile: bool = False,
+        step_statistics: bool = False,
 ) -> None:
-    """Run simulation experiments."""
+    """Run simulation experiments.
+
+    :param jobs: number of parallel worker processes for the experiments
+    :param use_cache: reuse cached task results for unchanged simulations
+    :param clear_cache: remove all cached task results and checkpoints before
+        running
+    :param checkpoint_every: store checkpoints of the model state every N
+        segments of the timecourse simulations, no checkpoints if 0
+    :param output_tolerance: relative tolerance of the adaptive output sampling,
+        dense integrator output if 0
+    :param all_selections: request all selections of the model instead of the
+        selections used in the figures and fit mappings
+    :param task_jobs: number of parallel worker processes for the tasks of an
+        experiment, serial tasks if 1
+    :param stream_results: stream the results segment by segment to disk
+    :param export: export the results of all tasks to a single partitioned
+        Parquet dataset in 'export' of the output directory (requires pyarrow)
+    :param figure_formats: formats of the figures, e.g. ["png"], no figures if empty
+    :param render_jobs: number of parallel headless renderer processes for the
+        figures, the figures are rendered after the simulations if 0
+    :param memory_budget: memory budget of the experiment workers [bytes],
+        experiments are only started if their estimated peak memory fits
+        into the budget; no budget if None
+    :param profile: profile the phases of the experiments (see `profiling`),
+        the profiles are written to 'profile' of the output directory. The
+        experiments, tasks and figures are executed in this process.
+    :param step_statistics: report the integrator steps of the tasks from a
+        second integration with variable step size
+    """
 
     # Figure.fig_dpi = 600
     # Figure.legend_fontsize = 10
@@ -87,20 +104,47 @@ def run_simulation_experiments(
         console.print("[yellow]Use selected='all' or selected='studies' or provide experiment_classes=[...][/yellow]\n")
         return
 
-    # Run the experiments
-    run_experiments(experiment_classes=experiments_to_run, output_dir=output_dir)
+    # Result cache and checkpoints
+    cache = ResultCache(dulaglutide.RESULTS_PATH_CACHE)
+    if clear_cache:
+        cache.clear()
+        CheckpointStore(dulaglutide.RESULTS_PATH_CHECKPOINT).clear()
 
-    # Collect figures into one folder
+    # Profiles only cover the calling process
+    profiler = None
+    if profile:
+        jobs, task_jobs, render_jobs = 1, 1, 0
+        profiler = start_profiling(Path(output_dir) / "profile")
+
+    # Run the experiments
+    try:
+        run_experiments(
+            experiment_classes=experiments_to_run,
+            output_dir=output_dir,
+            jobs=jobs,
+            cache_path=cache.cache_path if use_cache else None,
+            checkpoint_path=dulaglutide.RESULTS_PATH_CHECKPOINT if checkpoint_every else None,
+            checkpoint_every=checkpoint_every,
+            sampling=OutputSampling(tolerance=output_tolerance) if output_tolerance else None,
+            reduced_selections=not all_selections,
+            task_jobs=task_jobs,
+            stream_results=stream_results,
+            export=export,
+            figure_formats=figure_formats,
+            render_jobs=render_jobs,
+            memory_budget=memory_budget,
+            step_statistics=step_statistics,
+        )
+    finally:
+        stop_profiling()
+
+    if profiler:
+        profiler.save()
+        profiler.print_summary()
+
+    # figures are collected by the renderer
     figures_dir = output_dir / "_figures"
-    figures_dir.mkdir(parents=True, exist_ok=True)
-    for f in output_dir.glob("**/*.png"):
-        if f.parent == figures_dir:
-            continue
-        try:
-            shutil.copy2(f, figures_dir / f.name)
-        except Exception as err:
-            print(f"file {f.name} in {f.parent} fails, skipping. Error: {err}")
-    console.print(f"Figures copied to: file://{figures_dir}", style="info")
+    console.print(f"Figures collected in: file://{figures_dir}", style="info")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1068 @@
+"""Simulator for the dulaglutide model."""
+import hashlib
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from copy import deepcopy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import roadrunner
+from sbmlsim.model import AbstractModel, RoadrunnerSBMLModel
+from sbmlsim.result import XResult
+from sbmlsim.simulation import AbstractSim, ScanSim, Timecourse, TimecourseSim
+from sbmlsim.simulator.simulation_serial import SimulatorSerial
+from sbmlsim.units import UnitsInformation
+from sbmlutils import log
+
+from pkdb_models.models.dulaglutide.cache import ResultCache, hash_content
+from pkdb_models.models.dulaglutide.checkpoint import Checkpoint, CheckpointStore
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
+from pkdb_models.models.dulaglutide.model_cache import CachedRoadrunnerSBMLModel
+from pkdb_models.models.dulaglutide.result_store import (
+    Dimensions,
+    ResultWriter,
+    open_result,
+    scan_dimensions,
+)
+from pkdb_models.models.dulaglutide.sampling import OutputSampling
+from pkdb_models.models.dulaglutide.steady_state import periodic_steady_state
+from pkdb_models.models.dulaglutide.telemetry import COUNTERS, measure, telemetry_active
+
+logger = log.get_logger(__name__)
+
+# prefix of the integrator statistics in the attributes of the task results
+INTEGRATOR_PREFIX = "integrator_"
+
+# statistics of the shared prefixes
+PREFIX_STATISTICS: List[str] = ["prefix_hits", "prefix_segments", "prefix_time_saved"]
+
+
+def _from_steady_state(simulation: TimecourseSim) -> bool:
+    """Repeated dosing simulation starting from the periodic steady state."""
+    return isinstance(simulation, RepeatedDosingSim) and simulation.steady_state
+
+
+def integrator_statistics(xres: XResult) -> Dict[str, float]:
+    """Integrator statistics of a task result (see `DulaglutideSimulator`).
+
+    Empty for results which were not integrated by the simulator.
+    """
+    return {
+        key[len(INTEGRATOR_PREFIX):]: value
+        for key, value in xres.xds.attrs.items()
+        if key.startswith(INTEGRATOR_PREFIX)
+    }
+
+
+@dataclass
+class _Snapshot:
+    """Model state and results at the end of a shared prefix."""
+
+    values: Dict[str, float]
+    frames: List[pd.DataFrame]
+    t_offset: float
+    duration: float
+    uses: int
+
+
+@dataclass
+class _PendingTask:
+    """Task which is executed by a task worker."""
+
+    future: Future
+    scan: ScanSim
+    uinfo: UnitsInformation
+    cache_key: Optional[str]
+    stream_path: Optional[Path]
+
+
+class DulaglutideSimulator(SimulatorSerial):
+    """Serial simulator with optional caching of task results.
+
+    If a `ResultCache` is provided, results of timecourse and scan simulations
+    are looked up in the cache before integration and stored after integration.
+
+    `RepeatedDosingSim` simulations continue the integration after every
+    dosing interval with the dose changes applied and collect the results in a
+    single array (one integration per dosing interval as for the chained
+    timecourses, but without a DataFrame per segment).
+    Simulations with `steady_state` start from the periodic steady state of
+    the dosing interval and do not use checkpoints.
+
+    Timecourse simulations which start with the same sequence of segments
+    (identical changes after normalization, including the model changes of
+    the experiment) share the integration of this prefix. The tasks run
+    within `planning` are only planned: the prefix tree of their timecourses
+    is counted and prefixes of multiple timecourses are integrated once by
+    the following run of the tasks. The state and the results at the end of
+    a shared prefix are stored and restored for all timecourses branching
+    from it; the integration time of the restored prefixes is reported as
+    `prefix_time_saved` in the statistics. Repeated dosing simulations,
+    checkpoints and streamed results do not share prefixes.
+
+    If a `CheckpointStore` is provided, the state of timecourse simulations is
+    stored at segment boundaries. Simulations resume from the last stored
+    checkpoint of their segments, other timecourses can be forked from a
+    checkpoint with `fork`.
+
+    If an `OutputSampling` is provided, the results are thinned to the
+    sampling tolerance and include the registered observation times
+    (see `add_observation_times`).
+
+    The simulator counts the integrated segments, the output steps and the
+    output points. The output steps are the output rows of the integration
+    without the start points of the segments, i.e. the requested steps of the
+    timecourses with fixed output steps (default), not the steps of CVODE
+    (see `step_statistics`). The counters and the wall time, CPU time and
+    peak memory of every task are available with `task_telemetry` while the
+    telemetry is active (see `telemetry`).
+
+    With `step_statistics` the integrator statistics of every task (segments,
+    CVODE steps, smallest and largest step and the tolerances) are stored in
+    the attributes of its result, see `integrator_statistics`. The timecourses
+    of the task are integrated a second time with variable step size, where
+    every output row is a step of CVODE. A small smallest step indicates a
+    stiff scenario. roadrunner (2.x) does not expose the counters of CVODE
+    and its integrator listener cannot be attached from Python, so the steps
+    require the second integration and right-hand side and Jacobian
+    evaluations and error test failures are not available. Results with
+    statistics are cached separately from results without.
+
+    With `task_jobs` > 1 the tasks run within `parallel_tasks` are executed
+    by a pool of task workers; `collect` returns the results of the tasks.
+
+    With `stream_results` the tasks run within `streaming` write every
+    finished segment to a result store (see `result_store`) and return
+    memory-mapped results. Streamed results are not thinned by the output
+    sampling and do not use checkpoints, which keep the results up to a
+    segment in memory.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        cache: Optional[ResultCache] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        sampling: Optional[OutputSampling] = None,
+        task_jobs: int = 1,
+        stream_results: bool = False,
+        step_statistics: bool = False,
+        **kwargs,
+    ):
+        self.cache = cache
+        self.checkpoints = checkpoints
+        self.sampling = sampling
+        self.task_jobs = task_jobs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._parallel: bool = False
+        self.stream_results = stream_results
+        self.step_statistics = step_statistics
+        self._stream_path: Optional[Path] = None
+        self._observation_times: Dict[str, np.ndarray] = {}
+        self._times: Optional[np.ndarray] = None
+        self.selections: Optional[List[str]] = None
+        self._model_hash: Optional[str] = None
+        self._state_ids: Dict[str, List[str]] = {}
+        self._planning: bool = False
+        self._prefix_counts: Counter = Counter()
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self.prefix_hits: int = 0
+        self.prefix_segments: int = 0
+        self.prefix_time_saved: float = 0.0
+        self.segments: int = 0
+        self.output_steps: int = 0
+        self.output_points: int = 0
+        # CVODE steps of the current task (with `step_statistics`)
+        self._steps: Dict[str, float] = {}
+        self._task_telemetry: Dict[int, Dict[str, Any]] = {}
+        super().__init__(model=model, **kwargs)
+
+    def set_model(self, model):
+        """Set model for simulator and reset the model hash.
+
+        SBML files and abstract models are loaded via the model cache (see
+        `model_cache`), loaded RoadrunnerSBMLModels are used as they are.
+        """
+        self._model_hash = None
+        if isinstance(model, (str, Path)):
+            model = CachedRoadrunnerSBMLModel(source=model)
+        elif isinstance(model, AbstractModel) and not isinstance(
+            model, RoadrunnerSBMLModel
+        ):
+            model = CachedRoadrunnerSBMLModel.from_abstract_model(
+                abstract_model=model
+            )
+        super().set_model(model)
+
+    def set_timecourse_selections(self, selections):
+        """Set timecourse selection in model."""
+        self.selections = list(selections) if selections else None
+        super().set_timecourse_selections(selections)
+
+    @property
+    def model_hash(self) -> str:
+        """Hash of the SBML of the current model."""
+        if self._model_hash is None:
+            sbml = self.r.getSBML()
+            self._model_hash = hashlib.sha256(sbml.encode("utf-8")).hexdigest()
+        return self._model_hash
+
+    def _tolerances(self) -> Dict:
+        integrator = self.r.integrator
+        return {
+            "absolute_tolerance": integrator.getValue("absolute_tolerance"),
+            "relative_tolerance": integrator.getValue("relative_tolerance"),
+            "variable_step_size": integrator.getValue("variable_step_size"),
+            "roadrunner": roadrunner.__version__,
+        }
+
+    def _cache_key(self, scan: ScanSim) -> str:
+        sampling = None
+        if self.sampling is not None:
+            sampling = {**self.sampling.settings(), "times": self._times}
+        return self.cache.key(
+            model_hash=self.model_hash,
+            simulation=scan,
+            tolerances=self._tolerances(),
+            selections=self.selections,
+            sampling=sampling,
+            step_statistics=self.step_statistics,
+        )
+
+    def add_observation_times(self, simulation: AbstractSim, times: np.ndarray) -> None:
+        """Register observation times of a simulation for the output sampling.
+
+        :param simulation: simulation (timecourse or scan) of a task
+        :param times: observation times in model time units
+        """
+        simulation = deepcopy(simulation)
+        simulation.normalize(uinfo=self.uinfo)
+        self._observation_times[hash_content(simulation)] = np.asarray(times)
+
+    def _lookup_observation_times(self, scan: ScanSim) -> Optional[np.ndarray]:
+        if not self._observation_times:
+            return None
+        for simulation in [scan, scan.simulation]:
+            times = self._observation_times.get(hash_content(simulation))
+            if times is not None:
+                return times
+        return None
+
+    def statistics(self) -> Dict[str, float]:
+        """Statistics of the result cache, the shared prefixes and the integration."""
+        return {
+            "cache_hits": self.cache.hits if self.cache else 0,
+            "cache_misses": self.cache.misses if self.cache else 0,
+            **self._prefix_statistics(),
+            **self._counters(),
+        }
+
+    def _prefix_statistics(self) -> Dict[str, float]:
+        return {key: getattr(self, key) for key in PREFIX_STATISTICS}
+
+    def _counters(self) -> Dict[str, int]:
+        return {key: getattr(self, key) for key in COUNTERS}
+
+    def _observe_steps(self, simulations: List[TimecourseSim]) -> None:
+        """Integrate the timecourses with variable step size and count the steps.
+
+        Every output row of the integration with variable step size is a step
+        of CVODE, only the time is selected. Discarded segments are included.
+        Timecourses continuing the model state (no reset) are skipped, their
+        integration would change the state. Repeated dosing simulations from
+        the steady state are integrated from the solved steady state.
+        """
+        self._steps = {"segments": 0, "steps": 0, "min_step": np.inf, "max_step": 0.0}
+        integrator = self.r.integrator
+        variable_step_size = integrator.getValue("variable_step_size")
+        selections = list(self.r.timeCourseSelections)
+        counters = self._counters()
+        integrator.setValue("variable_step_size", True)
+        self.r.timeCourseSelections = ["time"]
+        try:
+            for simulation in simulations:
+                if not simulation.reset:
+                    continue
+                simulation = deepcopy(simulation)
+                for tc in simulation.timecourses:
+                    tc.discard = False
+                if _from_steady_state(simulation):
+                    df = self._steady_state_dosing(simulation)
+                else:
+                    # generic integration of all segments
+                    df = SimulatorSerial._timecourse(self, simulation)
+                n = len(simulation.timecourses)
+                steps = np.diff(df["time"].values)
+                # segment boundaries have no step
+                steps = steps[steps > 0]
+                self._steps["segments"] += n
+                self._steps["steps"] += len(df) - n
+                if steps.size:
+                    self._steps["min_step"] = min(
+                        self._steps["min_step"], float(steps.min())
+                    )
+                    self._steps["max_step"] = max(
+                        self._steps["max_step"], float(steps.max())
+                    )
+        finally:
+            integrator.setValue("variable_step_size", variable_step_size)
+            self.r.timeCourseSelections = selections
+            # the counters are only counted by the simulation of the task
+            for key, value in counters.items():
+                setattr(self, key, value)
+
+    def _integrator_statistics(self) -> Dict[str, float]:
+        """Integrator statistics of the task, empty without `step_statistics`."""
+        if not self.step_statistics or not self._steps:
+            return {}
+        tolerances = self._tolerances()
+        has_steps = self._steps["max_step"] > 0
+        statistics = {
+            "segments": self._steps["segments"],
+            "steps": self._steps["steps"],
+            "min_step": self._steps["min_step"] if has_steps else np.nan,
+            "max_step": self._steps["max_step"] if has_steps else np.nan,
+            "absolute_tolerance": float(tolerances["absolute_tolerance"]),
+            "relative_tolerance": float(tolerances["relative_tolerance"]),
+            "variable_step_size": int(tolerances["variable_step_size"]),
+        }
+        return {f"{INTEGRATOR_PREFIX}{key}": value for key, value in statistics.items()}
+
+    def task_telemetry(self, result: Union[XResult, _PendingTask]) -> Optional[Dict]:
+        """Telemetry of the task with the result (returned by `run_scan` or `collect`).
+
+        Wall time, CPU time, peak RSS, the counters and if the result was
+        cached. None if the result was not created by this simulator.
+        """
+        return self._task_telemetry.pop(id(result), None)
+
+    def run_timecourse(self, simulation: TimecourseSim) -> XResult:
+        """Run single timecourse."""
+        if not isinstance(simulation, TimecourseSim):
+            raise ValueError(
+                f"'run_timecourse' requires TimecourseSim, but " f"'{type(simulation)}'"
+            )
+        return self.run_scan(ScanSim(simulation=simulation))
+
+    def run_scan(self, scan: ScanSim) -> Union[XResult, _PendingTask]:
+        """Run a scan simulation, results are reused from the cache.
+
+        Within `parallel_tasks` the scan is submitted to the task workers and
+        the pending task is returned, see `collect`.
+        """
+        if self._planning:
+            self._plan_scan(scan)
+            return None
+
+        counters = self._counters()
+        cache_hits = self.cache.hits if self.cache else 0
+        with measure() as telemetry:
+            result = self._run_scan(scan)
+        if telemetry_active() and not isinstance(result, _PendingTask):
+            telemetry.update(
+                {key: getattr(self, key) - counters[key] for key in COUNTERS}
+            )
+            telemetry["cached"] = self.cache is not None and self.cache.hits > cache_hits
+            self._task_telemetry[id(result)] = telemetry
+        return result
+
+    def _run_scan(self, scan: ScanSim) -> Union[XResult, _PendingTask]:
+        scan.normalize(uinfo=self.uinfo)
+        if self.sampling is not None:
+            self._times = self._lookup_observation_times(scan)
+
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(scan)
+            xds = self.cache.load(key)
+            if xds is not None:
+                logger.debug(f"Cached result: '{key}'")
+                return XResult(xdataset=xds, uinfo=self.uinfo)
+
+        stream_path = None
+        if self._stream_path is not None:
+            stream_path = self._stream_path / hash_content(
+                self.model_hash, scan, self._tolerances(), self.selections
+            )
+
+        if self._parallel and self.model.source.is_path():
+            return self._submit(scan, cache_key=key, stream_path=stream_path)
+
+        self._steps = {}
+        if stream_path is not None:
+            _, simulations = scan.to_simulations()
+            self._stream_timecourses(
+                simulations, stream_path, dimensions=scan_dimensions(scan)
+            )
+            xres = open_result(stream_path, uinfo=self.uinfo)
+        else:
+            xres = super().run_scan(scan)
+        xres.xds.attrs.update(self._integrator_statistics())
+        if key is not None:
+            self.cache.store(key, xres.xds)
+        return xres
+
+    @contextmanager
+    def planning(self) -> Iterator[None]:
+        """Plan the shared prefixes of the tasks run in the context.
+
+        The tasks are not executed, `run_timecourse` and `run_scan` return
+        None. Replaces the plan of previous tasks.
+        """
+        self._prefix_counts = Counter()
+        self._snapshots = {}
+        self._planning = True
+        try:
+            yield
+        finally:
+            self._planning = False
+            self._prefix_counts = Counter(
+                {key: n for key, n in self._prefix_counts.items() if n > 1}
+            )
+            logger.debug(f"Shared prefixes: {len(self._prefix_counts)}")
+
+    def _plan_scan(self, scan: ScanSim) -> None:
+        """Count the prefixes of the timecourses of a scan which are integrated."""
+        scan.normalize(uinfo=self.uinfo)
+        if self._stream_path is not None:
+            return
+        if self.cache is not None:
+            if self.sampling is not None:
+                self._times = self._lookup_observation_times(scan)
+            if self._cache_key(scan) in self.cache:
+                return
+        _, simulations = scan.to_simulations()
+        self._count_prefixes(simulations)
+
+    def _plan_timecourses(self, simulations: List[TimecourseSim]) -> None:
+        """Plan the shared prefixes of normalized timecourse simulations."""
+        with self.planning():
+            self._count_prefixes(simulations)
+
+    def _count_prefixes(self, simulations: Iterable[TimecourseSim]) -> None:
+        for simulation in simulations:
+            if self._prefix_sharing(simulation):
+                # the complete simulation is not a prefix
+                self._prefix_counts.update(
+                    self._snapshot_key(key)
+                    for key in self._prefix_keys(simulation)[:-1]
+                )
+
+    def _prefix_sharing(self, simulation: TimecourseSim) -> bool:
+        return (
+            self.checkpoints is None
+            and not isinstance(simulation, RepeatedDosingSim)
+            and simulation.reset
+            and len(simulation.timecourses) > 1
+        )
+
+    @contextmanager
+    def parallel_tasks(self) -> Iterator[None]:
+        """Execute the tasks run in the context by the task workers.
+
+        Every task worker runs its tasks with its own simulator, so prefixes
+        are only shared between the timecourses of a task.
+        """
+        self._parallel = self.task_jobs > 1
+        try:
+            yield
+        finally:
+            self._parallel = False
+
+    @contextmanager
+    def streaming(self, results_path: Path) -> Iterator[None]:
+        """Stream the results of the tasks run in the context to `results_path`.
+
+        Only active if the simulator was created with `stream_results`.
+        """
+        self._stream_path = Path(results_path) if self.stream_results else None
+        try:
+            yield
+        finally:
+            self._stream_path = None
+
+    def _stream_timecourses(
+        self, simulations: List[TimecourseSim], path: Path, dimensions: Dimensions
+    ) -> None:
+        """Run the timecourses and write every finished segment to the store."""
+        if self.step_statistics:
+            self._observe_steps(simulations)
+        writer = ResultWriter(path)
+        for simulation in simulations:
+            writer.start_timecourse()
+            if _from_steady_state(simulation):
+                df = self._steady_state_dosing(simulation)
+                writer.append_frame(df)
+                self.output_points += len(df)
+                continue
+
+            timecourses = self._segments(simulation, 0, len(simulation.timecourses))
+            reset, t_offset = simulation.reset, simulation.time_offset
+            for k, tc in enumerate(timecourses):
+                if k > 0 and isinstance(simulation, RepeatedDosingSim):
+                    block = self._continue_segment(
+                        tc, t_offset=t_offset, k_time=writer.columns.index("time")
+                    )
+                    writer.append(block, columns=writer.columns)
+                    self.output_points += len(block)
+                    t_offset += tc.end
+                    continue
+
+                frames, t_offset = self._run_segments(
+                    [tc], reset=reset, t_offset=t_offset
+                )
+                reset = False
+                for df in frames:
+                    writer.append_frame(df)
+                    self.output_points += len(df)
+        writer.close(dimensions=dimensions)
+
+    def _submit(
+        self, scan: ScanSim, cache_key: Optional[str], stream_path: Optional[Path]
+    ) -> _PendingTask:
+        """Submit the timecourses of the scan to the task workers."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.task_jobs,
+                initializer=_init_task_worker,
+                initargs=(
+                    self.integrator_settings,
+                    self.checkpoints,
+                    self.sampling,
+                    self.step_statistics,
+                ),
+            )
+        _, simulations = scan.to_simulations()
+        for simulation in simulations:
+            # quantities are bound to the unit registry of the model
+            simulation.strip_units()
+        future = self._executor.submit(
+            _run_task,
+            str(self.model.source.path),
+            self.selections,
+            self._times,
+            simulations,
+            str(stream_path) if stream_path else None,
+            scan_dimensions(scan),
+        )
+        return _PendingTask(
+            future=future,
+            scan=scan,
+            uinfo=self.uinfo,
+            cache_key=cache_key,
+            stream_path=stream_path,
+        )
+
+    def collect(self, result: Union[XResult, _PendingTask]) -> XResult:
+        """Result of a task, waits for tasks executed by the task workers."""
+        if not isinstance(result, _PendingTask):
+            return result
+
+        dfs, statistics, telemetry, integrator = result.future.result()
+        for key, value in statistics.items():
+            setattr(self, key, getattr(self, key) + value)
+        if result.stream_path is not None:
+            xres = open_result(result.stream_path, uinfo=result.uinfo)
+        else:
+            xres = XResult.from_dfs(dfs=dfs, scan=result.scan, uinfo=result.uinfo)
+        xres.xds.attrs.update(integrator)
+        if result.cache_key is not None:
+            self.cache.store(result.cache_key, xres.xds)
+        if telemetry_active():
+            self._task_telemetry[id(xres)] = telemetry
+        return xres
+
+    def close(self) -> None:
+        """Shut down the task workers."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _timecourses(self, simulations: List[TimecourseSim]) -> List[pd.DataFrame]:
+        if self.step_statistics:
+            self._observe_steps(simulations)
+        dfs = super()._timecourses(simulations)
+        if self.sampling is not None:
+            dfs = self.sampling.sample(dfs, times=self._times)
+        self.output_points += sum(len(df) for df in dfs)
+        return dfs
+
+    def _integrate(self, simulation: TimecourseSim) -> pd.DataFrame:
+        """Integrate the segments of the timecourse simulation."""
+        df = super()._timecourse(simulation)
+        n = len(simulation.timecourses)
+        self.segments += n
+        self.output_steps += len(df) - n
+        return df
+
+    @staticmethod
+    def _prefix_keys(simulation: TimecourseSim) -> List[str]:
+        """Keys of all prefixes of the segments of a simulation (checkpoints).
+
+        The key of a prefix is chained from the key of the shorter prefix and
+        the next segment, i.e., the keys form a prefix tree.
+        """
+        keys = []
+        key = hash_content(simulation.time_offset)
+        for tc in simulation.timecourses:
+            key = hash_content(key, tc)
+            keys.append(key)
+        return keys
+
+    def _get_state_ids(self) -> List[str]:
+        """Ids of the model state which are not determined by assignment rules.
+
+        Parameters and compartments are set before the species, so species
+        amounts are not affected by changed volumes.
+        """
+        if self.model_hash not in self._state_ids:
+            rules = set(self.r.getAssignmentRuleIds())
+            model = self.r.model
+            ids = (
+                list(model.getGlobalParameterIds())
+                + list(model.getCompartmentIds())
+                + list(model.getFloatingSpeciesIds())
+            )
+            self._state_ids[self.model_hash] = [sid for sid in ids if sid not in rules]
+        return self._state_ids[self.model_hash]
+
+    def _run_segments(
+        self, timecourses: List[Timecourse], reset: bool, t_offset: float
+    ) -> Tuple[List[pd.DataFrame], float]:
+        """Run segments of a timecourse simulation.
+
+        Returns the frames of the segments which are not discarded and the
+        time offset after the segments.
+        """
+        frames = []
+        for tc in timecourses:
+            discard = tc.discard
+            if discard:
+                tc = deepcopy(tc)
+                tc.discard = False
+            df = self._integrate(
+                TimecourseSim(timecourses=[tc], reset=reset, time_offset=t_offset)
+            )
+            reset = False
+            if not discard:
+                frames.append(df)
+                t_offset += tc.end
+        return frames, t_offset
+
+    @staticmethod
+    def _segments(simulation: TimecourseSim, start: int, end: int) -> List[Timecourse]:
+        """Segments of the simulation, model changes only apply to the first segment."""
+        timecourses = []
+        for k in range(start, end):
+            tc = simulation.timecourses[k]
+            if k > 0 and tc.model_changes:
+                tc = deepcopy(tc)
+                tc.model_changes = {}
+            timecourses.append(tc)
+        return timecourses
+
+    def _timecourse(self, simulation: TimecourseSim) -> pd.DataFrame:
+        """Timecourse simulation."""
+        if _from_steady_state(simulation):
+            return self._steady_state_dosing(simulation)
+
+        if self.checkpoints is not None and simulation.reset:
+            return self._checkpoint_timecourse(simulation)
+
+        if isinstance(simulation, RepeatedDosingSim):
+            return self._repeated_dosing(simulation)
+
+        if self._prefix_counts and self._prefix_sharing(simulation):
+            keys = [self._snapshot_key(key) for key in self._prefix_keys(simulation)]
+            shared = [
+                k for k, key in enumerate(keys[:-1]) if key in self._prefix_counts
+            ]
+            if shared:
+                return self._shared_prefix_timecourse(simulation, keys, shared)
+
+        return self._integrate(simulation)
+
+    def _snapshot_key(self, prefix_key: str) -> str:
+        return hash_content(
+            prefix_key, self.model_hash, self._tolerances(), self.selections
+        )
+
+    def _release(self, key: str, uses: int = 1) -> None:
+        """Release uses of a snapshot, the snapshot is removed after its last use."""
+        snapshot = self._snapshots[key]
+        snapshot.uses -= uses
+        if snapshot.uses <= 0:
+            del self._snapshots[key]
+
+    def _restore(
+        self, simulation: TimecourseSim, keys: List[str], shared: List[int]
+    ) -> _Snapshot:
+        """Bring the model to the state at the end of the deepest shared prefix.
+
+        If no snapshot exists the prefix is simulated from the snapshot of the
+        next shorter shared prefix, so every segment of the prefix tree is
+        integrated only once.
+
+        :param keys: snapshot keys of the prefixes of the simulation
+        :param shared: indices of the shared prefixes (ascending)
+        """
+        k_end = shared[-1]
+        snapshot = self._snapshots.get(keys[k_end])
+        if snapshot is not None:
+            for sid, value in snapshot.values.items():
+                self.r[sid] = value
+            self.prefix_hits += 1
+            self.prefix_segments += k_end + 1
+            self.prefix_time_saved += snapshot.duration
+            self._release(keys[k_end])
+            return snapshot
+
+        uses = self._prefix_counts[keys[k_end]]
+        if len(shared) > 1:
+            parent = self._restore(simulation, keys, shared[:-1])
+            ts = time.perf_counter()
+            frames, t_offset = self._run_segments(
+                self._segments(simulation, shared[-2] + 1, k_end + 1),
+                reset=False,
+                t_offset=parent.t_offset,
+            )
+            frames = parent.frames + frames
+            duration = parent.duration + time.perf_counter() - ts
+            # all further uses of the parent go through this snapshot
+            if keys[shared[-2]] in self._snapshots:
+                self._release(keys[shared[-2]], uses=uses - 1)
+        else:
+            ts = time.perf_counter()
+            frames, t_offset = self._run_segments(
+                self._segments(simulation, 0, k_end + 1),
+                reset=True,
+                t_offset=simulation.time_offset,
+            )
+            duration = time.perf_counter() - ts
+
+        snapshot = _Snapshot(
+            values={sid: self.r[sid] for sid in self._get_state_ids()},
+            frames=frames,
+            t_offset=t_offset,
+            duration=duration,
+            uses=uses - 1,
+        )
+        self._snapshots[keys[k_end]] = snapshot
+        return snapshot
+
+    def _shared_prefix_timecourse(
+        self, simulation: TimecourseSim, keys: List[str], shared: List[int]
+    ) -> pd.DataFrame:
+        """Timecourse simulation continued from the snapshot of a shared prefix."""
+        snapshot = self._restore(simulation, keys, shared)
+        frames, _ = self._run_segments(
+            self._segments(simulation, shared[-1] + 1, len(simulation.timecourses)),
+            reset=False,
+            t_offset=snapshot.t_offset,
+        )
+        return pd.concat(snapshot.frames + frames, sort=False)
+
+    def _repeated_dosing(self, simulation: RepeatedDosingSim) -> pd.DataFrame:
+        """Repeated dosing simulation.
+
+        The first dosing interval (including model changes and initial changes)
+        is simulated as a normal timecourse. For all following intervals only
+        the dose changes are applied and the integration is continued; results
+        are collected in a single array. Every interval is a separate
+        integration as for the chained segments, only the bookkeeping per
+        segment is saved (see `dosing`).
+        """
+        tc0 = simulation.timecourses[0]
+        df0 = self._integrate(
+            TimecourseSim(
+                timecourses=[tc0],
+                reset=simulation.reset,
+                time_offset=simulation.time_offset,
+            )
+        )
+        columns = list(df0.columns)
+        k_time = columns.index("time")
+
+        blocks = [df0.values]
+        t_offset = simulation.time_offset + tc0.end
+        for tc in simulation.timecourses[1:]:
+            blocks.append(self._continue_segment(tc, t_offset=t_offset, k_time=k_time))
+            t_offset += tc.end
+
+        return pd.DataFrame(np.vstack(blocks), columns=columns)
+
+    def _steady_state_dosing(self, simulation: RepeatedDosingSim) -> pd.DataFrame:
+        """Repeated dosing simulation from the periodic steady state.
+
+        The model is initialized with the model changes and the changes of the
+        first dosing interval without the dose. The pre-dose state of the
+        periodic steady state is solved (see `steady_state`) and the doses of
+        the regimen are simulated from this state. The states excluded from
+        the steady state (accumulated amounts and pharmacodynamics) start from
+        their initial values.
+        """
+        tc0 = simulation.timecourses[0]
+        dose_changes = {key: tc0.changes[key] for key in simulation.dose_changes}
+        if simulation.reset:
+            self.r.resetToOrigin()
+        for key, item in {**tc0.model_changes, **tc0.changes}.items():
+            if key not in dose_changes:
+                self.r[key] = float(getattr(item, "magnitude", item))
+
+        pss = periodic_steady_state(
+            self.r,
+            dose_changes={
+                key: float(getattr(item, "magnitude", item))
+                for key, item in dose_changes.items()
+            },
+            interval=simulation.interval,
+            steps=simulation.steps,
+        )
+        if not pss.converged:
+            logger.warning(
+                f"Periodic steady state did not converge after "
+                f"{pss.n_intervals} dosing intervals."
+            )
+        for sid, value in pss.state.items():
+            self.r[sid] = value
+        self.segments += pss.n_intervals
+
+        columns = list(self.r.timeCourseSelections)
+        k_time = columns.index("time")
+        blocks = []
+        t_offset = simulation.time_offset
+        for k, tc in enumerate(simulation.timecourses):
+            if k == 0:
+                # the other changes are already applied
+                tc = deepcopy(tc)
+                tc.changes = dose_changes
+            blocks.append(self._continue_segment(tc, t_offset=t_offset, k_time=k_time))
+            t_offset += tc.end
+
+        return pd.DataFrame(np.vstack(blocks), columns=columns)
+
+    def _continue_segment(
+        self, tc: Timecourse, t_offset: float, k_time: int
+    ) -> np.ndarray:
+        """Apply the changes of the segment and continue the integration."""
+        for key, item in tc.changes.items():
+            self.r[key] = float(getattr(item, "magnitude", item))
+
+        if self.r.integrator.getValue("variable_step_size"):
+            s = self.r.simulate(start=tc.start, end=tc.end)
+        else:
+            s = self.r.simulate(start=tc.start, end=tc.end, steps=tc.steps)
+
+        block = np.array(s)
+        block[:, k_time] += t_offset
+        self.segments += 1
+        self.output_steps += len(block) - 1
+        return block
+
+    def _checkpoint_key(self, prefix_key: str) -> str:
+        return hash_content("checkpoint", self._snapshot_key(prefix_key))
+
+    def _last_checkpoint(
+        self, simulation: TimecourseSim, segment: Optional[int] = None
+    ) -> Optional[Tuple[str, Checkpoint, np.ndarray]]:
+        """Key, checkpoint and results of the last complete checkpoint."""
+        keys = self._prefix_keys(simulation)
+        if segment is not None:
+            keys = keys[:segment]
+        for prefix_key in reversed(keys):
+            key = self._checkpoint_key(prefix_key)
+            checkpoint = self.checkpoints.load(key)
+            if checkpoint is None:
+                continue
+            data = self.checkpoints.load_results(checkpoint)
+            if data is not None:
+                return key, checkpoint, data
+        return None
+
+    def find_checkpoint(
+        self, simulation: TimecourseSim, segment: Optional[int] = None
+    ) -> Optional[Checkpoint]:
+        """Find the last stored checkpoint of a timecourse simulation.
+
+        :param simulation: timecourse simulation (with the selections and
+            tolerances of the simulator)
+        :param segment: only checkpoints up to this number of segments
+        :return: checkpoint or None if no checkpoint is stored
+        """
+        if self.checkpoints is None:
+            raise ValueError("Checkpoints require a 'CheckpointStore'.")
+        simulation = deepcopy(simulation)
+        simulation.normalize(uinfo=self.uinfo)
+        last = self._last_checkpoint(simulation, segment=segment)
+        return last[1] if last is not None else None
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        """Set the model state of the checkpoint."""
+        for sid, value in checkpoint.values.items():
+            self.r[sid] = value
+
+    def fork(
+        self, checkpoint: Checkpoint, timecourses: List[Timecourse]
+    ) -> pd.DataFrame:
+        """Continue the simulation of a checkpoint with other timecourses.
+
+        :param checkpoint: checkpoint to fork from
+        :param timecourses: timecourses simulated after the checkpoint
+        :return: results up to the checkpoint and of the timecourses
+        """
+        data = self.checkpoints.load_results(checkpoint)
+        if data is None:
+            raise ValueError(
+                f"Results of the checkpoint after {checkpoint.segment} segments "
+                f"are incomplete."
+            )
+        frames: List[pd.DataFrame] = []
+        if timecourses:
+            simulation = TimecourseSim(
+                timecourses=timecourses, reset=False, time_offset=checkpoint.t_offset
+            )
+            simulation.normalize(uinfo=self.uinfo)
+            for tc in simulation.timecourses:
+                # model changes would reset the state of the checkpoint
+                tc.model_changes = {}
+            self.restore(checkpoint)
+            frames, _ = self._run_segments(
+                simulation.timecourses, reset=False, t_offset=checkpoint.t_offset
+            )
+        # checkpoints of discarded segments have no columns
+        columns = checkpoint.columns or list(self.r.timeCourseSelections)
+        blocks = [data] + [df.values for df in frames]
+        blocks = [block for block in blocks if block.size]
+        if not blocks:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame(np.vstack(blocks), columns=columns)
+
+    def _checkpoint_timecourse(self, simulation: TimecourseSim) -> pd.DataFrame:
+        """Timecourse simulation with checkpoints at segment boundaries.
+
+        The simulation resumes from the last stored checkpoint. After every
+        `CheckpointStore.every` segments and after the last segment the state
+        and the results since the previous checkpoint are stored.
+        """
+        keys = self._prefix_keys(simulation)
+        columns = list(self.r.timeCourseSelections)
+        last = self._last_checkpoint(simulation)
+        if last is not None:
+            previous, checkpoint, data = last
+            logger.debug(f"Resume from checkpoint after {checkpoint.segment} segments")
+            self.restore(checkpoint)
+            k_start = checkpoint.segment
+            t_offset = checkpoint.t_offset
+            blocks = [data] if data.size else []
+        else:
+            previous, k_start, t_offset, blocks = None, 0, simulation.time_offset, []
+        # blocks which are stored with the next checkpoint
+        k_stored = len(blocks)
+
+        repeated_dosing = isinstance(simulation, RepeatedDosingSim)
+        n = len(simulation.timecourses)
+        for k in range(k_start, n):
+            if repeated_dosing and k > 0:
+                tc = simulation.timecourses[k]
+                blocks.append(
+                    self._continue_segment(
+                        tc, t_offset=t_offset, k_time=columns.index("time")
+                    )
+                )
+                t_offset += tc.end
+            else:
+                frames, t_offset = self._run_segments(
+                    self._segments(simulation, k, k + 1),
+                    reset=(k == 0),
+                    t_offset=t_offset,
+                )
+                blocks.extend(df.values for df in frames)
+
+            if (k + 1) % self.checkpoints.every == 0 or k == n - 1:
+                key = self._checkpoint_key(keys[k])
+                new_blocks = blocks[k_stored:]
+                self.checkpoints.store(
+                    key,
+                    Checkpoint(
+                        segment=k + 1,
+                        t_offset=t_offset,
+                        values={sid: self.r[sid] for sid in self._get_state_ids()},
+                        columns=columns,
+                        data=(
+                            np.vstack(new_blocks)
+                            if new_blocks
+                            else np.empty((0, len(columns)))
+                        ),
+                        previous=previous,
+                    ),
+                )
+                previous, k_stored = key, len(blocks)
+
+        if not blocks:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame(np.vstack(blocks), columns=columns)
+
+
+# simulator of the task worker process
+_task_simulator: Optional[DulaglutideSimulator] = None
+
+
+def _init_task_worker(
+    integrator_settings: Dict,
+    checkpoints: Optional[CheckpointStore],
+    sampling: Optional[OutputSampling],
+    step_statistics: bool = False,
+) -> None:
+    """Initialize task worker process with its simulator."""
+    global _task_simulator
+    _task_simulator = DulaglutideSimulator(
+        checkpoints=checkpoints,
+        sampling=sampling,
+        step_statistics=step_statistics,
+        **integrator_settings,
+    )
+
+
+def _run_task(
+    model_path: str,
+    selections: Optional[List[str]],
+    times: Optional[np.ndarray],
+    simulations: List[TimecourseSim],
+    stream_path: Optional[str] = None,
+    dimensions: Optional[Dimensions] = None,
+) -> Tuple[
+    Optional[List[pd.DataFrame]], Dict[str, float], Dict[str, Any], Dict[str, float]
+]:
+    """Run the timecourses of a task in the task worker.
+
+    Returns the results of the timecourses (None if streamed to the store at
+    `stream_path`), the prefix statistics and counters, the telemetry and the
+    integrator statistics of the task (empty without step statistics).
+    """
+    simulator = _task_simulator
+    if simulator.model is None or str(simulator.model.source.path) != model_path:
+        simulator.set_model(model_path)
+    simulator.set_timecourse_selections(selections)
+    simulator._times = times
+    for key in COUNTERS + PREFIX_STATISTICS:
+        setattr(simulator, key, 0)
+    simulator._steps = {}
+    if stream_path is None:
+        # prefixes are shared between the timecourses of the task
+        simulator._plan_timecourses(simulations)
+
+    with measure() as telemetry:
+        if stream_path is not None:
+            simulator._stream_timecourses(simulations, Path(stream_path), dimensions)
+            dfs = None
+        else:
+            dfs = simulator._timecourses(simulations)
+    statistics = {**simulator._prefix_statistics(), **simulator._counters()}
+    telemetry.update({**simulator._counters(), "cached": False})
+    integrator = simulator._integrator_statistics()
+    return dfs, statistics, telemetry, integrator
@@ -0,0 +1,199 @@
+"""Periodic steady state of repeated dosing regimens.
+
+Instead of integrating many dosing intervals until the concentrations under
+repeated dosing are stationary, the periodic orbit is calculated directly as
+fixed point of the map of the state over one dosing interval
+
+    x* = F(x*)
+
+with F(x) the state after one dosing interval starting from the pre-dose
+state x. The fixed point is solved with a hybrid Newton method
+(`scipy.optimize.root`); if the solver does not converge, the map is iterated
+(brute-force integration of dosing intervals).
+
+States which accumulate (urine and feces amounts) or are slow
+pharmacodynamic states without a periodic orbit (fat mass, glucose, HbA1c)
+are excluded from the fixed point problem and kept at their current values.
+The bodyweight therefore stays at its current value, i.e., the steady state
+is the pharmacokinetic steady state for the given bodyweight.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import roadrunner
+from scipy import optimize
+from sbmlutils import log
+
+logger = log.get_logger(__name__)
+
+EXCLUDED_STATES = {
+    # accumulating amounts
+    "Afeces_dm",
+    "Aurine_dm",
+    # pharmacodynamics
+    "DFAT",
+    "fpg",
+    "hb",
+    "hba1c",
+}
+
+
+@dataclass
+class PeriodicSteadyState:
+    """Result of the periodic steady state calculation.
+
+    Concentrations are in [mM], times in [min].
+    """
+
+    converged: bool
+    method: str
+    n_intervals: int
+    state: Dict[str, float]
+    trajectory: pd.DataFrame
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+
+def _state_ids(r: roadrunner.RoadRunner) -> List[str]:
+    """Ids of the ODE states (rate rules and floating species amounts)."""
+    return [sid.rstrip("'") for sid in r.getRatesOfChangeNamedArray().colnames]
+
+
+def _get_state(r: roadrunner.RoadRunner, ids: List[str]) -> np.ndarray:
+    """Current values of the states."""
+    return np.array([r[sid] for sid in ids], dtype=float)
+
+
+def _set_state(r: roadrunner.RoadRunner, ids: List[str], state: np.ndarray) -> None:
+    """Set values of the states."""
+    for sid, value in zip(ids, state):
+        r[sid] = float(value)
+
+
+def periodic_steady_state(
+    r: roadrunner.RoadRunner,
+    dose_changes: Dict[str, float],
+    interval: float = 7 * 24 * 60,
+    steps: int = 1000,
+    sid: str = "[Cve_dul]",
+    selections: Optional[List[str]] = None,
+    exclude: Iterable[str] = EXCLUDED_STATES,
+    rtol: float = 1e-6,
+    atol: float = 1e-12,
+    max_intervals: int = 260,
+) -> PeriodicSteadyState:
+    """Calculate the periodic steady state for repeated dosing.
+
+    The model must be initialized with all changes of the simulation (the
+    current state of the model is the starting point).
+
+    :param r: RoadRunner instance
+    :param dose_changes: changes applied at every dose, e.g. {"SCDOSE_dul": 1.5}
+    :param interval: dosing interval [min]
+    :param steps: output steps for the steady state trajectory
+    :param sid: selection for the metrics (trough, cmax, auctau)
+    :param selections: selections of the steady state trajectory
+    :param exclude: state ids excluded from the periodic steady state
+    :param rtol: relative tolerance of the periodic steady state
+    :param atol: absolute tolerance of the periodic steady state
+    :param max_intervals: maximal number of dosing intervals for the brute-force
+        fallback
+    """
+    if selections is None:
+        selections = ["time", sid]
+    selections = ["time"] + [s for s in selections if s != "time"]
+    if sid not in selections:
+        selections.append(sid)
+
+    ids = _state_ids(r)
+    x_full = _get_state(r, ids)
+    idx = np.array([k for k, state_id in enumerate(ids) if state_id not in exclude])
+    n_evaluations = 0
+
+    def dose_map(x: np.ndarray) -> np.ndarray:
+        """State after one dosing interval starting from pre-dose state x."""
+        nonlocal n_evaluations
+        n_evaluations += 1
+        state = x_full.copy()
+        state[idx] = x
+        _set_state(r, ids, state)
+        for key, value in dose_changes.items():
+            r[key] = value
+        r.simulate(start=0, end=interval, points=2)
+        return _get_state(r, ids)[idx]
+
+    def is_periodic(x: np.ndarray, fx: np.ndarray) -> bool:
+        return bool(np.all(np.abs(fx - x) <= rtol * np.abs(x) + atol))
+
+    selections_orig = list(r.timeCourseSelections)
+    r.timeCourseSelections = ["time"]
+
+    # Newton (hybrid Powell method with finite difference Jacobian)
+    x0 = x_full[idx]
+    method = "newton"
+    sol = optimize.root(lambda x: dose_map(x) - x, x0, method="hybr")
+    x = sol.x
+    converged = bool(sol.success) and is_periodic(x, dose_map(x))
+
+    if not converged:
+        # brute-force integration of dosing intervals
+        logger.warning(
+            f"Newton iteration for periodic steady state did not converge "
+            f"({sol.message}), fallback to brute-force integration."
+        )
+        method = "brute-force"
+        x = x0
+        for _ in range(max_intervals):
+            fx = dose_map(x)
+            converged = is_periodic(x, fx)
+            x = fx
+            if converged:
+                break
+
+    # steady state trajectory over one dosing interval
+    state = x_full.copy()
+    state[idx] = x
+    _set_state(r, ids, state)
+    for key, value in dose_changes.items():
+        r[key] = value
+    r.timeCourseSelections = selections
+    s = r.simulate(start=0, end=interval, steps=steps)
+    df = pd.DataFrame(s, columns=s.colnames)
+    r.timeCourseSelections = selections_orig
+
+    c = df[sid].values
+    metrics = {
+        "trough": float(c[-1]),
+        "cmax": float(np.max(c)),
+        "tmax": float(df["time"].values[np.argmax(c)]),
+        "auctau": float(np.trapezoid(c, x=df["time"].values)),
+    }
+    metrics["cavg"] = metrics["auctau"] / interval
+
+    return PeriodicSteadyState(
+        converged=converged,
+        method=method,
+        n_intervals=n_evaluations,
+        state=dict(zip(ids, state.tolist())),
+        trajectory=df,
+        metrics=metrics,
+    )
+
+
+if __name__ == "__main__":
+    import time
+
+    from pkdb_models.models.dulaglutide import MODEL_PATH
+    from pkdb_models.models.dulaglutide.model_cache import load_model
+    from sbmlutils.console import console
+
+    r = load_model(MODEL_PATH)
+    r.integrator.setValue("absolute_tolerance", 1e-10)
+    r.integrator.setValue("relative_tolerance", 1e-10)
+
+    ts = time.perf_counter()
+    pss = periodic_steady_state(r, dose_changes={"SCDOSE_dul": 1.5})
+    console.print(f"{pss.method}: converged={pss.converged}, intervals={pss.n_intervals}")
+    console.print(f"time: {time.perf_counter() - ts:.3f} s")
+    console.print(pss.metrics)
@@ -0,0 +1,298 @@
+"""Pharmacokinetics of dosing regimens by superposition of unit-dose responses.
+
+All absorption, distribution, cleavage (DUL2DM) and excretion reactions of
+the model are first order. For fixed covariates the pharmacokinetics are
+therefore linear in the doses: the response to any dosing history is the
+superposition of the responses to the single doses. The response to a unit
+dose (1 mg) is simulated with the `DulaglutideSimulator` once per covariate
+set and route and cached; the
+response to a dosing history is calculated by FFT convolution of the doses
+with the unit-dose response on a uniform time grid.
+
+The doses are applied with the semantics of the timecourse simulations, i.e.,
+a dose sets the dosing depot ('SCDOSE_dul', 'IVDOSE_dul') to the dose and the
+remaining drug of the previous doses in the depot is discarded
+(`depot="set"`). With `depot="add"` the doses are added to the depot.
+
+Bodyweight coupling: the volumes depend on the bodyweight which decreases
+via the pharmacodynamic fat loss (DFAT). This feedback is not linear, the
+unit-dose responses are calculated with frozen bodyweight (`Emax_FAT = 0`).
+Use `validate` to quantify the deviation from the full model for a regimen.
+"""
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+from sbmlsim.simulation import Timecourse, TimecourseSim
+from sbmlutils import log
+
+from pkdb_models.models.dulaglutide.cache import hash_content
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+logger = log.get_logger(__name__)
+
+ROUTES = {
+    "SC": "SCDOSE_dul",
+    "IV": "IVDOSE_dul",
+}
+
+# changes which decouple the bodyweight from the pharmacodynamics
+FROZEN_BODYWEIGHT = {"Emax_FAT": 0.0}
+
+
+def dosing_table(
+    dose: float,
+    interval: float,
+    n_doses: int,
+    route: str = "SC",
+    start: float = 0.0,
+    missed: Iterable[int] = (),
+) -> pd.DataFrame:
+    """Dosing table for a regular regimen.
+
+    Titrations are created by concatenating dosing tables.
+
+    :param dose: dose [mg]
+    :param interval: dosing interval [min]
+    :param n_doses: number of doses
+    :param route: route of the doses ('SC' or 'IV')
+    :param start: time of the first dose [min]
+    :param missed: indices of missed doses
+    :return: DataFrame with columns 'time' [min], 'dose' [mg], 'route'
+    """
+    missed = set(missed)
+    indices = [k for k in range(n_doses) if k not in missed]
+    return pd.DataFrame(
+        {
+            "time": start + np.array(indices, dtype=float) * interval,
+            "dose": dose,
+            "route": route,
+        }
+    )
+
+
+class SuperpositionModel:
+    """Linear pharmacokinetics by superposition of unit-dose responses."""
+
+    def __init__(
+        self,
+        simulator: DulaglutideSimulator,
+        selections: Iterable[str] = ("[Cve_dul]", "[Cve_dm]"),
+        dt: float = 10.0,
+        response_end: float = 20 * 7 * 24 * 60,
+        depot: str = "set",
+    ):
+        """Initialize superposition model.
+
+        :param simulator: simulator for the unit-dose responses, its
+            timecourse selections are set by the superposition model
+        :param selections: selections (linear in the doses)
+        :param dt: time step of the grid [min], dose times are rounded to the grid
+        :param response_end: duration of the unit-dose responses [min], the
+            responses are zero afterwards
+        :param depot: dosing semantics, 'set' (timecourse simulations) or 'add'
+        """
+        if depot not in {"set", "add"}:
+            raise ValueError(f"'depot' must be 'set' or 'add', but '{depot}'.")
+        self.simulator = simulator
+        self.selections: List[str] = [s for s in selections if s != "time"]
+        self.dt = dt
+        self.response_end = response_end
+        self.depot = depot
+        self._responses: Dict[str, np.ndarray] = {}
+
+    def _key(self, changes: Dict[str, float], route: str) -> str:
+        return hash_content(changes, route, self.selections, self.dt, self.response_end)
+
+    def unit_responses(
+        self, changes: pd.DataFrame, route: str = "SC"
+    ) -> List[np.ndarray]:
+        """Unit-dose responses for the covariate sets of the change matrix.
+
+        Responses which are not cached are simulated.
+
+        :param changes: change matrix, one row per covariate set
+        :param route: route of the unit dose
+        :return: responses with shape (n_time, 1 + n_selections), the first
+            column is the amount in the dosing depot
+        """
+        depot = ROUTES[route]
+        rows = [row.to_dict() for _, row in changes.iterrows()]
+        keys = [self._key(row, route) for row in rows]
+        n_steps = int(round(self.response_end / self.dt))
+        for row, key in zip(rows, keys):
+            if key in self._responses:
+                continue
+            df = self._simulate(
+                [
+                    Timecourse(
+                        start=0,
+                        end=n_steps * self.dt,
+                        steps=n_steps,
+                        changes={**row, **FROZEN_BODYWEIGHT, depot: 1.0},
+                    )
+                ],
+                selections=[depot] + self.selections,
+            )
+            self._responses[key] = df[[depot] + self.selections].values
+        return [self._responses[key] for key in keys]
+
+    def _simulate(
+        self, timecourses: List[Timecourse], selections: List[str]
+    ) -> pd.DataFrame:
+        """Timecourse simulation of the full model (changes in model units)."""
+        Q_ = self.simulator.Q_
+        uinfo = self.simulator.uinfo
+        for tc in timecourses:
+            tc.changes = {
+                sid: Q_(value, uinfo[sid]) for sid, value in tc.changes.items()
+            }
+        self.simulator.set_timecourse_selections(["time"] + selections)
+        xres = self.simulator.run_timecourse(TimecourseSim(timecourses))
+        return pd.DataFrame(
+            {sid: np.ravel(xres[sid].values) for sid in ["time"] + selections}
+        )
+
+    def unit_response(
+        self, changes: Optional[Dict[str, float]] = None, route: str = "SC"
+    ) -> np.ndarray:
+        """Unit-dose response for a single covariate set (see `unit_responses`)."""
+        return self.unit_responses(pd.DataFrame([changes or {}]), route=route)[0]
+
+    def _effective_doses(
+        self, indices: np.ndarray, doses: np.ndarray, depot_response: np.ndarray
+    ) -> np.ndarray:
+        """Amounts added to the depot at the dose indices.
+
+        With 'set' semantics the dose replaces the remaining amount in the depot,
+        i.e., the added amount is the dose minus the remaining amount.
+        """
+        if self.depot == "add":
+            return doses
+        effective = np.zeros_like(doses)
+        n_response = len(depot_response)
+        for k in range(len(doses)):
+            lags = indices[k] - indices[:k]
+            mask = lags < n_response
+            remaining = np.sum(effective[:k][mask] * depot_response[lags[mask]])
+            effective[k] = doses[k] - remaining
+        return effective
+
+    def simulate(
+        self,
+        doses: pd.DataFrame,
+        end: float,
+        changes: Optional[Dict[str, float]] = None,
+    ) -> pd.DataFrame:
+        """Simulate the dosing history by superposition.
+
+        :param doses: dosing table with columns 'time' [min], 'dose' [mg] and
+            'route' (see `dosing_table`)
+        :param end: end time [min]
+        :param changes: covariates (changes in model units)
+        :return: DataFrame with 'time' and the selections on the time grid
+        """
+        n_time = int(round(end / self.dt)) + 1
+        result = np.zeros((n_time, len(self.selections)))
+        for route, df_route in doses.groupby("route"):
+            response = self.unit_response(changes, route=route)
+            df_route = df_route.sort_values("time")
+            indices = np.rint(df_route["time"].values / self.dt).astype(int)
+            effective = self._effective_doses(
+                indices, df_route["dose"].values.astype(float), response[:, 0]
+            )
+            signal = np.zeros(n_time)
+            np.add.at(signal, indices[indices < n_time], effective[indices < n_time])
+            for k in range(len(self.selections)):
+                result[:, k] += fftconvolve(signal, response[:, k + 1])[:n_time]
+
+        df = pd.DataFrame(result, columns=self.selections)
+        df.insert(0, "time", np.arange(n_time) * self.dt)
+        return df
+
+
+def validate(
+    model: SuperpositionModel,
+    doses: pd.DataFrame,
+    end: float,
+    changes: Optional[Dict[str, float]] = None,
+) -> pd.DataFrame:
+    """Compare the superposition with the full model.
+
+    The dosing history is simulated with the simulator of the model as
+    timecourse simulation with one segment per dose, once with frozen bodyweight
+    (linearity of the model) and once with bodyweight coupling.
+
+    :return: maximal relative error per selection
+    """
+    if model.depot != "set":
+        raise ValueError("Validation requires the 'set' dosing semantics.")
+    changes = changes or {}
+    doses = doses.sort_values("time")
+    times = np.rint(doses["time"].values / model.dt) * model.dt
+    boundaries = np.unique(np.concatenate([times[times < end], [end]]))
+    if boundaries[0] > 0:
+        boundaries = np.concatenate([[0.0], boundaries])
+
+    df = model.simulate(doses, end=end, changes=changes)
+    errors = {}
+    for key, frozen in [("frozen bodyweight", True), ("bodyweight coupling", False)]:
+        timecourses = []
+        for k, (t_start, t_end) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+            tc_changes = {}
+            if k == 0:
+                tc_changes.update(changes)
+                if frozen:
+                    tc_changes.update(FROZEN_BODYWEIGHT)
+            for route, depot in ROUTES.items():
+                dose = doses["dose"].values[(times == t_start) & (doses["route"] == route)]
+                if len(dose):
+                    tc_changes[depot] = float(dose.sum())
+            timecourses.append(
+                Timecourse(
+                    start=0,
+                    end=t_end - t_start,
+                    steps=int(round((t_end - t_start) / model.dt)),
+                    changes=tc_changes,
+                )
+            )
+        df_full = model._simulate(timecourses, selections=model.selections)
+        df_full = df_full.drop_duplicates(subset="time", keep="first")
+        for sid in model.selections:
+            reference = df_full[sid].values
+            error = np.max(np.abs(df[sid].values - reference))
+            errors[(key, sid)] = error / np.max(np.abs(reference))
+
+    return pd.Series(errors).unstack()
+
+
+if __name__ == "__main__":
+    import time
+
+    from sbmlutils.console import console
+
+    from pkdb_models.models.dulaglutide import MODEL_PATH
+
+    superposition = SuperpositionModel(
+        DulaglutideSimulator(
+            model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+        )
+    )
+    week = 7 * 24 * 60
+
+    # titration with missed doses
+    doses = pd.concat(
+        [
+            dosing_table(dose=0.75, interval=week, n_doses=4),
+            dosing_table(dose=1.5, interval=week, n_doses=8, start=4 * week, missed=[3]),
+        ]
+    )
+    console.print(validate(superposition, doses=doses, end=16 * week))
+
+    # 5 years of weekly dosing
+    doses = dosing_table(dose=1.5, interval=week, n_doses=5 * 52)
+    superposition.unit_response()
+    ts = time.perf_counter()
+    df = superposition.simulate(doses, end=5 * 52 * week)
+    console.print(f"5 years weekly dosing: {(time.perf_counter() - ts) * 1000:.1f} ms")
@@ -0,0 +1,226 @@
+"""Runtime telemetry of the simulation experiments.
+
+Every run of the experiments writes 'telemetry.jsonl' to the output directory
+with one JSON record per experiment and phase and per experiment and task:
+
+    {"run": "20250101T020000-1234", "experiment": "Gerstein2019",
+     "task": "task_dul15", "phase": "simulate", "wall_time": 12.3,
+     "cpu_time": 12.1, "segments": 261, "output_points": 2871,
+     "output_steps": 2610, "peak_rss": 812345344, "cached": false}
+
+Times are in [s], the peak resident set size in [bytes]. Phases are exclusive
+(see `profiling`), so the times of the phases of an experiment add up to the
+time of the experiment. The counters of the tasks (integrated segments,
+output steps of the integration, i.e. the requested steps of the segments
+and not the steps of CVODE, and output points after sampling) are summed in the
+'simulate' phase of the experiment. Cached tasks have no integration cost.
+
+The peak RSS of a phase or task is the peak within the phase or task on
+Linux (the high-water mark is reset), otherwise the peak of the process.
+Tasks executed by task workers report the peak of the worker.
+"""
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional
+
+from sbmlutils import log
+
+logger = log.get_logger(__name__)
+
+# counters of the integration of a task
+COUNTERS: List[str] = ["segments", "output_steps", "output_points"]
+
+_collector: Optional["TelemetryCollector"] = None
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of the process [bytes]."""
+    try:
+        with open("/proc/self/status", "r") as f_status:
+            match = re.search(r"VmHWM:\s+(\d+) kB", f_status.read())
+        if match:
+            return int(match.group(1)) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        # windows
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def reset_peak_rss() -> None:
+    """Reset the peak resident set size to the current size (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f_refs:
+            f_refs.write("5")
+    except OSError:
+        pass
+
+
+@contextmanager
+def measure() -> Iterator[Dict[str, Any]]:
+    """Measure wall time, CPU time and peak RSS of the context."""
+    values: Dict[str, Any] = {}
+    if _collector is not None:
+        _collector.observe_peak_rss()
+    reset_peak_rss()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield values
+    finally:
+        values["wall_time"] = time.perf_counter() - wall
+        values["cpu_time"] = time.process_time() - cpu
+        values["peak_rss"] = peak_rss()
+
+
+class TelemetryCollector:
+    """Telemetry records of the experiments executed in this process."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        # [record, wall start, cpu start] of the entered phases
+        self._stack: List[list] = []
+
+    def observe_peak_rss(self) -> None:
+        """Update the peak RSS of the current phase, e.g. before a reset."""
+        if not self._stack:
+            return
+        record = self._stack[-1][0]
+        rss = peak_rss()
+        if rss is not None:
+            record["peak_rss"] = max(record["peak_rss"] or 0, rss)
+
+    def _pause(self) -> None:
+        record, wall, cpu = self._stack[-1]
+        record["wall_time"] += time.perf_counter() - wall
+        record["cpu_time"] += time.process_time() - cpu
+        self.observe_peak_rss()
+
+    def _resume(self) -> None:
+        reset_peak_rss()
+        self._stack[-1][1:] = [time.perf_counter(), time.process_time()]
+
+    @contextmanager
+    def phase(self, experiment: str, phase: str) -> Iterator[None]:
+        """Record the phase of the experiment."""
+        if self._stack and (
+            self._stack[-1][0]["experiment"] == experiment
+            and self._stack[-1][0]["phase"] == phase
+        ):
+            # re-entered phase, e.g. by super() calls
+            yield
+            return
+
+        if self._stack:
+            self._pause()
+        record = {
+            "experiment": experiment,
+            "task": None,
+            "phase": phase,
+            "wall_time": 0.0,
+            "cpu_time": 0.0,
+            **{key: 0 for key in COUNTERS},
+            "peak_rss": None,
+        }
+        self._stack.append([record, None, None])
+        self._resume()
+        try:
+            yield
+        finally:
+            self._pause()
+            self._stack.pop()
+            self.records.append(record)
+            if self._stack:
+                self._resume()
+
+    def task(self, experiment: str, task: str, values: Dict[str, Any]) -> None:
+        """Record the telemetry of a task (see `measure`).
+
+        The counters are added to the enclosing phase of the experiment.
+        """
+        record = {
+            "experiment": experiment,
+            "task": task,
+            "phase": "simulate",
+            "wall_time": values.get("wall_time", 0.0),
+            "cpu_time": values.get("cpu_time", 0.0),
+            **{key: values.get(key, 0) for key in COUNTERS},
+            "peak_rss": values.get("peak_rss"),
+            "cached": values.get("cached", False),
+        }
+        self.records.append(record)
+        for phase_record, _, _ in reversed(self._stack):
+            if phase_record["experiment"] == experiment:
+                for key in COUNTERS:
+                    phase_record[key] += record[key]
+                break
+
+    def pop_records(self) -> List[Dict[str, Any]]:
+        """Records since the last call, e.g. to transfer them between processes."""
+        records, self.records = self.records, []
+        return records
+
+
+def collect_telemetry() -> TelemetryCollector:
+    """Collector of this process, created if telemetry is not active."""
+    global _collector
+    if _collector is None:
+        _collector = TelemetryCollector()
+    return _collector
+
+
+def stop_telemetry() -> None:
+    """Deactivate the telemetry in this process."""
+    global _collector
+    _collector = None
+
+
+def telemetry_active() -> bool:
+    """Check if the telemetry is active."""
+    return _collector is not None
+
+
+def telemetry_phase(experiment: str, phase: str) -> ContextManager:
+    """Record the phase if the telemetry is active."""
+    if _collector is None:
+        return nullcontext()
+    return _collector.phase(experiment, phase)
+
+
+def record_task(experiment: str, task: str, values: Optional[Dict[str, Any]]) -> None:
+    """Record the telemetry of a task if the telemetry is active."""
+    if _collector is not None and values is not None:
+        _collector.task(experiment, task, values)
+
+
+def run_id() -> str:
+    """Identifier of a run (timestamp and process id)."""
+    return f"{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+
+def write_telemetry(
+    records: Iterable[Dict[str, Any]], path: Path, run: Optional[str] = None
+) -> Path:
+    """Write the records as JSON lines."""
+    run = run or run_id()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f_jsonl:
+        for record in records:
+            f_jsonl.write(json.dumps({"run": run, **record}) + "\n")
+    return path
+
+
+def read_telemetry(path: Path) -> List[Dict[str, Any]]:
+    """Read the records of a telemetry file."""
+    with open(path, "r") as f_jsonl:
+        return [json.loads(line) for line in f_jsonl if line.strip()]
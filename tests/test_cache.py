@@ -0,0 +1,29 @@
+"""Keys of the result cache."""
+import sbmlsim
+
+from pkdb_models.models.dulaglutide import cache
+from pkdb_models.models.dulaglutide.cache import ResultCache
+
+
+def _key(tmp_path) -> str:
+    return ResultCache(tmp_path).key(
+        model_hash="model",
+        simulation={"end": 100},
+        tolerances={"absolute_tolerance": 1e-10},
+        selections=["time", "[Cve_dul]"],
+    )
+
+
+def test_key_depends_on_sbmlsim_version(tmp_path) -> None:
+    key = _key(tmp_path)
+    assert _key(tmp_path) == key
+
+    version = sbmlsim.__version__
+    sbmlsim.__version__ = "0.0.0"
+    cache.simulator_hash.cache_clear()
+    try:
+        assert _key(tmp_path) != key
+    finally:
+        sbmlsim.__version__ = version
+        cache.simulator_hash.cache_clear()
+    assert _key(tmp_path) == key
@@ -0,0 +1,87 @@
+"""Checkpoints of the timecourse simulations."""
+import os
+
+import numpy as np
+import pytest
+from sbmlsim.simulation import Timecourse, TimecourseSim
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.checkpoint import Checkpoint, CheckpointStore
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+WEEK = 7 * 24 * 60  # [min]
+
+
+@pytest.fixture(scope="module")
+def simulator() -> DulaglutideSimulator:
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+    simulator.set_timecourse_selections(["time", "[Cve_dul]", "Aurine_dm"])
+    return simulator
+
+
+def _regimen(simulator: DulaglutideSimulator) -> RepeatedDosingSim:
+    Q_ = simulator.uinfo.ureg.Quantity
+    return RepeatedDosingSim(
+        changes={},
+        dose_changes={"SCDOSE_dul": Q_(1.5, "mg")},
+        interval=WEEK,
+        n_doses=12,
+        steps=20,
+    )
+
+
+def _checkpoint_files(store: CheckpointStore):
+    return sorted(store.checkpoint_path.glob("*/*.npz"), key=os.path.getmtime)
+
+
+def test_incremental_checkpoints(simulator, tmp_path) -> None:
+    simulator.checkpoints = None
+    reference = simulator.run_timecourse(_regimen(simulator))
+
+    store = CheckpointStore(tmp_path, every=3)
+    simulator.checkpoints = store
+    xres = simulator.run_timecourse(_regimen(simulator))
+    np.testing.assert_array_equal(
+        xres["[Cve_dul]"].values, reference["[Cve_dul]"].values
+    )
+
+    # every result row is stored once
+    files = _checkpoint_files(store)
+    assert len(files) == 4
+    rows = sum(len(Checkpoint.read(path).data) for path in files)
+    assert rows == len(reference["time"])
+
+    # resume from the checkpoint after 9 segments
+    files[-1].unlink()
+    xres = simulator.run_timecourse(_regimen(simulator))
+    np.testing.assert_allclose(
+        xres["[Cve_dul]"].values, reference["[Cve_dul]"].values, rtol=1e-8
+    )
+
+
+def test_fork_discarded_segment(simulator, tmp_path) -> None:
+    Q_ = simulator.uinfo.ureg.Quantity
+    presimulation = Timecourse(start=0, end=WEEK, steps=20, discard=True)
+    dose = Timecourse(
+        start=0, end=WEEK, steps=20, changes={"SCDOSE_dul": Q_(1.5, "mg")}
+    )
+    simulator.checkpoints = CheckpointStore(tmp_path, every=1)
+    simulator.run_timecourse(TimecourseSim([presimulation, dose]))
+
+    checkpoint = simulator.find_checkpoint(
+        TimecourseSim([presimulation, dose]), segment=1
+    )
+    assert checkpoint.segment == 1
+    assert checkpoint.data.size == 0
+
+    for timecourses in [[], [presimulation]]:
+        df = simulator.fork(checkpoint, timecourses=timecourses)
+        assert len(df) == 0
+        assert list(df.columns) == ["time", "[Cve_dul]", "Aurine_dm"]
+
+    df = simulator.fork(checkpoint, timecourses=[dose])
+    assert len(df) == 21
+    assert df["[Cve_dul]"].max() > 0
@@ -0,0 +1,47 @@
+"""Repeated dosing as chained timecourses."""
+import numpy as np
+from sbmlsim.simulation import Timecourse, TimecourseSim
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+WEEK = 7 * 24 * 60  # [min]
+
+
+def test_repeated_dosing_equals_chained() -> None:
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+    simulator.set_timecourse_selections(["time", "[Cve_dul]", "[Cve_dm]"])
+    Q_ = simulator.uinfo.ureg.Quantity
+    changes = {"BW0": Q_(90, "kg")}
+    dose = {"SCDOSE_dul": Q_(1.5, "mg")}
+    n_doses = 10
+
+    repeated = simulator.run_timecourse(
+        RepeatedDosingSim(
+            changes=changes,
+            dose_changes=dose,
+            interval=WEEK,
+            n_doses=n_doses,
+            steps=20,
+        )
+    )
+    # [tc0] + [tc1] * N
+    tc0 = Timecourse(start=0, end=WEEK, steps=20, changes={**changes, **dose})
+    tc1 = Timecourse(start=0, end=WEEK, steps=20, changes=dose)
+    chained = simulator.run_timecourse(
+        TimecourseSim([tc0] + [tc1] * (n_doses - 1))
+    )
+
+    for sid in ["time", "[Cve_dul]", "[Cve_dm]"]:
+        x_repeated = np.ravel(repeated[sid].values)
+        x_chained = np.ravel(chained[sid].values)
+        assert len(x_repeated) == len(x_chained) == n_doses * 21
+        np.testing.assert_allclose(
+            x_repeated,
+            x_chained,
+            rtol=1e-8,
+            atol=1e-12,
+        )
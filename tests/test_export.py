@@ -0,0 +1,37 @@
+"""Metadata of the fit mappings in the columnar export."""
+from types import SimpleNamespace
+
+from pkdb_models.models.dulaglutide.experiments.metadata import (
+    ApplicationForm,
+    Coadministration,
+    Dosing,
+    DulaglutideMappingMetaData,
+    Fasting,
+    Health,
+    Route,
+    Tissue,
+)
+from pkdb_models.models.dulaglutide.export import mapping_metadata
+from pkdb_models.models.dulaglutide.selections import selection_data
+
+
+def test_mapping_metadata_concentration() -> None:
+    metadata = DulaglutideMappingMetaData(
+        tissue=Tissue.PLASMA,
+        route=Route.SC,
+        application_form=ApplicationForm.SOLUTION,
+        dosing=Dosing.SINGLE,
+        health=Health.HEALTHY,
+        fasting=Fasting.NR,
+        coadministration=Coadministration.NONE,
+    )
+    mapping = SimpleNamespace(
+        observable=SimpleNamespace(
+            task_id="task_sc", y=selection_data("[Cve_dul]", task_id="task_sc")
+        ),
+        metadata=metadata,
+    )
+    experiment = SimpleNamespace(_fit_mappings={"fm_sc": mapping})
+
+    # keyed like the results, i.e. concentrations with brackets
+    assert set(mapping_metadata(experiment)) == {("task_sc", "[Cve_dul]")}
@@ -0,0 +1,79 @@
+"""Integrator statistics of the tasks from the variable step integration."""
+import numpy as np
+import pytest
+from sbmlsim.simulation import Timecourse, TimecourseSim
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.cache import ResultCache
+from pkdb_models.models.dulaglutide.simulator import (
+    DulaglutideSimulator,
+    integrator_statistics,
+)
+
+WEEK = 7 * 24 * 60  # [min]
+
+
+def _run(step_statistics: bool):
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH,
+        absolute_tolerance=1e-10,
+        relative_tolerance=1e-10,
+        step_statistics=step_statistics,
+    )
+    Q_ = simulator.uinfo.ureg.Quantity
+    tc = Timecourse(
+        start=0, end=WEEK, steps=100, changes={"SCDOSE_dul": Q_(1.5, "mg")}
+    )
+    xres = simulator.run_timecourse(TimecourseSim([tc, tc]))
+    return simulator, xres
+
+
+@pytest.fixture(scope="module")
+def results():
+    return _run(step_statistics=False), _run(step_statistics=True)
+
+
+def test_no_statistics_by_default(results) -> None:
+    (_, xres), _ = results
+    assert integrator_statistics(xres) == {}
+
+
+def test_cvode_steps(results) -> None:
+    _, (simulator, xres) = results
+    stats = integrator_statistics(xres)
+    assert stats["segments"] == 2
+    # CVODE steps, not the 2 * 100 output steps
+    assert stats["steps"] != 200
+    assert stats["min_step"] < WEEK / 100
+    assert stats["variable_step_size"] == 0
+    # the settings of the simulator are restored
+    assert not simulator.r.integrator.getValue("variable_step_size")
+    assert len(simulator.r.timeCourseSelections) > 1
+
+
+def test_results_unchanged(results) -> None:
+    (_, xres), (_, xres_stats) = results
+    assert xres.xds.sizes == xres_stats.xds.sizes
+    np.testing.assert_allclose(
+        xres["[Cve_dul]"].values, xres_stats["[Cve_dul]"].values, rtol=1e-8
+    )
+
+
+def test_statistics_not_from_cache(tmp_path) -> None:
+    cache = ResultCache(tmp_path)
+    for step_statistics in [False, True]:
+        simulator = DulaglutideSimulator(
+            model=MODEL_PATH,
+            cache=cache,
+            absolute_tolerance=1e-10,
+            relative_tolerance=1e-10,
+            step_statistics=step_statistics,
+        )
+        Q_ = simulator.uinfo.ureg.Quantity
+        tc = Timecourse(
+            start=0, end=WEEK, steps=100, changes={"SCDOSE_dul": Q_(1.5, "mg")}
+        )
+        xres = simulator.run_timecourse(TimecourseSim([tc]))
+    # the cached result without statistics is not reused
+    assert cache.hits == 0
+    assert integrator_statistics(xres)["segments"] == 1
@@ -0,0 +1,40 @@
+"""Memory estimates of the experiments."""
+from pkdb_models.models.dulaglutide.memory import (
+    WORKER_MEMORY,
+    estimate_memory,
+    measured_peaks,
+)
+from pkdb_models.models.dulaglutide.profiling import RUN
+
+MB = 2**20
+
+
+def _run(peaks):
+    return {
+        "source": "telemetry",
+        "timings": {name: {"peak_rss": peak} for name, peak in peaks.items()},
+    }
+
+
+def test_measured_peaks() -> None:
+    runs = [
+        _run({"Gerstein2019": 600 * MB, "Xu2022": 450 * MB}),
+        _run({"Gerstein2019": 483 * MB, RUN: 900 * MB}),
+    ]
+    memory = {"Xu2022": {"peak_rss": 470 * MB, "estimate": None}}
+    # latest run of the history, larger peak of 'memory.json'
+    assert measured_peaks(runs, memory) == {
+        "Gerstein2019": 483 * MB,
+        "Xu2022": 470 * MB,
+    }
+
+
+def test_estimate_with_measured_peak() -> None:
+    info = {"points": 2**14, "selections": 4}
+    estimate = estimate_memory(info)
+    assert estimate > WORKER_MEMORY
+    assert estimate_memory(info, peak=estimate + MB) == estimate + MB
+    assert estimate_memory(info, peak=MB) == estimate
+    # no manifest entry
+    assert estimate_memory(None, peak=483 * MB) == 483 * MB
+    assert estimate_memory(None) is None
@@ -0,0 +1,75 @@
+"""Compiled model states of the model cache."""
+import numpy as np
+import roadrunner
+from sbmlsim.model import RoadrunnerSBMLModel
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.model_cache import (
+    CachedRoadrunnerSBMLModel,
+    compile_model,
+    load_model,
+    state_path,
+)
+
+
+def _simulate(r: roadrunner.RoadRunner) -> np.ndarray:
+    r.resetAll()
+    r.timeCourseSelections = ["time", "[Cve_dul]", "Aurine_dm"]
+    r["SCDOSE_dul"] = 1.5
+    s1 = np.array(r.simulate(start=0, end=7 * 24 * 60, steps=100))
+    # second dose continues the state
+    r["SCDOSE_dul"] = 1.5
+    s2 = np.array(r.simulate(start=0, end=7 * 24 * 60, steps=100))
+    return np.vstack([s1, s2])
+
+
+def test_state_equals_compiled_model(tmp_path) -> None:
+    compiled = compile_model(MODEL_PATH, state_dir=tmp_path)
+    restored = load_model(MODEL_PATH, state_dir=tmp_path)
+    assert restored is not compiled
+    np.testing.assert_array_equal(_simulate(compiled), _simulate(restored))
+
+
+def test_prune_current_roadrunner_version(tmp_path) -> None:
+    path = state_path(MODEL_PATH, state_dir=tmp_path)
+    stale = tmp_path / f"{MODEL_PATH.stem}_0000000000000000_rr{roadrunner.__version__}.state"
+    other_version = tmp_path / f"{MODEL_PATH.stem}_0000000000000000_rr0.0.0.state"
+    for p in [stale, other_version]:
+        p.write_bytes(b"")
+
+    compile_model(MODEL_PATH, state_dir=tmp_path)
+    assert path.exists()
+    assert not stale.exists()
+    assert other_version.exists()
+
+
+def test_no_patch_of_sbmlsim() -> None:
+    load = RoadrunnerSBMLModel.load_roadrunner_model
+    model = CachedRoadrunnerSBMLModel(source=MODEL_PATH)
+    assert isinstance(model.r, roadrunner.RoadRunner)
+    assert RoadrunnerSBMLModel.load_roadrunner_model == load
+
+
+def test_experiment_runner_uses_cache() -> None:
+    from pkdb_models.models.dulaglutide import DATA_PATHS, DULAGLUTIDE_PATH
+    from pkdb_models.models.dulaglutide.experiments.base_experiment import (
+        MODEL,
+        DulaglutideExperimentRunner,
+    )
+    from pkdb_models.models.dulaglutide.experiments.studies import Xu2022, Zhang2023
+    from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+    runner = DulaglutideExperimentRunner(
+        experiment_classes=[Xu2022, Zhang2023],
+        data_path=DATA_PATHS,
+        base_path=DULAGLUTIDE_PATH,
+    )
+    # one model for all experiments
+    assert list(runner.models) == [MODEL]
+    model = runner.models[MODEL]
+    assert isinstance(model, CachedRoadrunnerSBMLModel)
+    for experiment in runner.experiments.values():
+        assert experiment._models["model"] is model
+
+    simulator = DulaglutideSimulator(model=MODEL)
+    assert isinstance(simulator.model, CachedRoadrunnerSBMLModel)
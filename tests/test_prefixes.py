@@ -0,0 +1,50 @@
+"""Shared prefixes of the timecourse simulations."""
+import numpy as np
+from sbmlsim.simulation import Timecourse, TimecourseSim
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+WEEK = 7 * 24 * 60  # [min]
+
+
+def _simulations(simulator: DulaglutideSimulator):
+    Q_ = simulator.uinfo.ureg.Quantity
+    dose = Timecourse(
+        start=0, end=WEEK, steps=20, changes={"SCDOSE_dul": Q_(1.5, "mg")}
+    )
+    return [
+        TimecourseSim([dose, dose, dose]),
+        TimecourseSim([dose, dose, Timecourse(start=0, end=WEEK, steps=20)]),
+        TimecourseSim([dose, Timecourse(start=0, end=2 * WEEK, steps=40)]),
+    ]
+
+
+def _run(simulator: DulaglutideSimulator):
+    return [
+        simulator.run_timecourse(simulation)["[Cve_dul]"].values
+        for simulation in _simulations(simulator)
+    ]
+
+
+def test_shared_prefixes() -> None:
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+    simulator.set_timecourse_selections(["time", "[Cve_dul]"])
+    reference = _run(simulator)
+    assert simulator.prefix_hits == 0
+
+    with simulator.planning():
+        for simulation in _simulations(simulator):
+            assert simulator.run_timecourse(simulation) is None
+    results = _run(simulator)
+
+    # first dose shared by all, first two doses by two timecourses
+    statistics = simulator.statistics()
+    assert statistics["prefix_hits"] == 2
+    assert statistics["prefix_segments"] == 3
+    assert statistics["prefix_time_saved"] > 0
+    assert simulator._snapshots == {}
+    for xres, xref in zip(results, reference):
+        np.testing.assert_allclose(xres, xref, rtol=1e-8)
@@ -0,0 +1,27 @@
+"""Manifest of the experiment registry."""
+import hashlib
+
+import pkdb_models.models.dulaglutide as dulaglutide
+from pkdb_models.models.dulaglutide.experiments import registry
+
+
+def test_manifest_in_results_directory(tmp_path) -> None:
+    results_path = dulaglutide.RESULTS_PATH
+    dulaglutide.RESULTS_PATH = tmp_path
+    try:
+        info = {field: None for field in registry.MANIFEST_FIELDS}
+        info["source_hash"] = registry.source_hash("Xu2022")
+        registry.update_manifest({"Xu2022": info})
+        assert (tmp_path / "registry.json").exists()
+        assert not (registry.EXPERIMENTS_PATH / "registry.json").exists()
+        assert registry.stale_experiments(registry.read_manifest(), ["Xu2022"]) == []
+    finally:
+        dulaglutide.RESULTS_PATH = results_path
+
+
+def test_stale_without_shared_sources() -> None:
+    module = registry.EXPERIMENTS_PATH / "studies" / "xu2022.py"
+    info = {field: None for field in registry.MANIFEST_FIELDS}
+    # hash of the experiment module only
+    info["source_hash"] = hashlib.sha256(module.read_bytes()).hexdigest()
+    assert registry.stale_experiments({"Xu2022": info}, ["Xu2022"]) == ["Xu2022"]
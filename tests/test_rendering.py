@@ -0,0 +1,20 @@
+"""Figures of the simulation experiments."""
+import pkdb_models.models.dulaglutide as dulaglutide
+from pkdb_models.models.dulaglutide.experiments.studies import Xu2022
+from pkdb_models.models.dulaglutide.helpers import run_experiments
+
+
+def test_default_run_writes_figures(tmp_path) -> None:
+    results_path = dulaglutide.RESULTS_PATH
+    dulaglutide.RESULTS_PATH = tmp_path
+    try:
+        # serial experiments, figures rendered after the simulations
+        run_experiments(
+            Xu2022, output_dir=tmp_path / "simulation", figure_formats=["png"]
+        )
+    finally:
+        dulaglutide.RESULTS_PATH = results_path
+
+    figures = sorted((tmp_path / "simulation" / "_figures").glob("Xu2022_*.png"))
+    assert figures
+    assert all(path.stat().st_size > 0 for path in figures)
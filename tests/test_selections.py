@@ -0,0 +1,94 @@
+"""Reduced selections of concentrations, from the figures to the results."""
+from typing import Dict
+
+import pytest
+from sbmlsim.experiment import ExperimentRunner
+from sbmlsim.plot import Axis, Figure
+from sbmlsim.simulation import Timecourse, TimecourseSim
+
+from pkdb_models.models.dulaglutide import DATA_PATHS, DULAGLUTIDE_PATH, MODEL_PATH
+from pkdb_models.models.dulaglutide.experiments.base_experiment import (
+    DulaglutideSimulationExperiment,
+)
+from pkdb_models.models.dulaglutide.rendering import FigureRenderer
+from pkdb_models.models.dulaglutide.selections import selection_data
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+
+class ConcentrationExperiment(DulaglutideSimulationExperiment):
+    """Single SC dose with figure of a concentration and an amount."""
+
+    def simulations(self) -> Dict[str, TimecourseSim]:
+        Q_ = self.Q_
+        return {
+            "sc": TimecourseSim(
+                Timecourse(
+                    start=0,
+                    end=7 * 24 * 60,  # [min]
+                    steps=100,
+                    changes={
+                        **self.default_changes(),
+                        "SCDOSE_dul": Q_(1.5, "mg"),
+                    },
+                )
+            )
+        }
+
+    def figures(self) -> Dict[str, Figure]:
+        fig = Figure(experiment=self, sid="Fig_concentration", num_rows=1, num_cols=2)
+        plots = fig.create_plots(xaxis=Axis("time", unit="week"))
+        for plot, yid in zip(plots, ["[Cve_dul]", "Aurine_dm"]):
+            plot.set_yaxis(label=self.labels[yid], unit=self.units[yid])
+            plot.add_data(task="task_sc", xid="time", yid=yid)
+        return {fig.sid: fig}
+
+
+def test_selection_data() -> None:
+    concentration = selection_data("[Cve_dul]", task_id="task_sc")
+    assert concentration.index == "Cve_dul"
+    assert concentration.selection == "[Cve_dul]"
+    amount = selection_data("Cve_dul", task_id="task_sc")
+    assert amount.selection == "Cve_dul"
+    assert amount.sid != concentration.sid
+
+
+@pytest.fixture(scope="module")
+def experiment(tmp_path_factory) -> ConcentrationExperiment:
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+    runner = ExperimentRunner(
+        experiment_classes=[ConcentrationExperiment],
+        data_path=DATA_PATHS,
+        base_path=DULAGLUTIDE_PATH,
+        simulator=simulator,
+    )
+    experiment = runner.experiments["ConcentrationExperiment"]
+    # figures are created but not rendered
+    experiment.renderer = FigureRenderer(formats=["png"])
+    runner.run_experiments(
+        output_path=tmp_path_factory.mktemp("results"),
+        show_figures=False,
+        save_results=False,
+        figure_formats=["png"],
+        reduced_selections=True,
+    )
+    return experiment
+
+
+def test_task_selections(experiment: ConcentrationExperiment) -> None:
+    selections = experiment.task_selections()["task_sc"]
+    assert selections == {"time", "[Cve_dul]", "Aurine_dm"}
+
+
+def test_reduced_selections(experiment: ConcentrationExperiment) -> None:
+    xres = experiment.results["task_sc"]
+    assert "[Cve_dul]" in xres.xds
+    assert "Aurine_dm" in xres.xds
+    # concentrations are not requested as amounts
+    assert "Cve_dul" not in xres.xds
+    assert float(xres["[Cve_dul]"].max()) > 0
+
+
+def test_figures_created(experiment: ConcentrationExperiment) -> None:
+    assert len(experiment.renderer.jobs) == 1
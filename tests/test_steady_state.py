@@ -0,0 +1,58 @@
+"""Repeated dosing from the periodic steady state."""
+import numpy as np
+import pytest
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.dosing import RepeatedDosingSim
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+
+WEEK = 7 * 24 * 60  # [min]
+
+
+@pytest.fixture(scope="module")
+def simulator() -> DulaglutideSimulator:
+    simulator = DulaglutideSimulator(
+        model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+    )
+    simulator.set_timecourse_selections(["time", "[Cve_dul]"])
+    return simulator
+
+
+def _regimen(simulator: DulaglutideSimulator, n_doses: int, steady_state: bool):
+    Q_ = simulator.uinfo.ureg.Quantity
+    return RepeatedDosingSim(
+        changes={},
+        dose_changes={"SCDOSE_dul": Q_(1.5, "mg")},
+        interval=WEEK,
+        n_doses=n_doses,
+        steps=100,
+        steady_state=steady_state,
+    )
+
+
+def test_steady_state_equals_long_integration(simulator) -> None:
+    # last dosing interval after 30 weekly doses
+    xres = simulator.run_timecourse(
+        _regimen(simulator, n_doses=30, steady_state=False)
+    )
+    c_long = xres["[Cve_dul]"].values[-101:]
+
+    xres = simulator.run_timecourse(
+        _regimen(simulator, n_doses=1, steady_state=True)
+    )
+    c_ss = xres["[Cve_dul]"].values
+    assert len(c_ss) == 101
+    np.testing.assert_allclose(c_ss, c_long, rtol=1e-4)
+    np.testing.assert_allclose(
+        np.ravel(xres["time"].values), np.linspace(0, WEEK, 101)
+    )
+
+
+def test_steady_state_periodic(simulator) -> None:
+    xres = simulator.run_timecourse(
+        _regimen(simulator, n_doses=3, steady_state=True)
+    )
+    c = xres["[Cve_dul]"].values
+    # every dosing interval repeats the steady state
+    np.testing.assert_allclose(c[101:202], c[:101], rtol=1e-4)
+    np.testing.assert_allclose(c[202:], c[:101], rtol=1e-4)
@@ -0,0 +1,31 @@
+"""Superposition of unit-dose responses."""
+import pandas as pd
+
+from pkdb_models.models.dulaglutide import MODEL_PATH
+from pkdb_models.models.dulaglutide.simulator import DulaglutideSimulator
+from pkdb_models.models.dulaglutide.superposition import (
+    SuperpositionModel,
+    dosing_table,
+    validate,
+)
+
+WEEK = 7 * 24 * 60  # [min]
+
+
+def test_titration_with_missed_doses() -> None:
+    superposition = SuperpositionModel(
+        DulaglutideSimulator(
+            model=MODEL_PATH, absolute_tolerance=1e-10, relative_tolerance=1e-10
+        )
+    )
+    doses = pd.concat(
+        [
+            dosing_table(dose=0.75, interval=WEEK, n_doses=4),
+            dosing_table(dose=1.5, interval=WEEK, n_doses=8, start=4 * WEEK, missed=[3]),
+        ]
+    )
+    errors = validate(superposition, doses=doses, end=16 * WEEK)
+
+    # relative error against the full model
+    assert errors.loc["frozen bodyweight", "[Cve_dul]"] < 1e-6
+    assert errors.loc["frozen bodyweight", "[Cve_dm]"] < 1e-5